@@ -1,29 +1,68 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.schema import AddConstraint
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
 from functools import wraps
 import os
-from io import BytesIO
+from io import BytesIO, StringIO
+from urllib.parse import urlparse
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 import json
+from types import SimpleNamespace
+import random
+import click
+import base64
+import binascii
+import hashlib
+import hmac
+import http.client
+import itertools
+import re
+import threading
+import time
+import atexit
+import subprocess
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque, namedtuple
+from contextvars import ContextVar
+import csv
+import zipfile
+import gzip
+import glob
+import heapq
+from itertools import islice
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# These modules read their settings from the environment at import, so they come in after .env is loaded
+from caching import MemoryResponseBackend, ResponseCache, SqliteResponseBackend, TTLCache
+from event_stream import EventHub, SqliteEventLog, STREAM_BUFFER_SIZE
+from host_local import pid_alive
+from presence_store import MemoryPresenceBackend, PresenceStore, SqlitePresenceBackend
+from request_metrics import Metrics, metric_labels
+
 app = Flask(__name__)
 
 
-CORS(app, resources={r"/api/*": {"origins": [
+CORS_ORIGINS = [
     "emp-tracker-frontend.vercel.app",  # ✅ your deployed frontend on Render
     "http://localhost:8000",                # ✅ for local testing
     "http://localhost:3000"                 # ✅ optional for React dev server
-]}})
+]
+CORS(app, resources={r"/api/*": {"origins": CORS_ORIGINS}})
 
 # CORS(app, resources={r"/*": {"origins": "https://emp-tracker-frontend.vercel.app"}})
 # CORS(app, resources={r"/api/*": {
@@ -37,8 +76,99 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-this-
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///employee_tracker.db1')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Engine and pool configuration
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))] if sorted_values else 0.0
+
+class PoolStats:
+    # Time spent waiting for a pooled connection, including opening a new one on overflow
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            self._waits.append(waited)
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self._waits)
+        return {
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            'wait_p50_ms': round(_percentile(waits, 0.50) * 1000, 3),
+            'wait_p99_ms': round(_percentile(waits, 0.99) * 1000, 3),
+            'wait_max_ms': round(self.wait_max * 1000, 3)
+        }
+
+pool_stats = PoolStats()
+
+class TimedQueuePool(QueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - started)
+        return connection
+
+def engine_options(url):
+    url = make_url(url)
+    options = {'pool_pre_ping': True}
+    if url.get_backend_name() == 'sqlite':
+        options['connect_args'] = {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if url.database in (None, '', ':memory:'):
+            return options  # Flask-SQLAlchemy pins in-memory databases to a single StaticPool connection
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE
+    )
+    return options
+
+def configure_engine(engine):
+    # Per-connection settings; also used by asgi.py for the async engine's sync facade
+    dialect = engine.dialect.name
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if dialect == 'sqlite':
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+            cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        elif dialect == 'postgresql' and DB_STATEMENT_TIMEOUT_MS:
+            cursor.execute(f'SET statement_timeout = {DB_STATEMENT_TIMEOUT_MS}')
+        cursor.close()
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
 db = SQLAlchemy(app)
 
+with app.app_context():
+    configure_engine(db.engine)
+
 # Database Models (unchanged)
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -59,6 +189,9 @@ class Employee(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
+    __table_args__ = (
+        db.Index('ix_employee_status_active', 'status', 'is_active'),
+    )
 
 class ActivityLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -67,6 +200,10 @@ class ActivityLog(db.Model):
     description = db.Column(db.String(500))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     activity_metadata = db.Column(db.Text)
+    __table_args__ = (
+        db.Index('ix_activity_log_employee_timestamp', 'employee_id', 'timestamp'),
+        db.Index('ix_activity_log_timestamp', 'timestamp'),
+    )
 
 class WorkSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -77,25 +214,55 @@ class WorkSession(db.Model):
     idle_time = db.Column(db.Float, default=0.0)
     productivity_score = db.Column(db.Integer, default=0)
     date = db.Column(db.Date, nullable=False)
+    last_event_at = db.Column(db.DateTime)
+    last_state = db.Column(db.String(20))
+    productive_time = db.Column(db.Float, default=0.0)
+    neutral_time = db.Column(db.Float, default=0.0)
+    unproductive_time = db.Column(db.Float, default=0.0)
+    __table_args__ = (
+        db.Index('ix_work_session_employee_date', 'employee_id', 'date'),
+        db.Index('ix_work_session_date', 'date'),
+    )
+
+# Dictionary tables: usage rows reference interned app names and website domains by id
+class AppName(db.Model):
+    __tablename__ = 'app_name'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+class WebDomain(db.Model):
+    __tablename__ = 'web_domain'
+    id = db.Column(db.Integer, primary_key=True)
+    domain = db.Column(db.String(255), nullable=False, unique=True)
 
 class AppUsage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
-    app_name = db.Column(db.String(100), nullable=False)
+    app_id = db.Column(db.Integer, db.ForeignKey('app_name.id'), nullable=False)
     duration = db.Column(db.Float, default=0.0)
     category = db.Column(db.String(20))
     date = db.Column(db.Date, nullable=False)
     last_used = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'app_id', 'date', name='uq_app_usage_employee_app_id_date'),
+        db.Index('ix_app_usage_employee_date', 'employee_id', 'date'),
+        db.Index('ix_app_usage_date', 'date'),
+    )
 
 class WebsiteVisit(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
-    url = db.Column(db.String(500), nullable=False)
+    domain_id = db.Column(db.Integer, db.ForeignKey('web_domain.id'), nullable=False)
     duration = db.Column(db.Float, default=0.0)
     visits = db.Column(db.Integer, default=1)
     category = db.Column(db.String(20))
     date = db.Column(db.Date, nullable=False)
     last_visited = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'domain_id', 'date', name='uq_website_visit_employee_domain_date'),
+        db.Index('ix_website_visit_employee_date', 'employee_id', 'date'),
+        db.Index('ix_website_visit_date', 'date'),
+    )
 
 class Settings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -104,7 +271,1456 @@ class Settings(db.Model):
     idle_timeout = db.Column(db.Integer, default=5)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-# JWT Token Decorator (unchanged)
+# Versioned schema migrations (replaces drop_all/create_all at startup)
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200))
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+def _ensure_indexes(model):
+    connection = db.session.connection()
+    existing = {ix['name'] for ix in inspect(connection).get_indexes(model.__tablename__)}
+    for index in model.__table__.indexes:
+        if index.name not in existing:
+            index.create(connection)
+
+def _ensure_unique(model, name, columns, merge_columns, latest_column):
+    # Tables created before the constraint existed may hold duplicate keys; fold them into the oldest row first.
+    # Works on the reflected table, since the key columns may no longer be on the model (see migration 10)
+    connection = db.session.connection()
+    inspector = inspect(connection)
+    if not set(columns) <= {c['name'] for c in inspector.get_columns(model.__tablename__)}:
+        return
+    existing = [set(u['column_names']) for u in inspector.get_unique_constraints(model.__tablename__)]
+    existing += [set(ix['column_names']) for ix in inspector.get_indexes(model.__tablename__) if ix['unique']]
+    if set(columns) in existing:
+        return
+    table = db.Table(model.__tablename__, db.MetaData(), autoload_with=connection)
+    key = [table.c[c] for c in columns]
+    duplicates = connection.execute(select(*key).group_by(*key).having(func.count() > 1)).all()
+    for values in duplicates:
+        rows = connection.execute(
+            select(table).where(*[col == value for col, value in zip(key, values)]).order_by(table.c.id)
+        ).mappings().all()
+        keeper = dict(rows[0])
+        for row in rows[1:]:
+            for column in merge_columns:
+                keeper[column] = (keeper[column] or 0) + (row[column] or 0)
+            if row[latest_column] and row[latest_column] > (keeper[latest_column] or datetime.min):
+                keeper[latest_column] = row[latest_column]
+        connection.execute(table.update().where(table.c.id == keeper['id']).values(
+            {column: keeper[column] for column in (*merge_columns, latest_column)}
+        ))
+        connection.execute(table.delete().where(table.c.id.in_([row['id'] for row in rows[1:]])))
+    db.Index(name, *key, unique=True).create(connection)
+
+def _ensure_columns(model):
+    connection = db.session.connection()
+    existing = {c['name'] for c in inspect(connection).get_columns(model.__tablename__)}
+    for column in model.__table__.columns:
+        if column.name not in existing:
+            connection.exec_driver_sql(
+                f'ALTER TABLE {model.__tablename__} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}'
+            )
+
+@migration(1, 'Initial schema')
+def _migration_initial_schema():
+    db.create_all()
+
+@migration(2, 'Unique accumulation keys for app usage and website visits')
+def _migration_unique_usage_keys():
+    _ensure_unique(AppUsage, 'uq_app_usage_employee_app_date', ['employee_id', 'app_name', 'date'], ['duration'], 'last_used')
+    _ensure_unique(WebsiteVisit, 'uq_website_visit_employee_url_date', ['employee_id', 'url', 'date'], ['duration', 'visits'], 'last_visited')
+
+@migration(3, 'Composite indexes for hot lookup paths')
+def _migration_hot_path_indexes():
+    for model in (Employee, ActivityLog, WorkSession, AppUsage, WebsiteVisit):
+        _ensure_indexes(model)
+
+def current_schema_version():
+    return db.session.query(func.max(SchemaVersion.version)).scalar() or 0
+
+def upgrade_schema():
+    SchemaVersion.__table__.create(db.engine, checkfirst=True)
+    current = current_schema_version()
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            fn()
+            db.session.add(SchemaVersion(version=version, description=description))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+# Query plan inspection for the hot lookup paths
+def explain_query(query):
+    statement = query.statement if hasattr(query, 'statement') else query
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = db.session.connection().exec_driver_sql(prefix + str(compiled), params).fetchall()
+    return [str(row[-1]) for row in rows]
+
+def hot_queries():
+    today = datetime.utcnow().date()
+    return {
+        'employee_today_session': WorkSession.query.filter_by(employee_id=1, date=today),
+        'dashboard_sessions': WorkSession.query.filter_by(date=today),
+        'dashboard_online_count': Employee.query.filter_by(status='online', is_active=True),
+        'recent_activities': ActivityLog.query.order_by(ActivityLog.timestamp.desc()).limit(20),
+        'employee_timeline': ActivityLog.query.filter(
+            ActivityLog.employee_id == 1,
+            ActivityLog.timestamp >= today,
+            ActivityLog.timestamp <= today + timedelta(days=1)
+        ).order_by(ActivityLog.timestamp),
+        'report_app_usage': AppUsage.query.filter(
+            AppUsage.employee_id == 1, AppUsage.date >= today, AppUsage.date <= today
+        ),
+        'report_websites': WebsiteVisit.query.filter(
+            WebsiteVisit.employee_id == 1, WebsiteVisit.date >= today, WebsiteVisit.date <= today
+        ),
+    }
+
+def is_full_scan(plan):
+    for line in plan:
+        if 'Seq Scan' in line:
+            return True
+        if line.startswith('SCAN ') and 'USING' not in line:
+            return True
+    return False
+
+# Atomic accumulation upserts (INSERT ... ON CONFLICT DO UPDATE)
+UPSERT_CHUNK_SIZE = 500
+
+def _dialect_insert(model, dialect=None):
+    dialect = dialect or db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'Upsert is not supported on {dialect}')
+    return insert(model)
+
+def app_usage_upsert(rows, dialect=None):
+    # rows: dicts with employee_id, app_id, date, duration, category, last_used
+    stmt = _dialect_insert(AppUsage, dialect).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=['employee_id', 'app_id', 'date'],
+        set_={
+            'duration': AppUsage.duration + stmt.excluded.duration,
+            'last_used': stmt.excluded.last_used
+        }
+    )
+
+def website_visit_upsert(rows, dialect=None):
+    # rows: dicts with employee_id, domain_id, date, duration, visits, category, last_visited
+    stmt = _dialect_insert(WebsiteVisit, dialect).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=['employee_id', 'domain_id', 'date'],
+        set_={
+            'duration': WebsiteVisit.duration + stmt.excluded.duration,
+            'visits': WebsiteVisit.visits + stmt.excluded.visits,
+            'last_visited': stmt.excluded.last_visited
+        }
+    )
+
+def upsert_app_usage(rows):
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        db.session.execute(app_usage_upsert(rows[i:i + UPSERT_CHUNK_SIZE]))
+
+def upsert_website_visits(rows):
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        db.session.execute(website_visit_upsert(rows[i:i + UPSERT_CHUNK_SIZE]))
+
+def upsert_replace(model, rows, keys):
+    # Insert rows, overwriting every non-key column on conflict
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[i:i + UPSERT_CHUNK_SIZE]
+        stmt = _dialect_insert(model).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={column: stmt.excluded[column] for column in chunk[0] if column not in keys}
+        )
+        db.session.execute(stmt)
+
+# Daily rollups per employee and per department, used by reports for full days
+ROLLUP_TOP_N = 10
+ROLLUP_CHUNK_DAYS = 7
+USAGE_CATEGORIES = ('productive', 'neutral', 'unproductive')
+
+class EmployeeDailyRollup(db.Model):
+    __tablename__ = 'employee_daily_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    department = db.Column(db.String(80), nullable=False, default='')
+    clock_in = db.Column(db.DateTime)
+    clock_out = db.Column(db.DateTime)
+    active_time = db.Column(db.Float, default=0.0)
+    idle_time = db.Column(db.Float, default=0.0)
+    productivity_score = db.Column(db.Integer, default=0)
+    productive_time = db.Column(db.Float, default=0.0)
+    neutral_time = db.Column(db.Float, default=0.0)
+    unproductive_time = db.Column(db.Float, default=0.0)
+    apps = db.Column(db.Text)  # JSON [[app_name, duration, category], ...] by duration desc
+    domains = db.Column(db.Text)  # JSON [[domain, duration, visits, category], ...] by duration desc
+    stale = db.Column(db.Boolean, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'date', name='uq_employee_daily_rollup_employee_date'),
+        db.Index('ix_employee_daily_rollup_date', 'date'),
+    )
+
+class DepartmentDailyRollup(db.Model):
+    __tablename__ = 'department_daily_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    department = db.Column(db.String(80), nullable=False, default='')
+    date = db.Column(db.Date, nullable=False)
+    employees = db.Column(db.Integer, default=0)
+    active_time = db.Column(db.Float, default=0.0)
+    idle_time = db.Column(db.Float, default=0.0)
+    productivity_score = db.Column(db.Integer, default=0)
+    productive_time = db.Column(db.Float, default=0.0)
+    neutral_time = db.Column(db.Float, default=0.0)
+    unproductive_time = db.Column(db.Float, default=0.0)
+    top_apps = db.Column(db.Text)
+    top_domains = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('department', 'date', name='uq_department_daily_rollup_department_date'),
+        db.Index('ix_department_daily_rollup_date', 'date'),
+    )
+
+class RollupDay(db.Model):
+    # A row here means every employee rollup for that date has been built
+    __tablename__ = 'rollup_day'
+    date = db.Column(db.Date, primary_key=True)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+@migration(4, 'Daily employee and department rollup tables')
+def _migration_rollup_tables():
+    db.create_all()
+
+def url_domain(url):
+    parsed = urlparse(url if '://' in url else f'//{url}')
+    return (parsed.hostname or url).lower()
+
+def _usage_category(category):
+    return category if category in USAGE_CATEGORIES else 'neutral'
+
+# Category time is app time, except that website time is moved out of the browser's category into the
+# site's own: a YouTube tab inside a neutral Chrome window counts as unproductive. The browser is the day's
+# most-used app named in BROWSER_APPS; at most its own time is moved, and without one site time is added.
+BROWSER_APPS = sorted({
+    name.strip().lower() for name in os.getenv(
+        'BROWSER_APPS', 'Chrome,Google Chrome,Chromium,Firefox,Microsoft Edge,Edge,Safari,Brave,Opera,Arc,Vivaldi'
+    ).split(',') if name.strip()
+})
+
+def category_totals(apps, sites):
+    # One employee-day. apps: (app_name, category, duration) rows; sites: (category, duration) rows
+    totals = dict.fromkeys(USAGE_CATEGORIES, 0.0)
+    browser = max(((duration or 0, _usage_category(category)) for name, category, duration in apps
+                   if name.lower() in BROWSER_APPS), default=None)
+    for _, category, duration in apps:
+        totals[_usage_category(category)] += duration or 0
+    site_time = 0.0
+    for category, duration in sites:
+        totals[_usage_category(category)] += duration or 0
+        site_time += duration or 0
+    if browser:
+        totals[browser[1]] -= min(site_time, browser[0])
+    return totals
+
+def _add_usage(totals, key, duration, category, visits=None):
+    entry = totals.setdefault(key, [0.0, 0, category])
+    entry[0] += duration or 0
+    if visits:
+        entry[1] += visits
+
+def _ranked(totals, with_visits, limit=None):
+    ranked = sorted(totals.items(), key=lambda item: -item[1][0])[:limit]
+    if with_visits:
+        return [[key, round(duration, 4), visits, category] for key, (duration, visits, category) in ranked]
+    return [[key, round(duration, 4), category] for key, (duration, _, category) in ranked]
+
+def rebuild_employee_rollups(start_date, end_date, employee_ids=None):
+    def scoped(query, model):
+        query = query.filter(model.date >= start_date, model.date <= end_date)
+        if employee_ids is not None:
+            query = query.filter(model.employee_id.in_(employee_ids))
+        return query
+    sessions = scoped(db.session.query(
+        WorkSession.employee_id, WorkSession.date, WorkSession.clock_in, WorkSession.clock_out,
+        WorkSession.active_time, WorkSession.idle_time, WorkSession.productivity_score
+    ), WorkSession).all()
+    apps = scoped(db.session.query(
+        AppUsage.employee_id, AppUsage.date, AppName.name, AppUsage.category, func.sum(AppUsage.duration)
+    ).join(AppName, AppName.id == AppUsage.app_id), AppUsage).group_by(
+        AppUsage.employee_id, AppUsage.date, AppName.name, AppUsage.category
+    ).all()
+    websites = scoped(db.session.query(
+        WebsiteVisit.employee_id, WebsiteVisit.date, WebDomain.domain, WebsiteVisit.category,
+        func.sum(WebsiteVisit.duration), func.sum(WebsiteVisit.visits)
+    ).join(WebDomain, WebDomain.id == WebsiteVisit.domain_id), WebsiteVisit).group_by(
+        WebsiteVisit.employee_id, WebsiteVisit.date, WebDomain.domain, WebsiteVisit.category
+    ).all()
+    departments = db.session.query(Employee.id, Employee.department)
+    if employee_ids is not None:
+        departments = departments.filter(Employee.id.in_(employee_ids))
+    departments = {emp_id: department or '' for emp_id, department in departments}
+    rollups = {}
+    def rollup(employee_id, day):
+        return rollups.setdefault((employee_id, day), {
+            'clock_in': None, 'clock_out': None, 'active_time': 0.0, 'idle_time': 0.0, 'scores': [],
+            'app_rows': [], 'site_rows': [], 'apps': {}, 'domains': {}
+        })
+    for employee_id, day, clock_in, clock_out, active_time, idle_time, score in sessions:
+        entry = rollup(employee_id, day)
+        entry['clock_in'] = min(filter(None, (entry['clock_in'], clock_in)), default=None)
+        entry['clock_out'] = max(filter(None, (entry['clock_out'], clock_out)), default=None)
+        entry['active_time'] += active_time or 0
+        entry['idle_time'] += idle_time or 0
+        entry['scores'].append(score or 0)
+    for employee_id, day, app_name, category, duration in apps:
+        entry = rollup(employee_id, day)
+        entry['app_rows'].append((app_name, category, duration))
+        _add_usage(entry['apps'], app_name, duration, category)
+    for employee_id, day, domain, category, duration, visits in websites:
+        entry = rollup(employee_id, day)
+        entry['site_rows'].append((category, duration))
+        _add_usage(entry['domains'], domain, duration, category, visits)
+    for entry in rollups.values():
+        entry['categories'] = category_totals(entry['app_rows'], entry['site_rows'])
+    now = datetime.utcnow()
+    rows = [{
+        'employee_id': employee_id,
+        'date': day,
+        'department': departments.get(employee_id, ''),
+        'clock_in': entry['clock_in'],
+        'clock_out': entry['clock_out'],
+        'active_time': entry['active_time'],
+        'idle_time': entry['idle_time'],
+        'productivity_score': round(sum(entry['scores']) / len(entry['scores'])) if entry['scores'] else 0,
+        'productive_time': entry['categories']['productive'],
+        'neutral_time': entry['categories']['neutral'],
+        'unproductive_time': entry['categories']['unproductive'],
+        'apps': json.dumps(_ranked(entry['apps'], False)),
+        'domains': json.dumps(_ranked(entry['domains'], True)),
+        'stale': False,
+        'updated_at': now
+    } for (employee_id, day), entry in rollups.items()]
+    upsert_replace(EmployeeDailyRollup, rows, ['employee_id', 'date'])
+    return rows
+
+def rebuild_department_rollups(days):
+    if not days:
+        return []
+    departments = {}
+    for r in EmployeeDailyRollup.query.filter(EmployeeDailyRollup.date.in_(days)):
+        entry = departments.setdefault((r.department, r.date), {
+            'employees': 0, 'active_time': 0.0, 'idle_time': 0.0, 'scores': [],
+            'categories': dict.fromkeys(USAGE_CATEGORIES, 0.0), 'apps': {}, 'domains': {}
+        })
+        entry['employees'] += 1
+        entry['active_time'] += r.active_time or 0
+        entry['idle_time'] += r.idle_time or 0
+        if r.clock_in:
+            entry['scores'].append(r.productivity_score or 0)
+        for category in USAGE_CATEGORIES:
+            entry['categories'][category] += getattr(r, f'{category}_time') or 0
+        for app_name, duration, category in json.loads(r.apps or '[]'):
+            _add_usage(entry['apps'], app_name, duration, category)
+        for domain, duration, visits, category in json.loads(r.domains or '[]'):
+            _add_usage(entry['domains'], domain, duration, category, visits)
+    now = datetime.utcnow()
+    rows = [{
+        'department': department,
+        'date': day,
+        'employees': entry['employees'],
+        'active_time': entry['active_time'],
+        'idle_time': entry['idle_time'],
+        'productivity_score': round(sum(entry['scores']) / len(entry['scores'])) if entry['scores'] else 0,
+        'productive_time': entry['categories']['productive'],
+        'neutral_time': entry['categories']['neutral'],
+        'unproductive_time': entry['categories']['unproductive'],
+        'top_apps': json.dumps(_ranked(entry['apps'], False, ROLLUP_TOP_N)),
+        'top_domains': json.dumps(_ranked(entry['domains'], True, ROLLUP_TOP_N)),
+        'updated_at': now
+    } for (department, day), entry in departments.items()]
+    upsert_replace(DepartmentDailyRollup, rows, ['department', 'date'])
+    return rows
+
+def mark_rollups_stale(employee_id, days):
+    # Late-arriving events for already rolled-up days; today's data is always read raw
+    today = datetime.utcnow().date()
+    days = [day for day in set(days) if day < today]
+    if not days:
+        return
+    stmt = _dialect_insert(EmployeeDailyRollup).values([
+        {'employee_id': employee_id, 'date': day, 'department': '', 'stale': True} for day in days
+    ])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['employee_id', 'date'],
+        set_={'stale': True}
+    ))
+
+def backfill_rollups(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        chunk_end = min(day + timedelta(days=ROLLUP_CHUNK_DAYS - 1), end_date)
+        days = [day + timedelta(days=i) for i in range((chunk_end - day).days + 1)]
+        rebuild_employee_rollups(day, chunk_end)
+        rebuild_department_rollups(days)
+        upsert_replace(RollupDay, [{'date': d, 'refreshed_at': datetime.utcnow()} for d in days], ['date'])
+        db.session.commit()
+        day = chunk_end + timedelta(days=1)
+
+def refresh_stale_rollups(start_date=None, end_date=None, employee_ids=None):
+    query = db.session.query(EmployeeDailyRollup.employee_id, EmployeeDailyRollup.date).filter(EmployeeDailyRollup.stale.is_(True))
+    if start_date:
+        query = query.filter(EmployeeDailyRollup.date >= start_date, EmployeeDailyRollup.date <= end_date)
+    if employee_ids is not None:
+        query = query.filter(EmployeeDailyRollup.employee_id.in_(employee_ids))
+    stale = {}
+    for emp_id, day in query:
+        stale.setdefault(emp_id, []).append(day)
+    for emp_id, days in stale.items():
+        rebuild_employee_rollups(min(days), max(days), [emp_id])
+    days = sorted({day for days in stale.values() for day in days})
+    rebuild_department_rollups(days)
+    db.session.commit()
+    return days
+
+class RollupBuilder:
+    # Backfills missing days and refreshes stale ones off the request path, one build at a time per process;
+    # `flask rollup-backfill` does the same ahead of time. Requests arriving mid-build widen the next one.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = None
+        self._thread = None
+        self.builds = 0
+
+    def request(self, start_date, end_date):
+        with self._lock:
+            if self._pending:
+                start_date, end_date = min(start_date, self._pending[0]), max(end_date, self._pending[1])
+            self._pending = (start_date, end_date)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='rollup-builder', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._pending is None:
+                    self._thread = None
+                    return
+                start_date, end_date = self._pending
+                self._pending = None
+            with app.app_context():
+                try:
+                    self.build(start_date, end_date)
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception('Rollup build failed')
+
+    def build(self, start_date, end_date):
+        covered = {day for (day,) in db.session.query(RollupDay.date).filter(
+            RollupDay.date >= start_date, RollupDay.date <= end_date
+        )}
+        missing = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        missing = [day for day in missing if day not in covered]
+        if missing:
+            backfill_rollups(missing[0], missing[-1])
+        refresh_stale_rollups(start_date, end_date)
+        self.builds += 1
+
+    def stats(self):
+        return {'builds': self.builds, 'running': self._thread is not None}
+
+rollup_builder = RollupBuilder()
+
+def rollup_coverage(start_date, end_date, employee_ids=None):
+    # Full days of the range whose rollups are built and current. Callers read every other day raw; the
+    # builder is asked to catch up so later requests can use the rollups.
+    last_full = min(end_date, datetime.utcnow().date() - timedelta(days=1))
+    if start_date > last_full:
+        return set()
+    covered = {day for (day,) in db.session.query(RollupDay.date).filter(
+        RollupDay.date >= start_date, RollupDay.date <= last_full
+    )}
+    stale = db.session.query(EmployeeDailyRollup.date).filter(
+        EmployeeDailyRollup.stale.is_(True),
+        EmployeeDailyRollup.date >= start_date,
+        EmployeeDailyRollup.date <= last_full
+    )
+    if employee_ids is not None:
+        stale = stale.filter(EmployeeDailyRollup.employee_id.in_(employee_ids))
+    covered -= {day for (day,) in stale.distinct()}
+    if len(covered) < (last_full - start_date).days + 1:
+        rollup_builder.request(start_date, last_full)
+    return covered
+
+def _day_runs(days):
+    # Sorted days -> [(first, last)] for each consecutive run, so raw reads stay range scans
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+REPORT_ID_CHUNK = 500
+REPORT_VERSIONS = ('1', '2')
+SUMMARY_KEYS = ('active_time', 'idle_time', *(f'{c}_time' for c in USAGE_CATEGORIES))
+REPORT_TABLE_FIELDS = {
+    'sessions': ('date', 'clock_in', 'clock_out', 'active_time', 'idle_time', 'productivity'),
+    'app_usage': ('app', 'duration', 'category'),
+    'websites': ('url', 'duration', 'visits', 'category'),
+}
+
+def _session_json(date, clock_in, clock_out, active_time, idle_time, productivity):
+    return {
+        'date': date.isoformat(),
+        'clock_in': clock_in.isoformat(),
+        'clock_out': clock_out.isoformat() if clock_out else None,
+        'active_time': active_time,
+        'idle_time': idle_time,
+        'productivity': productivity
+    }
+
+def build_report_data_bulk(employees, start_date, end_date, daily=False):
+    # Set-based: a handful of IN-batched queries for any number of employees. Rollups serve the days they
+    # cover and raw rows the rest. daily=True gives the original report layout: app and website rows per
+    # day rather than per range, and no summary.
+    state = {emp.id: {
+        'sessions': [], 'apps': {}, 'domains': {}, 'app_days': [], 'domain_days': [],
+        'summary': dict.fromkeys(SUMMARY_KEYS, 0.0)
+    } for emp in employees}
+    ids = list(state)
+    chunks = [ids[i:i + REPORT_ID_CHUNK] for i in range(0, len(ids), REPORT_ID_CHUNK)]
+    covered = rollup_coverage(start_date, end_date, ids) if ids else set()
+    raw_runs = _day_runs([
+        day for day in (start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1))
+        if day not in covered
+    ])
+    if covered:
+        for chunk in chunks:
+            rollups = db.session.query(
+                EmployeeDailyRollup.employee_id, EmployeeDailyRollup.date, EmployeeDailyRollup.clock_in,
+                EmployeeDailyRollup.clock_out, EmployeeDailyRollup.productivity_score, EmployeeDailyRollup.apps,
+                EmployeeDailyRollup.domains, *[getattr(EmployeeDailyRollup, key) for key in SUMMARY_KEYS]
+            ).filter(
+                EmployeeDailyRollup.employee_id.in_(chunk),
+                EmployeeDailyRollup.date >= min(covered),
+                EmployeeDailyRollup.date <= max(covered)
+            )
+            for r in rollups:
+                if r.date not in covered:
+                    continue
+                entry = state[r.employee_id]
+                if r.clock_in:
+                    entry['sessions'].append(_session_json(
+                        r.date, r.clock_in, r.clock_out, r.active_time, r.idle_time, r.productivity_score
+                    ))
+                for key in entry['summary']:
+                    entry['summary'][key] += getattr(r, key) or 0
+                for app_name, duration, category in loads_json(r.apps or '[]'):
+                    _add_usage(entry['apps'], app_name, duration, category)
+                    entry['app_days'].append((r.date, app_name, duration, category))
+                for domain, duration, visits, category in loads_json(r.domains or '[]'):
+                    _add_usage(entry['domains'], domain, duration, category, visits)
+                    entry['domain_days'].append((r.date, domain, duration, visits, category))
+    if raw_runs:
+        def raw_days(column):
+            return or_(*[column.between(first, last) for first, last in raw_runs])
+        for chunk in chunks:
+            for s in db.session.query(
+                WorkSession.employee_id, WorkSession.date, WorkSession.clock_in, WorkSession.clock_out,
+                WorkSession.active_time, WorkSession.idle_time, WorkSession.productivity_score
+            ).filter(WorkSession.employee_id.in_(chunk), raw_days(WorkSession.date)):
+                entry = state[s.employee_id]
+                entry['sessions'].append(_session_json(
+                    s.date, s.clock_in, s.clock_out, s.active_time, s.idle_time, s.productivity_score
+                ))
+                entry['summary']['active_time'] += s.active_time or 0
+                entry['summary']['idle_time'] += s.idle_time or 0
+            days = {}
+            for employee_id, day, app_name, duration, category in db.session.query(
+                AppUsage.employee_id, AppUsage.date, AppName.name, AppUsage.duration, AppUsage.category
+            ).join(AppName, AppName.id == AppUsage.app_id).filter(
+                AppUsage.employee_id.in_(chunk), raw_days(AppUsage.date)
+            ):
+                days.setdefault((employee_id, day), ([], []))[0].append((app_name, category, duration))
+                _add_usage(state[employee_id]['apps'], app_name, duration, category)
+                state[employee_id]['app_days'].append((day, app_name, duration, category))
+            for employee_id, day, domain, duration, category, visits in db.session.query(
+                WebsiteVisit.employee_id, WebsiteVisit.date, WebDomain.domain, WebsiteVisit.duration,
+                WebsiteVisit.category, WebsiteVisit.visits
+            ).join(WebDomain, WebDomain.id == WebsiteVisit.domain_id).filter(
+                WebsiteVisit.employee_id.in_(chunk), raw_days(WebsiteVisit.date)
+            ):
+                days.setdefault((employee_id, day), ([], []))[1].append((category, duration))
+                _add_usage(state[employee_id]['domains'], domain, duration, category, visits)
+                state[employee_id]['domain_days'].append((day, domain, duration, visits, category))
+            for (employee_id, _), (app_rows, site_rows) in days.items():
+                summary = state[employee_id]['summary']
+                for category, hours in category_totals(app_rows, site_rows).items():
+                    summary[f'{category}_time'] += hours
+    reports = {}
+    for employee in employees:
+        entry = state[employee.id]
+        report = {
+            'employee': {
+                'id': employee.id,
+                'name': employee.name,
+                'email': employee.email,
+                'department': employee.department,
+                'position': employee.position
+            },
+            'sessions': sorted(entry['sessions'], key=lambda session: session['date'])
+        }
+        if daily:
+            report['app_usage'] = [{
+                'app': app_name,
+                'duration': duration,
+                'category': category
+            } for _, app_name, duration, category in sorted(entry['app_days'], key=lambda row: (row[0], -row[2]))]
+            report['websites'] = [{
+                'url': domain,
+                'duration': duration,
+                'visits': visits,
+                'category': category
+            } for _, domain, duration, visits, category in sorted(entry['domain_days'], key=lambda row: (row[0], -row[2]))]
+        else:
+            report['summary'] = {key: round(value, 2) for key, value in entry['summary'].items()}
+            report['app_usage'] = [{
+                'app': app_name,
+                'duration': duration,
+                'category': category
+            } for app_name, duration, category in _ranked(entry['apps'], False)]
+            report['websites'] = [{
+                'url': domain,
+                'duration': duration,
+                'visits': visits,
+                'category': category
+            } for domain, duration, visits, category in _ranked(entry['domains'], True)]
+        reports[employee.id] = report
+    return reports
+
+def build_report_data(employee, start_date, end_date, daily=False):
+    return build_report_data_bulk([employee], start_date, end_date, daily)[employee.id]
+
+# Session accounting: running active/idle totals and productivity score, O(1) per event
+PRODUCTIVITY_WEIGHTS = {'productive': 1.0, 'neutral': 0.5, 'unproductive': 0.0}
+
+@migration(6, 'Session accounting columns on work_session')
+def _migration_session_accounting():
+    _ensure_columns(WorkSession)
+
+# Settings cache: an immutable snapshot per process, replaced whole on reload. Other workers pick up
+# a save through a cheap max(updated_at) probe that runs at most once per SETTINGS_PROBE_INTERVAL.
+SETTINGS_PROBE_INTERVAL = float(os.getenv('SETTINGS_PROBE_INTERVAL', 5))
+SettingsValues = namedtuple('SettingsValues', ['work_start', 'work_end', 'idle_timeout'])
+DEFAULT_SETTINGS = SettingsValues(
+    datetime.strptime('09:00', '%H:%M').time(), datetime.strptime('17:00', '%H:%M').time(), 5
+)
+
+class DepartmentSettings(db.Model):
+    __tablename__ = 'department_settings'
+    id = db.Column(db.Integer, primary_key=True)
+    department = db.Column(db.String(80), nullable=False, unique=True)
+    work_start = db.Column(db.Time)  # NULL inherits the global value
+    work_end = db.Column(db.Time)
+    idle_timeout = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+@migration(9, 'Per-department settings overrides')
+def _migration_department_settings():
+    db.create_all()
+
+class SettingsCache:
+    def __init__(self):
+        # (version, defaults, resolved {department: SettingsValues}, raw overrides {department: SettingsValues})
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.probes = 0
+
+    def _version(self):
+        self.probes += 1
+        return tuple(db.session.query(
+            db.session.query(func.max(Settings.updated_at)).scalar_subquery(),
+            db.session.query(func.max(DepartmentSettings.updated_at)).scalar_subquery(),
+            db.session.query(func.count(DepartmentSettings.id)).scalar_subquery()
+        ).one())
+
+    def reload(self):
+        version = self._version()
+        row = Settings.query.first()
+        defaults = SettingsValues(row.work_start, row.work_end, row.idle_timeout) if row else DEFAULT_SETTINGS
+        resolved = {}
+        raw = {}
+        for override in DepartmentSettings.query:
+            raw[override.department] = SettingsValues(override.work_start, override.work_end, override.idle_timeout)
+            resolved[override.department] = SettingsValues(*[
+                default if value is None else value for value, default in zip(raw[override.department], defaults)
+            ])
+        self._snapshot = (version, defaults, resolved, raw)
+        self._checked_at = time.monotonic()
+        self.loads += 1
+
+    def _current(self):
+        if self._snapshot is None or time.monotonic() - self._checked_at >= SETTINGS_PROBE_INTERVAL:
+            with self._lock:
+                if self._snapshot is None:
+                    self.reload()
+                elif time.monotonic() - self._checked_at >= SETTINGS_PROBE_INTERVAL:
+                    self._checked_at = time.monotonic()
+                    if self._version() != self._snapshot[0]:
+                        self.reload()
+        return self._snapshot
+
+    def get(self, department=None):
+        _, defaults, resolved, _ = self._current()
+        return resolved.get(department, defaults)
+
+    def for_employee(self, employee_id):
+        _, defaults, resolved, _ = self._current()
+        if not resolved:
+            return defaults
+        principal = get_principal(employee_id)
+        return resolved.get(principal['department'], defaults) if principal else defaults
+
+    def overrides(self):
+        return self._current()[3]
+
+    def stats(self):
+        return {'loads': self.loads, 'probes': self.probes, 'departments': len(self._snapshot[2]) if self._snapshot else 0}
+
+settings_cache = SettingsCache()
+
+def _clipped_hours(start, end, settings):
+    # Only time inside the configured working window counts; a window with end <= start disables clipping
+    window_start = datetime.combine(start.date(), settings.work_start)
+    window_end = datetime.combine(start.date(), settings.work_end)
+    if window_end > window_start:
+        start, end = max(start, window_start), min(end, window_end)
+    return max((end - start).total_seconds(), 0) / 3600
+
+def _accrue(session, until, settings):
+    since = session.last_event_at
+    if not since or until <= since or session.last_state not in ('active', 'idle'):
+        return
+    if session.last_state == 'active':
+        # Active time stops accruing idle_timeout minutes after the last event; silence beyond that is idle
+        active_end = min(until, since + timedelta(minutes=settings.idle_timeout))
+        session.active_time = (session.active_time or 0) + _clipped_hours(since, active_end, settings)
+        since = active_end
+    session.idle_time = (session.idle_time or 0) + _clipped_hours(since, until, settings)
+
+def score_session(session):
+    active = session.active_time or 0
+    tracked = active + (session.idle_time or 0)
+    if not tracked:
+        return 0
+    usage = {category: getattr(session, f'{category}_time') or 0 for category in USAGE_CATEGORIES}
+    total = sum(usage.values())
+    focus = sum(PRODUCTIVITY_WEIGHTS[c] * v for c, v in usage.items()) / total if total else 1.0
+    return round(100 * active / tracked * focus)
+
+def apply_session_event(session, activity_type, at, settings):
+    if session.last_event_at and at < session.last_event_at:
+        return  # out of order; recompute_session() corrects these
+    _accrue(session, at, settings)
+    session.last_event_at = at
+    if activity_type in ('active', 'clockin'):
+        session.last_state = 'active'
+        session.clock_out = None  # back at work after an earlier clockout
+    elif activity_type == 'idle':
+        session.last_state = 'idle'
+    elif activity_type == 'clockout':
+        session.last_state = 'offline'
+        session.clock_out = at
+    session.productivity_score = score_session(session)
+
+def new_work_session(employee_id, at):
+    return WorkSession(
+        employee_id=employee_id,
+        clock_in=at,
+        date=at.date(),
+        active_time=0.0,
+        idle_time=0.0,
+        productivity_score=0,
+        last_event_at=at,
+        last_state='active'
+    )
+
+def record_session_event(employee_id, activity_type, at, settings=None, sessions=None):
+    # `sessions` memoizes rows across a batch of events so each (employee, day) is selected once
+    key = (employee_id, at.date())
+    session = sessions.get(key) if sessions is not None else None
+    if session is None:
+        session = WorkSession.query.filter_by(employee_id=employee_id, date=at.date()).first()
+    if not session:
+        session = new_work_session(employee_id, at)
+        # Usage logged before the first event of the day had no session row to update
+        apply_session_usage(session, day_category_totals(employee_id, at.date()))
+        db.session.add(session)
+    if sessions is not None:
+        sessions[key] = session
+    apply_session_event(session, activity_type, at, settings or settings_cache.for_employee(employee_id))
+    return session
+
+def session_usage_queries(employee_id, day):
+    # The (apps, sites) rows category_totals takes for one employee-day
+    apps = select(AppName.name, AppUsage.category, AppUsage.duration).join(
+        AppName, AppName.id == AppUsage.app_id
+    ).where(AppUsage.employee_id == employee_id, AppUsage.date == day)
+    sites = select(WebsiteVisit.category, func.sum(WebsiteVisit.duration)).where(
+        WebsiteVisit.employee_id == employee_id, WebsiteVisit.date == day
+    ).group_by(WebsiteVisit.category)
+    return apps, sites
+
+def day_category_totals(employee_id, day):
+    apps, sites = session_usage_queries(employee_id, day)
+    return category_totals(db.session.execute(apps).all(), db.session.execute(sites).all())
+
+def apply_session_usage(session, totals):
+    for category, hours in totals.items():
+        setattr(session, f'{category}_time', hours)
+    session.productivity_score = score_session(session)
+
+def refresh_session_usage(employee_id, day):
+    # Category totals are re-derived from the day's usage rows (a few dozen at most) rather than incremented,
+    # so they always match recompute_session. FOR UPDATE serializes concurrent refreshes of one session on
+    # PostgreSQL, and the totals are read after the lock; SQLite already serializes writers.
+    session = WorkSession.query.filter_by(employee_id=employee_id, date=day).with_for_update().first()
+    if session:
+        apply_session_usage(session, day_category_totals(employee_id, day))
+    return session
+
+def recompute_session(session, settings=None):
+    # Replays the day's raw events from scratch; used to correct out-of-order or backfilled data
+    settings = settings or settings_cache.for_employee(session.employee_id)
+    session.active_time = 0.0
+    session.idle_time = 0.0
+    apply_session_usage(session, day_category_totals(session.employee_id, session.date))
+    session.last_event_at = session.clock_in
+    session.last_state = 'active'
+    session.clock_out = None
+    events = db.session.query(ActivityLog.id, ActivityLog.activity_type, ActivityLog.timestamp).filter(
+        ActivityLog.employee_id == session.employee_id,
+        ActivityLog.timestamp >= session.date,
+        ActivityLog.timestamp < session.date + timedelta(days=1)
+    ).order_by(ActivityLog.timestamp, ActivityLog.id)
+    archived = archived_activities(session.employee_id, session.date, session.date)
+    for event_row in heapq.merge(archived, events.yield_per(TIMELINE_STREAM_BATCH), key=_activity_sort_key):
+        apply_session_event(session, event_row.activity_type, event_row.timestamp, settings)
+    session.productivity_score = score_session(session)
+    mark_rollups_stale(session.employee_id, [session.date])
+    return session
+
+def recompute_sessions(day, employee_id=None):
+    query = WorkSession.query.filter_by(date=day)
+    if employee_id is not None:
+        query = query.filter_by(employee_id=employee_id)
+    sessions = [recompute_session(session) for session in query]
+    db.session.commit()
+    return sessions
+
+# Write-behind buffer for ActivityLog (opt-in with ACTIVITY_WRITE_BEHIND=1)
+ACTIVITY_WRITE_BEHIND = os.getenv('ACTIVITY_WRITE_BEHIND', '0') == '1'
+ACTIVITY_QUEUE_MAX = int(os.getenv('ACTIVITY_QUEUE_MAX', 10000))
+ACTIVITY_FLUSH_ROWS = int(os.getenv('ACTIVITY_FLUSH_ROWS', 500))
+ACTIVITY_FLUSH_INTERVAL_MS = int(os.getenv('ACTIVITY_FLUSH_INTERVAL_MS', 500))
+ACTIVITY_ENQUEUE_TIMEOUT = float(os.getenv('ACTIVITY_ENQUEUE_TIMEOUT', 2))
+ACTIVITY_JOURNAL_DIR = os.getenv('ACTIVITY_JOURNAL_DIR', os.path.join(app.instance_path, 'activity_journal'))
+
+class BufferFull(Exception):
+    pass
+
+def write_activity_records(records):
+    rows = [{
+        'employee_id': r['employee_id'],
+        'activity_type': r['activity_type'],
+        'description': r.get('description'),
+        'timestamp': datetime.fromisoformat(r['timestamp']),
+        'activity_metadata': r.get('activity_metadata')
+    } for r in records]
+    db.session.bulk_insert_mappings(ActivityLog, rows)
+    sessions = {}
+    for row in sorted(rows, key=lambda r: r['timestamp']):
+        record_session_event(row['employee_id'], row['activity_type'], row['timestamp'], sessions=sessions)
+    for employee_id, day in sessions:
+        mark_rollups_stale(employee_id, [day])
+    db.session.commit()
+    response_cache.bump('activity', 'sessions')
+
+class ActivityWriteBuffer:
+    # Events are journaled to a per-process append-only segment before they are queued; a segment is
+    # deleted only after the rows it holds are committed, and segments left by dead workers are replayed
+    def __init__(self, journal_dir, maxsize, flush_rows, flush_interval):
+        self.journal_dir = journal_dir
+        self.maxsize = maxsize
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._cond = threading.Condition()
+        self._items = []
+        self._journal = None
+        self._segment = None
+        self._segment_seq = 0
+        self._token = uuid.uuid4().hex[:8]
+        self._pending_segments = []
+        self._thread = None
+        self._stopping = False
+        self.enqueued = 0
+        self.flushed = 0
+        self.rejected = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def _open_segment(self):
+        self._segment_seq += 1
+        self._segment = os.path.join(self.journal_dir, f'{os.getpid()}-{self._token}-{self._segment_seq}.jsonl')
+        self._journal = open(self._segment, 'a', encoding='utf-8', buffering=1)
+
+    def _recover(self):
+        for name in sorted(os.listdir(self.journal_dir)):
+            if '.jsonl' not in name:
+                continue
+            owner = int(name.rsplit('replay-', 1)[1]) if 'replay-' in name else int(name.split('-', 1)[0])
+            if owner == os.getpid() or pid_alive(owner):
+                continue
+            claimed = os.path.join(self.journal_dir, f"{name.split('.jsonl')[0]}.jsonl.replay-{os.getpid()}")
+            try:
+                os.rename(os.path.join(self.journal_dir, name), claimed)
+            except FileNotFoundError:
+                continue  # another worker claimed it first
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._items.append(json.loads(line))
+                    except ValueError:
+                        pass  # torn final line from the crash
+            self._pending_segments.append(claimed)
+
+    def start(self):
+        if self._thread:
+            return
+        with self._cond:
+            if self._thread:
+                return
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._recover()
+            self._open_segment()
+            self._thread = threading.Thread(target=self._run, name='activity-flusher', daemon=True)
+            self._thread.start()
+
+    def put(self, record):
+        self.start()
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: len(self._items) < self.maxsize, timeout=ACTIVITY_ENQUEUE_TIMEOUT)
+                if len(self._items) >= self.maxsize:
+                    self.rejected += 1
+                    raise BufferFull()
+            self._journal.write(json.dumps(record) + '\n')
+            self._items.append(record)
+            self.enqueued += 1
+            if len(self._items) >= self.flush_rows:
+                self._cond.notify_all()
+
+    def _take(self):
+        with self._cond:
+            items, self._items = self._items, []
+            segments = self._pending_segments
+            self._pending_segments = []
+            if items and self._journal:
+                self._journal.close()
+                segments.append(self._segment)
+                self._open_segment()
+            self._cond.notify_all()
+        return items, segments
+
+    def flush(self):
+        items, segments = self._take()
+        if items:
+            started = time.perf_counter()
+            try:
+                with app.app_context():
+                    try:
+                        write_activity_records(items)
+                    except Exception:
+                        db.session.rollback()
+                        raise
+            except Exception:
+                with self._cond:
+                    self._items[:0] = items
+                    self._pending_segments[:0] = segments
+                self.flush_errors += 1
+                raise
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+            self.flushed += len(items)
+            self.flush_count += 1
+        for segment in segments:
+            try:
+                os.remove(segment)
+            except FileNotFoundError:
+                pass
+        return len(items)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or len(self._items) >= self.flush_rows,
+                    timeout=self.flush_interval
+                )
+                stopping = self._stopping
+            if stopping:
+                return
+            try:
+                self.flush()
+            except Exception:
+                app.logger.exception('Activity flush failed')
+
+    def drain(self):
+        if not self._thread:
+            return 0
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout=10)
+        flushed = self.flush()
+        with self._cond:
+            self._journal.close()
+            if not self._items:
+                os.remove(self._segment)
+        return flushed
+
+    def stats(self):
+        return {
+            'depth': len(self._items),
+            'maxsize': self.maxsize,
+            'enqueued': self.enqueued,
+            'flushed': self.flushed,
+            'rejected': self.rejected,
+            'flush_count': self.flush_count,
+            'flush_errors': self.flush_errors,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2)
+        }
+
+activity_buffer = ActivityWriteBuffer(
+    ACTIVITY_JOURNAL_DIR, ACTIVITY_QUEUE_MAX, ACTIVITY_FLUSH_ROWS, ACTIVITY_FLUSH_INTERVAL_MS / 1000
+) if ACTIVITY_WRITE_BEHIND else None
+
+if activity_buffer:
+    atexit.register(activity_buffer.drain)
+
+# Shared query layer for admin views (single JOINs instead of per-row lookups)
+def query_recent_activities(limit, employee_id=None):
+    query = db.session.query(ActivityLog, Employee.name).join(Employee, ActivityLog.employee_id == Employee.id)
+    if employee_id is not None:
+        query = query.filter(ActivityLog.employee_id == employee_id)
+    return query.order_by(ActivityLog.timestamp.desc()).limit(limit).all()
+
+# Server-side KPI aggregation over work sessions (no ORM hydration)
+KPI_GROUPINGS = ('department', 'date', 'employee')
+
+def aggregate_session_kpis(start_date, end_date, group_by=None, department=None):
+    columns = [
+        func.coalesce(func.sum(WorkSession.active_time), 0.0).label('total_hours'),
+        func.coalesce(func.sum(WorkSession.idle_time), 0.0).label('total_idle'),
+        func.coalesce(func.avg(WorkSession.productivity_score), 0.0).label('avg_productivity'),
+        func.count(WorkSession.id).label('sessions')
+    ]
+    keys = []
+    if group_by == 'department':
+        keys = [Employee.department.label('department')]
+    elif group_by == 'date':
+        keys = [WorkSession.date.label('date')]
+    elif group_by == 'employee':
+        keys = [WorkSession.employee_id.label('employee_id'), Employee.name.label('name')]
+    elif group_by is not None:
+        raise ValueError(f'Unknown grouping: {group_by}')
+    query = db.session.query(*keys, *columns).filter(
+        WorkSession.date >= start_date,
+        WorkSession.date <= end_date
+    )
+    if group_by in ('department', 'employee') or department:
+        query = query.join(Employee, WorkSession.employee_id == Employee.id)
+    if department:
+        query = query.filter(Employee.department == department)
+    if keys:
+        query = query.group_by(*keys).order_by(*keys)
+    result = []
+    for row in query.all():
+        kpis = row._asdict()
+        kpis['total_hours'] = round(kpis['total_hours'], 1)
+        kpis['total_idle'] = round(kpis['total_idle'], 1)
+        kpis['avg_productivity'] = round(kpis['avg_productivity'])
+        if 'date' in kpis:
+            kpis['date'] = kpis['date'].isoformat()
+        result.append(kpis)
+    return result
+
+class QueryCounter:
+    # Counts SQL statements issued while active, e.g. `with QueryCounter() as qc: ...; assert qc.count <= 3`
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._on_execute)
+
+# In-process caches
+jwt_cache = TTLCache(int(os.getenv('JWT_CACHE_SIZE', 10000)))
+principal_cache = TTLCache(int(os.getenv('PRINCIPAL_CACHE_SIZE', 10000)), ttl=int(os.getenv('PRINCIPAL_CACHE_TTL', 300)))
+
+def decode_auth_token(token):
+    # Claims are cached by token digest until the token's own exp
+    digest = hashlib.sha256(token.encode()).digest()
+    data = jwt_cache.get(digest)
+    if data is None:
+        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+        jwt_cache.set(digest, data, expires_at=data.get('exp'))
+    return data
+
+# Employee edits bump the 'principals' response-cache generation. Cached principals keep the generation they
+# were loaded under and each process re-reads it at most every PRINCIPAL_PROBE_INTERVAL seconds, so with
+# RESPONSE_CACHE_BACKEND=sqlite a deactivation reaches every worker within that interval, not the TTL.
+PRINCIPAL_PROBE_INTERVAL = float(os.getenv('PRINCIPAL_PROBE_INTERVAL', 1))
+_principal_generation = [0, float('-inf')]  # generation, monotonic time it was read
+
+def principal_generation():
+    now = time.monotonic()
+    if now - _principal_generation[1] >= PRINCIPAL_PROBE_INTERVAL:
+        _principal_generation[:] = [response_cache.backend.generations(('principals',))[0], now]
+    return _principal_generation[0]
+
+def cached_principal(employee_id, generation):
+    entry = principal_cache.get(employee_id)
+    return entry[1] if entry is not None and entry[0] == generation else None
+
+def get_principal(employee_id):
+    generation = principal_generation()
+    principal = cached_principal(employee_id, generation)
+    if principal is None:
+        row = db.session.query(
+            Employee.id, Employee.username, Employee.name, Employee.department, Employee.is_active
+        ).filter(Employee.id == employee_id).first()
+        if not row:
+            return None
+        principal = row._asdict()
+        principal_cache.set(employee_id, (generation, principal))
+    return principal
+
+def invalidate_principal(employee_id):
+    principal_cache.pop(employee_id)
+    response_cache.bump('principals')
+
+# Interned app names and website domains. Usage rows carry a small integer id instead of repeating the
+# string in every (employee, day) row and its unique index. Ingest resolves ids through a per-process
+# LRU and only goes to the dictionary table for strings it hasn't seen; those are inserted in the caller's
+# transaction and cached once it commits, so a cached id never points at a row a rolled-back request wrote.
+INTERN_CACHE_SIZE = int(os.getenv('INTERN_CACHE_SIZE', 50000))
+
+def normalize_app_name(name):
+    return (name or '').strip()[:AppName.name.type.length]
+
+def normalize_domain(url):
+    # Only the host is kept: full URLs (paths, query strings) made nearly every visit its own row
+    url = (url or '').strip()
+    return url_domain(url)[:WebDomain.domain.type.length] if url else ''
+
+class Interner:
+    def __init__(self, model, column, maxsize):
+        self.model = model
+        self.column = getattr(model, column)
+        self.cache = TTLCache(maxsize)
+        self.lookups = 0
+
+    def get(self, key):
+        # Cache only; None means the caller has to resolve it with ids()
+        return self.cache.get(key)
+
+    def ids(self, keys):
+        # keys: normalized strings; returns {key: id}, inserting keys the table doesn't have yet
+        resolved, missing = {}, []
+        for key in set(keys):
+            value = self.cache.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                resolved[key] = value
+        if missing:
+            self.lookups += 1
+            # Inserts join the caller's transaction; ids reach the cache only once it commits
+            for i in range(0, len(missing), UPSERT_CHUNK_SIZE):
+                chunk = missing[i:i + UPSERT_CHUNK_SIZE]
+                db.session.execute(_dialect_insert(self.model).values(
+                    [{self.column.key: key} for key in chunk]
+                ).on_conflict_do_nothing(index_elements=[self.column.key]))
+                resolved.update(db.session.execute(
+                    select(self.column, self.model.id).where(self.column.in_(chunk))
+                ).all())
+            db.session.info.setdefault('interned', []).extend((self, key, resolved[key]) for key in missing)
+        return resolved
+
+    def id(self, key):
+        return self.ids([key])[key]
+
+    def stats(self):
+        return {**self.cache.stats(), 'lookups': self.lookups}
+
+@event.listens_for(db.session, 'after_commit')
+def _cache_interned(session):
+    for interner, key, value in session.info.pop('interned', ()):
+        interner.cache.set(key, value)
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _discard_interned(session, transaction):
+    # Rolled back: rows inserted by that transaction are gone, so their ids must not be cached
+    if transaction.parent is None:
+        session.info.pop('interned', None)
+
+app_names = Interner(AppName, 'name', INTERN_CACHE_SIZE)
+web_domains = Interner(WebDomain, 'domain', INTERN_CACHE_SIZE)
+
+# Pre-interning layouts: model -> (string column, normalizer, interner, id column, summed columns, latest column)
+LEGACY_USAGE_LAYOUTS = {
+    AppUsage: ('app_name', normalize_app_name, app_names, 'app_id', ('duration',), 'last_used'),
+    WebsiteVisit: ('url', normalize_domain, web_domains, 'domain_id', ('duration', 'visits'), 'last_visited'),
+}
+
+def pre_interning_table(model):
+    # Untouched copy of the rows migration 10 rewrote (full URLs included), kept until an operator drops it
+    return f'{model.__tablename__}_pre_interning'
+
+def _legacy_usage_columns(connection, model):
+    layout = LEGACY_USAGE_LAYOUTS.get(model)
+    return layout and layout[0] in {c['name'] for c in inspect(connection).get_columns(model.__tablename__)}
+
+def _intern_legacy_usage(connection, model):
+    # Rebuilds the table keyed by dictionary id. Rows whose strings normalize to the same key (every URL
+    # on one host, per employee and day) merge into one: counters summed, latest timestamp kept.
+    # The original rows are copied to pre_interning_table() rather than dropped, since paths are lost
+    column, normalize, interner, id_column, summed, latest = LEGACY_USAGE_LAYOUTS[model]
+    table = model.__tablename__
+    legacy = f'{table}_legacy'
+    values = [row[0] for row in connection.exec_driver_sql(f'SELECT DISTINCT {column} FROM {table}') if row[0]]
+    normalized = {value: normalize(value) for value in values}
+    normalized = {value: key for value, key in normalized.items() if key}
+    keys = sorted(set(normalized.values()))
+    key_column = interner.column.key
+    for i in range(0, len(keys), UPSERT_CHUNK_SIZE):
+        connection.execute(_dialect_insert(interner.model).values(
+            [{key_column: key} for key in keys[i:i + UPSERT_CHUNK_SIZE]]
+        ).on_conflict_do_nothing(index_elements=[key_column]))
+    ids = dict(connection.execute(select(interner.column, interner.model.id)).all())
+    mapping = db.Table(f'{table}_intern_map', db.MetaData(),
+                       db.Column('value', db.String(500), primary_key=True),
+                       db.Column('id', db.Integer, nullable=False),
+                       prefixes=['TEMPORARY'])
+    mapping.create(connection)
+    rows = [{'value': value, 'id': ids[key]} for value, key in normalized.items()]
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        connection.execute(mapping.insert(), rows[i:i + UPSERT_CHUNK_SIZE])
+    # Index names are per schema, so the legacy copies have to go before the new table creates its own
+    names = {index.name for index in model.__table__.indexes}
+    for index in inspect(connection).get_indexes(table):
+        if index['name'] in names:
+            connection.exec_driver_sql(f'DROP INDEX {index["name"]}')
+    connection.exec_driver_sql(f'ALTER TABLE {table} RENAME TO {legacy}')
+    model.__table__.create(connection)
+    aggregates = ', '.join([f'SUM(l.{c})' for c in summed] + [f'MAX(l.{latest})', 'MAX(l.category)'])
+    connection.exec_driver_sql(
+        f'INSERT INTO {table} (employee_id, date, {id_column}, {", ".join(summed)}, {latest}, category) '
+        f'SELECT l.employee_id, l.date, m.id, {aggregates} '
+        f'FROM {legacy} l JOIN {mapping.name} m ON m.value = l.{column} '
+        f'GROUP BY l.employee_id, l.date, m.id'
+    )
+    # A plain copy rather than the renamed table: no indexes, and no partitions whose names the new table needs
+    connection.exec_driver_sql(f'CREATE TABLE {pre_interning_table(model)} AS SELECT * FROM {legacy}')
+    connection.exec_driver_sql(f'DROP TABLE {legacy}')
+    mapping.drop(connection)
+
+@migration(10, 'Dictionary-encoded app names and website domains')
+def _migration_intern_usage_strings():
+    db.create_all()
+    connection = db.session.connection()
+    for model in LEGACY_USAGE_LAYOUTS:
+        if _legacy_usage_columns(connection, model):
+            _intern_legacy_usage(connection, model)
+    ensure_partitions()
+
+# Live presence (presence_store.py). The memory backend tracks only its own worker's touches, so
+# PRESENCE_BACKEND defaults to sqlite when WEB_CONCURRENCY > 1.
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+PRESENCE_BACKEND = os.getenv('PRESENCE_BACKEND', 'sqlite' if WEB_CONCURRENCY > 1 else 'memory')
+PRESENCE_DB_PATH = os.getenv('PRESENCE_DB_PATH', os.path.join(app.instance_path, 'presence.db'))
+
+def presence_seed():
+    return [
+        (employee_id, status, settings_cache.get(department).idle_timeout)
+        for employee_id, status, department in db.session.query(
+            Employee.id, Employee.status, Employee.department
+        ).filter(Employee.status.in_(('online', 'idle')), Employee.is_active.is_(True))
+    ]
+
+def presence_idle_timeout(employee_id):
+    return settings_cache.for_employee(employee_id).idle_timeout
+
+def write_presence_statuses(statuses):
+    by_state = {}
+    for employee_id, state in statuses.items():
+        by_state.setdefault(state, []).append(employee_id)
+    for state, ids in by_state.items():
+        for i in range(0, len(ids), REPORT_ID_CHUNK):
+            Employee.query.filter(Employee.id.in_(ids[i:i + REPORT_ID_CHUNK])).update(
+                {'status': state}, synchronize_session=False
+            )
+    db.session.commit()
+
+def publish_presence(employee_id, state):
+    event_hub.publish('presence', {'employee_id': employee_id, 'state': state})
+
+presence = PresenceStore(
+    SqlitePresenceBackend(PRESENCE_DB_PATH, DEFAULT_SETTINGS.idle_timeout) if PRESENCE_BACKEND == 'sqlite'
+    else MemoryPresenceBackend(),
+    app, presence_seed, presence_idle_timeout, write_presence_statuses, publish_presence
+)
+if PRESENCE_BACKEND != 'sqlite' and WEB_CONCURRENCY > 1:
+    app.logger.warning('PRESENCE_BACKEND=memory with WEB_CONCURRENCY=%d: presence is tracked per worker', WEB_CONCURRENCY)
+
+def activity_presence_state(activity_type):
+    if activity_type == 'idle':
+        return 'idle'
+    if activity_type == 'clockout':
+        return 'offline'
+    return 'online'
+
+# Serialization for list endpoints: views select only the columns they return, as tuples, and encode
+# with orjson when it is installed (stdlib json otherwise). The encoder formats dates itself, so rows
+# carry datetime objects rather than calling isoformat() per row. ?format=columnar sends the field names
+# once and one array per field, which is smaller and parses faster on the client for long ranges.
+try:
+    import orjson
+except ImportError:  # optional speed-up: pip install orjson
+    orjson = None
+
+RESPONSE_FORMATS = ('json', 'columnar')
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, tuple):
+        return list(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def dumps_json(data):
+    if orjson:
+        return orjson.dumps(data, default=_json_default)
+    return json.dumps(data, default=_json_default, separators=(',', ':')).encode()
+
+def loads_json(text):
+    return orjson.loads(text) if orjson else json.loads(text)
+
+def json_response(data):
+    return Response(dumps_json(data), mimetype='application/json')
+
+def requested_format():
+    # None when the client asked for a format we don't serve
+    fmt = request.args.get('format', 'json')
+    return fmt if fmt in RESPONSE_FORMATS else None
+
+def columnar(fields, rows):
+    return {'fields': list(fields), 'columns': [list(column) for column in zip(*rows)] if rows else [[] for _ in fields]}
+
+def table_response(fields, rows, items_key=None, **extra):
+    # rows are sequences aligned with fields; plain format is a list of objects (under items_key if given)
+    fmt = requested_format()
+    if fmt is None:
+        return jsonify({'message': f'format must be one of: {", ".join(RESPONSE_FORMATS)}'}), 400
+    if fmt == 'columnar':
+        return json_response({**columnar(fields, rows), **extra})
+    items = [dict(zip(fields, row)) for row in rows]
+    return json_response({items_key: items, **extra} if items_key else items)
+
+# Response cache for polled read endpoints (caching.py)
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+RESPONSE_CACHE_DB_PATH = os.getenv('RESPONSE_CACHE_DB_PATH', os.path.join(app.instance_path, 'response_cache.db'))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1000))
+RESPONSE_CACHE_SCOPES = ('employees', 'activity', 'sessions', 'app_usage', 'settings', 'principals')
+
+response_cache = ResponseCache(
+    SqliteResponseBackend(RESPONSE_CACHE_DB_PATH, RESPONSE_CACHE_SIZE) if RESPONSE_CACHE_BACKEND == 'sqlite'
+    else MemoryResponseBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_SCOPES)
+)
+
+# Live admin feed over Server-Sent Events (event_stream.py). STREAM_BACKEND=sqlite shares events between
+# the workers on a host.
+STREAM_BACKEND = os.getenv('STREAM_BACKEND', 'memory')
+STREAM_DB_PATH = os.getenv('STREAM_DB_PATH', os.path.join(app.instance_path, 'stream.db'))
+
+def stream_kpis():
+    today = datetime.utcnow().date()
+    kpis = aggregate_session_kpis(today, today)[0]
+    return {
+        'active_employees': presence.counts()['online'],
+        'total_hours': kpis['total_hours'],
+        'total_idle': kpis['total_idle'],
+        'avg_productivity': kpis['avg_productivity']
+    }
+
+event_hub = EventHub(
+    app, stream_kpis, SqliteEventLog(STREAM_DB_PATH, STREAM_BUFFER_SIZE) if STREAM_BACKEND == 'sqlite' else None
+)
+
+def publish_activity(employee_id, activity_type, description, timestamp):
+    principal = get_principal(employee_id)
+    event_hub.publish('activity', {
+        'employee_id': employee_id,
+        'employee': principal['name'] if principal else None,
+        'type': activity_type,
+        'description': description,
+        'timestamp': timestamp.isoformat()
+    })
+
+# JWT Token Decorator
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -114,13 +1730,17 @@ def token_required(f):
         try:
             if token.startswith('Bearer '):
                 token = token[7:]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+            data = decode_auth_token(token)
             current_user = {
                 'id': data['user_id'],
                 'type': data['user_type']
             }
         except:
             return jsonify({'message': 'Token is invalid!'}), 401
+        if current_user['type'] == 'employee':
+            principal = get_principal(current_user['id'])
+            if not principal or not principal['is_active']:
+                return jsonify({'message': 'Account is deactivated!'}), 401
         return f(current_user, *args, **kwargs)
     return decorated
 
@@ -142,13 +1762,240 @@ def health_check():
         'timestamp': datetime.utcnow().isoformat()
     })
 
+def component_stats():
+    return {
+        'jwt': jwt_cache.stats(),
+        'principal': principal_cache.stats(),
+        'presence': presence.stats(),
+        'response': response_cache.stats(),
+        'settings': settings_cache.stats(),
+        'app_names': app_names.stats(),
+        'web_domains': web_domains.stats(),
+        'rollups': rollup_builder.stats(),
+        'stream': event_hub.stats(),
+        'password_hasher': password_hasher.stats(),
+        'activity_buffer': activity_buffer.stats() if activity_buffer else None,
+        'metrics': metrics.stats() if metrics else None
+    }
+
+def db_pool_status():
+    pool = db.engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
+            timeout=DB_POOL_TIMEOUT
+        )
+    return {**status, **pool_stats.snapshot()}
+
+@app.route('/api/admin/cache-stats', methods=['GET'])
+@token_required
+@admin_required
+def get_cache_stats(current_user):
+    return jsonify(component_stats())
+
+@app.route('/api/admin/db-pool', methods=['GET'])
+@token_required
+@admin_required
+def get_db_pool_stats(current_user):
+    return jsonify(db_pool_status())
+
+# Password hashing: verifications run in a bounded process pool so a morning login storm can't pin
+# every request thread on scrypt/PBKDF2. Logins beyond the queue limit are turned away with a 503
+# instead of piling up, and hashes that predate PASSWORD_HASH_METHOD are upgraded on the next login.
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # as stored, e.g. pbkdf2:sha256:600000
+PASSWORD_HASH_PROCESSES = int(os.getenv('PASSWORD_HASH_PROCESSES', os.cpu_count() or 2))  # 0 hashes inline
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 256))
+
+class HasherBusy(Exception):
+    pass
+
+def _verify_password(pwhash, password, method):
+    # Runs in a pool process; returns (matched, replacement hash or None)
+    if not check_password_hash(pwhash, password or ''):
+        return False, None
+    if pwhash.split('$', 1)[0] != method:
+        return True, generate_password_hash(password, method)
+    return True, None
+
+class PasswordHasher:
+    def __init__(self, processes, max_pending, method):
+        self.processes = processes
+        self.max_pending = max_pending
+        self.method = method
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._latencies = deque(maxlen=4096)
+        self.verified = self.rejected = self.rehashed = self.busy = 0
+
+    def verify(self, pwhash, password):
+        # Returns a future resolving to (matched, new hash or None); raises HasherBusy when the queue is full
+        return self._submit(_verify_password, pwhash, password, self.method)
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.busy += 1
+                raise HasherBusy()
+            self._pending += 1
+            if self.processes and self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            executor = self._executor
+        started = time.perf_counter()
+        future = Future()
+        if executor:
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool as e:
+                future.set_exception(e)
+            except BaseException:
+                # e.g. RuntimeError from a pool _done() shut down after we took it; no callback will free the slot
+                with self._lock:
+                    self._pending -= 1
+                raise
+        else:
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+        future.add_done_callback(lambda done: self._done(done, executor, started))
+        return future
+
+    def _done(self, future, executor, started):
+        with self._lock:
+            self._pending -= 1
+            self._latencies.append(time.perf_counter() - started)
+            if isinstance(future.exception(), BrokenProcessPool):
+                # A crashed worker poisons the whole pool; start a fresh one for the next login
+                if self._executor is executor:
+                    self._executor = None
+                    executor.shutdown(wait=False)
+                return
+            if future.exception() is None:
+                matched, new_hash = future.result()
+                self.verified += matched
+                self.rejected += not matched
+                self.rehashed += new_hash is not None
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'method': self.method,
+                'processes': self.processes,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'verified': self.verified,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+                'busy': self.busy,
+                'latency_p50_ms': round(_percentile(latencies, 0.50) * 1000, 1),
+                'latency_p99_ms': round(_percentile(latencies, 0.99) * 1000, 1)
+            }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_PROCESSES, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_METHOD)
+
+# Metrics (request_metrics.py), served at /api/metrics to admins and to scrapers holding METRICS_TOKEN.
+# With METRICS_BACKEND=sqlite every worker's counters are folded into one host-local file.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_BACKEND = os.getenv('METRICS_BACKEND', 'memory')
+METRICS_DB_PATH = os.getenv('METRICS_DB_PATH', os.path.join(app.instance_path, 'metrics.db'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # bearer token for scrapers; admin JWTs are accepted either way
+_metrics_sql = ContextVar('metrics_sql', default=None)
+
+def collect_component_gauges():
+    # Every numeric field of the admin stats endpoints, as (labels, value) rows for this worker
+    with app.app_context():
+        components = {'db_pool': db_pool_status(), **component_stats()}
+    pid = os.getpid()
+    return [
+        (metric_labels(component=component, stat=stat, pid=pid), float(value))
+        for component, values in components.items() if values
+        for stat, value in values.items() if isinstance(value, (int, float))
+    ]
+
+metrics = Metrics(
+    app, collect_component_gauges, METRICS_DB_PATH if METRICS_BACKEND == 'sqlite' else None
+) if METRICS_ENABLED else None
+
+if metrics:
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _metrics_before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _metrics_after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        sql = _metrics_sql.get()
+        if sql is None:
+            metrics.observe_sql('(background)', 1, elapsed)
+        else:
+            sql[0] += 1
+            sql[1] += elapsed
+
+    @app.before_request
+    def _metrics_start():
+        request.environ['metrics.started'] = time.perf_counter()
+        request.environ['metrics.sql_token'] = _metrics_sql.set([0, 0.0])
+
+    @app.after_request
+    def _metrics_record(response):
+        environ = request.environ
+        if 'metrics.started' in environ:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.observe_request(
+                route, request.method, response.status_code, time.perf_counter() - environ.pop('metrics.started'),
+                None if response.is_streamed else response.calculate_content_length(), _metrics_sql.get()
+            )
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        environ = request.environ
+        if 'metrics.started' in environ:
+            # The view raised, so after_request never ran
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.observe_request(route, request.method, 500, time.perf_counter() - environ.pop('metrics.started'),
+                                    None, _metrics_sql.get())
+        if 'metrics.sql_token' in environ:
+            _metrics_sql.reset(environ.pop('metrics.sql_token'))
+
+def _metrics_response():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@token_required
+@admin_required
+def _admin_metrics(current_user):
+    return _metrics_response()
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    # Route traffic, pool sizes and queue depths are not public: scrapers send METRICS_TOKEN, people an admin JWT
+    if not metrics:
+        return jsonify({'message': 'Metrics are disabled'}), 404
+    if METRICS_TOKEN and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+        return _metrics_response()
+    return _admin_metrics()
+
 # Authentication Routes (unchanged)
 @app.route('/api/auth/admin/login', methods=['POST'])
 def admin_login():
     data = request.get_json()
     admin = Admin.query.filter_by(username=data.get('username')).first()
-    if not admin or not check_password_hash(admin.password, data.get('password')):
+    try:
+        matched, new_hash = password_hasher.verify(admin.password, data.get('password')).result() if admin else (False, None)
+    except HasherBusy:
+        return jsonify({'message': 'Too many logins in progress, retry later'}), 503, {'Retry-After': '1'}
+    if not matched:
         return jsonify({'message': 'Invalid credentials!'}), 401
+    if new_hash:
+        admin.password = new_hash
+        db.session.commit()
     token = jwt.encode({
         'user_id': admin.id,
         'user_type': 'admin',
@@ -168,28 +2015,30 @@ def admin_login():
 def employee_login():
     data = request.get_json()
     employee = Employee.query.filter_by(username=data.get('username'), is_active=True).first()
-    if not employee or not check_password_hash(employee.password, data.get('password')):
+    try:
+        matched, new_hash = password_hasher.verify(employee.password, data.get('password')).result() if employee else (False, None)
+    except HasherBusy:
+        return jsonify({'message': 'Too many logins in progress, retry later'}), 503, {'Retry-After': '1'}
+    if not matched:
         return jsonify({'message': 'Invalid credentials!'}), 401
-    employee.last_login = datetime.utcnow()
+    now = datetime.utcnow()
+    # Rehash, status, clock-in row and work session all land in one commit
+    if new_hash:
+        employee.password = new_hash
+    employee.last_login = now
     employee.status = 'online'
-    db.session.commit()
     activity = ActivityLog(
         employee_id=employee.id,
         activity_type='clockin',
         description='Clocked in',
-        timestamp=datetime.utcnow()
+        timestamp=now
     )
     db.session.add(activity)
-    today = datetime.utcnow().date()
-    session = WorkSession.query.filter_by(employee_id=employee.id, date=today).first()
-    if not session:
-        session = WorkSession(
-            employee_id=employee.id,
-            clock_in=datetime.utcnow(),
-            date=today
-        )
-        db.session.add(session)
+    record_session_event(employee.id, 'clockin', now)
     db.session.commit()
+    presence.touch(employee.id, 'online')
+    response_cache.bump('employees', 'activity', 'sessions')
+    publish_activity(employee.id, 'clockin', 'Clocked in', now)
     token = jwt.encode({
         'user_id': employee.id,
         'user_type': 'employee',
@@ -210,47 +2059,49 @@ def employee_login():
 @token_required
 def logout(current_user):
     if current_user['type'] == 'employee':
-        employee = Employee.query.get(current_user['id'])
-        employee.status = 'offline'
+        employee_id = current_user['id']
+        now = datetime.utcnow()
+        Employee.query.filter_by(id=employee_id).update({'status': 'offline'})
         activity = ActivityLog(
-            employee_id=employee.id,
+            employee_id=employee_id,
             activity_type='clockout',
             description='Clocked out',
-            timestamp=datetime.utcnow()
+            timestamp=now
         )
         db.session.add(activity)
-        today = datetime.utcnow().date()
-        session = WorkSession.query.filter_by(employee_id=employee.id, date=today).first()
-        if session and not session.clock_out:
-            session.clock_out = datetime.utcnow()
+        record_session_event(employee_id, 'clockout', now)
         db.session.commit()
+        presence.touch(employee_id, 'offline')
+        response_cache.bump('employees', 'activity', 'sessions')
+        publish_activity(employee_id, 'clockout', 'Clocked out', now)
     return jsonify({'message': 'Logged out successfully'})
 
 # Admin Routes - Employee Management (unchanged)
+EMPLOYEE_LIST_FIELDS = (
+    'id', 'username', 'name', 'email', 'department', 'position', 'status', 'is_active', 'last_login',
+    'activeTime', 'idleTime', 'productivity'
+)
+
 @app.route('/api/admin/employees', methods=['GET'])
 @token_required
 @admin_required
+@response_cache.cached(ttl=10, scopes=('employees', 'activity', 'sessions'))
 def get_all_employees(current_user):
-    employees = Employee.query.all()
-    result = []
-    for emp in employees:
-        today = datetime.utcnow().date()
-        session = WorkSession.query.filter_by(employee_id=emp.id, date=today).first()
-        result.append({
-            'id': emp.id,
-            'username': emp.username,
-            'name': emp.name,
-            'email': emp.email,
-            'department': emp.department,
-            'position': emp.position,
-            'status': emp.status,
-            'is_active': emp.is_active,
-            'last_login': emp.last_login.isoformat() if emp.last_login else None,
-            'activeTime': session.active_time if session else 0,
-            'idleTime': session.idle_time if session else 0,
-            'productivity': session.productivity_score if session else 0
-        })
-    return jsonify(result)
+    rows = db.session.query(
+        Employee.id, Employee.username, Employee.name, Employee.email, Employee.department, Employee.position,
+        Employee.status, Employee.is_active, Employee.last_login,
+        WorkSession.id, WorkSession.active_time, WorkSession.idle_time, WorkSession.productivity_score
+    ).outerjoin(
+        WorkSession,
+        db.and_(WorkSession.employee_id == Employee.id, WorkSession.date == datetime.utcnow().date())
+    ).order_by(Employee.id, WorkSession.id)
+    result = {}
+    for row in rows:
+        if row[0] not in result:
+            result[row[0]] = (
+                *row[:6], presence.state(row[0]) or row[6], row[7], row[8], *(row[10:] if row[9] else (0, 0, 0))
+            )
+    return table_response(EMPLOYEE_LIST_FIELDS, list(result.values()))
 
 @app.route('/api/admin/employees', methods=['POST'])
 @token_required
@@ -263,7 +2114,7 @@ def create_employee(current_user):
         return jsonify({'message': 'Email already exists!'}), 400
     new_employee = Employee(
         username=data.get('username'),
-        password=generate_password_hash(data.get('password')),
+        password=generate_password_hash(data.get('password'), PASSWORD_HASH_METHOD),
         name=data.get('name'),
         email=data.get('email'),
         department=data.get('department'),
@@ -271,6 +2122,7 @@ def create_employee(current_user):
     )
     db.session.add(new_employee)
     db.session.commit()
+    response_cache.bump('employees')
     return jsonify({
         'message': 'Employee created successfully!',
         'employee': {
@@ -298,10 +2150,12 @@ def update_employee(current_user, emp_id):
     if 'position' in data:
         employee.position = data['position']
     if 'password' in data:
-        employee.password = generate_password_hash(data['password'])
+        employee.password = generate_password_hash(data['password'], PASSWORD_HASH_METHOD)
     if 'is_active' in data:
         employee.is_active = data['is_active']
     db.session.commit()
+    invalidate_principal(emp_id)
+    response_cache.bump('employees')
     return jsonify({'message': 'Employee updated successfully!'})
 
 @app.route('/api/admin/employees/<int:emp_id>', methods=['DELETE'])
@@ -313,6 +2167,8 @@ def delete_employee(current_user, emp_id):
         return jsonify({'message': 'Employee not found!'}), 404
     employee.is_active = False
     db.session.commit()
+    invalidate_principal(emp_id)
+    response_cache.bump('employees')
     return jsonify({'message': 'Employee deactivated successfully!'})
 
 # Activity Tracking Routes (unchanged)
@@ -322,19 +2178,35 @@ def log_activity(current_user):
     if current_user['type'] != 'employee':
         return jsonify({'message': 'Employee access only!'}), 403
     data = request.get_json()
+    now = datetime.utcnow()
+    if activity_buffer:
+        try:
+            activity_buffer.put({
+                'employee_id': current_user['id'],
+                'activity_type': data.get('activity_type'),
+                'description': data.get('description'),
+                'timestamp': now.isoformat(),
+                'activity_metadata': json.dumps(data.get('metadata', {}))
+            })
+        except BufferFull:
+            return jsonify({'message': 'Activity queue is full, retry later'}), 503, {'Retry-After': '1'}
+        presence.touch(current_user['id'], activity_presence_state(data.get('activity_type')))
+        response_cache.bump('activity')
+        publish_activity(current_user['id'], data.get('activity_type'), data.get('description'), now)
+        return jsonify({'message': 'Activity logged successfully'})
     activity = ActivityLog(
         employee_id=current_user['id'],
         activity_type=data.get('activity_type'),
         description=data.get('description'),
+        timestamp=now,
         activity_metadata=json.dumps(data.get('metadata', {}))
     )
     db.session.add(activity)
-    employee = Employee.query.get(current_user['id'])
-    if data.get('activity_type') == 'idle':
-        employee.status = 'idle'
-    elif data.get('activity_type') == 'active':
-        employee.status = 'online'
+    record_session_event(current_user['id'], data.get('activity_type'), now)
     db.session.commit()
+    presence.touch(current_user['id'], activity_presence_state(data.get('activity_type')))
+    response_cache.bump('activity', 'sessions')
+    publish_activity(current_user['id'], data.get('activity_type'), data.get('description'), now)
     return jsonify({'message': 'Activity logged successfully'})
 
 @app.route('/api/employee/activity', methods=['GET'])
@@ -342,16 +2214,16 @@ def log_activity(current_user):
 def get_activity_logs(current_user):
     employee_id = current_user['id']
     if current_user['type'] == 'admin':
-        activities = ActivityLog.query.order_by(ActivityLog.timestamp.desc()).limit(50).all()
+        activities = query_recent_activities(50)
     else:
-        activities = ActivityLog.query.filter_by(employee_id=employee_id).order_by(ActivityLog.timestamp.desc()).limit(50).all()
+        activities = query_recent_activities(50, employee_id=employee_id)
     return jsonify([{
-        'employee': Employee.query.get(act.employee_id).name,
+        'employee': name,
         'icon': '💻' if act.activity_type == 'active' else '💤' if act.activity_type == 'idle' else '🕒',
         'text': act.description,
         'time': act.timestamp.isoformat(),
         'timeStr': act.timestamp.strftime('%I:%M %p')
-    } for act in activities])
+    } for act, name in activities])
 
 @app.route('/api/employee/app-usage', methods=['POST'])
 @token_required
@@ -359,40 +2231,34 @@ def log_app_usage(current_user):
     if current_user['type'] != 'employee':
         return jsonify({'message': 'Employee access only!'}), 403
     data = request.get_json()
-    today = datetime.utcnow().date()
-    app_usage = AppUsage.query.filter_by(
-        employee_id=current_user['id'],
-        app_name=data.get('app_name'),
-        date=today
-    ).first()
-    if app_usage:
-        app_usage.duration += data.get('duration', 0)
-        app_usage.last_used = datetime.utcnow()
-    else:
-        app_usage = AppUsage(
-            employee_id=current_user['id'],
-            app_name=data.get('app_name'),
-            duration=data.get('duration', 0),
-            category=data.get('category', 'neutral'),
-            date=today
-        )
-        db.session.add(app_usage)
+    app_name = normalize_app_name(data.get('app_name'))
+    if not app_name:
+        return jsonify({'message': 'app_name is required'}), 400
+    now = datetime.utcnow()
+    upsert_app_usage([{
+        'employee_id': current_user['id'],
+        'app_id': app_names.id(app_name),
+        'duration': data.get('duration', 0),
+        'category': data.get('category', 'neutral'),
+        'date': now.date(),
+        'last_used': now
+    }])
+    refresh_session_usage(current_user['id'], now.date())
     db.session.commit()
+    response_cache.bump('app_usage', 'sessions')
     return jsonify({'message': 'App usage logged successfully'})
 
 @app.route('/api/employee/app-usage', methods=['GET'])
 @token_required
+@response_cache.cached(ttl=10, scopes=('app_usage',))
 def get_app_usage(current_user):
     today = datetime.utcnow().date()
-    if current_user['type'] == 'admin':
-        apps = AppUsage.query.filter_by(date=today).all()
-    else:
-        apps = AppUsage.query.filter_by(employee_id=current_user['id'], date=today).all()
-    return jsonify([{
-        'app': a.app_name,
-        'time': a.duration,
-        'category': a.category
-    } for a in apps])
+    apps = db.session.query(AppName.name, AppUsage.duration, AppUsage.category).join(
+        AppName, AppName.id == AppUsage.app_id
+    ).filter(AppUsage.date == today)
+    if current_user['type'] != 'admin':
+        apps = apps.filter(AppUsage.employee_id == current_user['id'])
+    return table_response(('app', 'time', 'category'), apps.all())
 
 @app.route('/api/employee/website-visit', methods=['POST'])
 @token_required
@@ -400,57 +2266,230 @@ def log_website_visit(current_user):
     if current_user['type'] != 'employee':
         return jsonify({'message': 'Employee access only!'}), 403
     data = request.get_json()
-    today = datetime.utcnow().date()
-    website = WebsiteVisit.query.filter_by(
-        employee_id=current_user['id'],
-        url=data.get('url'),
-        date=today
-    ).first()
-    if website:
-        website.duration += data.get('duration', 0)
-        website.visits += 1
-        website.last_visited = datetime.utcnow()
-    else:
-        website = WebsiteVisit(
-            employee_id=current_user['id'],
-            url=data.get('url'),
-            duration=data.get('duration', 0),
-            category=data.get('category', 'neutral'),
-            date=today
-        )
-        db.session.add(website)
+    domain = normalize_domain(data.get('url'))
+    if not domain:
+        return jsonify({'message': 'url is required'}), 400
+    now = datetime.utcnow()
+    upsert_website_visits([{
+        'employee_id': current_user['id'],
+        'domain_id': web_domains.id(domain),
+        'duration': data.get('duration', 0),
+        'visits': 1,
+        'category': data.get('category', 'neutral'),
+        'date': now.date(),
+        'last_visited': now
+    }])
+    refresh_session_usage(current_user['id'], now.date())
     db.session.commit()
+    response_cache.bump('sessions')
     return jsonify({'message': 'Website visit logged successfully'})
 
+# Batched agent telemetry: one request, one transaction for mixed events
+TELEMETRY_EVENT_TYPES = ('activity', 'app_usage', 'website_visit')
+
+def _event_timestamp(item):
+    if not item.get('timestamp'):
+        return datetime.utcnow()
+    timestamp = datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00'))
+    if timestamp.tzinfo:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+@app.route('/api/employee/telemetry/batch', methods=['POST'])
+@token_required
+def log_telemetry_batch(current_user):
+    if current_user['type'] != 'employee':
+        return jsonify({'message': 'Employee access only!'}), 403
+    data = request.get_json() or {}
+    events = data.get('events')
+    if not isinstance(events, list):
+        return jsonify({'message': 'events must be a list'}), 400
+    employee_id = current_user['id']
+    counts = {event_type: 0 for event_type in TELEMETRY_EVENT_TYPES}
+    errors = []
+    activities = []
+    apps = {}
+    websites = {}
+    state = None
+    for index, item in enumerate(events):
+        if not isinstance(item, dict) or item.get('type') not in TELEMETRY_EVENT_TYPES:
+            errors.append({'index': index, 'message': 'Unknown event type'})
+            continue
+        try:
+            timestamp = _event_timestamp(item)
+            duration = float(item.get('duration', 0))
+        except (TypeError, ValueError, AttributeError):
+            errors.append({'index': index, 'message': 'Invalid timestamp or duration'})
+            continue
+        if item['type'] == 'activity':
+            if not item.get('activity_type'):
+                errors.append({'index': index, 'message': 'activity_type is required'})
+                continue
+            activities.append({
+                'employee_id': employee_id,
+                'activity_type': item['activity_type'],
+                'description': item.get('description'),
+                'timestamp': timestamp,
+                'activity_metadata': json.dumps(item.get('metadata', {}))
+            })
+            state = activity_presence_state(item['activity_type'])
+        elif item['type'] == 'app_usage':
+            app_name = normalize_app_name(item.get('app_name'))
+            if not app_name:
+                errors.append({'index': index, 'message': 'app_name is required'})
+                continue
+            key = (app_name, timestamp.date())
+            entry = apps.setdefault(key, {'duration': 0.0, 'category': item.get('category', 'neutral'), 'last_used': timestamp})
+            entry['duration'] += duration
+            entry['last_used'] = max(entry['last_used'], timestamp)
+        else:
+            domain = normalize_domain(item.get('url'))
+            if not domain:
+                errors.append({'index': index, 'message': 'url is required'})
+                continue
+            key = (domain, timestamp.date())
+            entry = websites.setdefault(key, {'duration': 0.0, 'visits': 0, 'category': item.get('category', 'neutral'), 'last_visited': timestamp})
+            entry['duration'] += duration
+            entry['visits'] += 1
+            entry['last_visited'] = max(entry['last_visited'], timestamp)
+        counts[item['type']] += 1
+    # Resolve dictionary ids up front; new names are inserted in this transaction and commit with the batch
+    app_ids = app_names.ids([name for name, _ in apps])
+    domain_ids = web_domains.ids([domain for domain, _ in websites])
+    if activities:
+        db.session.bulk_insert_mappings(ActivityLog, activities)
+        settings = settings_cache.for_employee(employee_id)
+        sessions = {}
+        for activity in sorted(activities, key=lambda a: a['timestamp']):
+            record_session_event(employee_id, activity['activity_type'], activity['timestamp'], settings, sessions)
+    upsert_app_usage([
+        {'employee_id': employee_id, 'app_id': app_ids[name], 'date': day, **entry}
+        for (name, day), entry in apps.items()
+    ])
+    upsert_website_visits([
+        {'employee_id': employee_id, 'domain_id': domain_ids[domain], 'date': day, **entry}
+        for (domain, day), entry in websites.items()
+    ])
+    for day in sorted({day for _, day in apps} | {day for _, day in websites}):
+        refresh_session_usage(employee_id, day)
+    mark_rollups_stale(employee_id, [activity['timestamp'].date() for activity in activities]
+                       + [day for _, day in apps] + [day for _, day in websites])
+    db.session.commit()
+    if state:
+        presence.touch(employee_id, state)
+    response_cache.bump(*[scope for scope, changed in (
+        ('activity', activities), ('app_usage', apps), ('sessions', activities or apps or websites)
+    ) if changed])
+    for activity in activities:
+        publish_activity(employee_id, activity['activity_type'], activity['description'], activity['timestamp'])
+    return jsonify({
+        'message': 'Telemetry batch logged successfully',
+        'counts': counts,
+        'errors': errors
+    })
+
 # Analytics Routes (unchanged)
 @app.route('/api/admin/dashboard', methods=['GET'])
 @token_required
 @admin_required
+@response_cache.cached(ttl=5, scopes=('employees', 'activity', 'sessions'))
 def get_dashboard_stats(current_user):
     today = datetime.utcnow().date()
-    active_employees = Employee.query.filter_by(status='online', is_active=True).count()
-    sessions = WorkSession.query.filter_by(date=today).all()
-    total_hours = sum(s.active_time for s in sessions)
-    total_idle = sum(s.idle_time for s in sessions)
-    avg_productivity = sum(s.productivity_score for s in sessions) / len(sessions) if sessions else 0
-    recent_activities = ActivityLog.query.order_by(ActivityLog.timestamp.desc()).limit(20).all()
+    active_employees = presence.counts()['online']
+    kpis = aggregate_session_kpis(today, today)[0]
     activities = []
-    for act in recent_activities:
-        emp = Employee.query.get(act.employee_id)
+    for act, name in query_recent_activities(20):
         activities.append({
-            'employee': emp.name,
+            'employee': name,
             'type': act.activity_type,
             'description': act.description,
             'timestamp': act.timestamp.isoformat()
         })
     return jsonify({
         'active_employees': active_employees,
-        'total_hours': round(total_hours, 1),
-        'total_idle': round(total_idle, 1),
-        'avg_productivity': round(avg_productivity),
+        'total_hours': kpis['total_hours'],
+        'total_idle': kpis['total_idle'],
+        'avg_productivity': kpis['avg_productivity'],
         'recent_activities': activities
     })
 
+@app.route('/api/admin/stream', methods=['GET'])
+def admin_stream():
+    # EventSource cannot send headers, so the token may also come as ?token=
+    token = request.headers.get('Authorization') or request.args.get('token')
+    if not token:
+        return jsonify({'message': 'Token is missing!'}), 401
+    try:
+        data = decode_auth_token(token[7:] if token.startswith('Bearer ') else token)
+    except Exception:
+        return jsonify({'message': 'Token is invalid!'}), 401
+    if data.get('user_type') != 'admin':
+        return jsonify({'message': 'Admin access required!'}), 403
+    stream = event_hub.subscribe(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    if stream is None:
+        return jsonify({'message': 'Too many live connections, retry later'}), 503, {'Retry-After': '5'}
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/admin/analytics/kpis', methods=['GET'])
+@token_required
+@admin_required
+def get_kpis(current_user):
+    today = datetime.utcnow().date().isoformat()
+    group_by = request.args.get('group_by')
+    if group_by and group_by not in KPI_GROUPINGS:
+        return jsonify({'message': f'group_by must be one of: {", ".join(KPI_GROUPINGS)}'}), 400
+    try:
+        start_date = datetime.strptime(request.args.get('start_date', today), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end_date', request.args.get('start_date', today)), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    return jsonify({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'group_by': group_by,
+        'kpis': aggregate_session_kpis(start_date, end_date, group_by, request.args.get('department'))
+    })
+
+@app.route('/api/admin/analytics/departments', methods=['GET'])
+@token_required
+@admin_required
+def get_department_rollups(current_user):
+    yesterday = (datetime.utcnow().date() - timedelta(days=1)).isoformat()
+    try:
+        start_date = datetime.strptime(request.args.get('start_date', yesterday), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end_date', request.args.get('start_date', yesterday)), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    last_full = min(end_date, datetime.utcnow().date() - timedelta(days=1))
+    if start_date > last_full:
+        return jsonify({'message': 'Department rollups cover full days only'}), 400
+    pending = (last_full - start_date).days + 1 - len(rollup_coverage(start_date, last_full))
+    if pending:
+        # There is no raw fallback for department totals; rollup_coverage has queued the build
+        return jsonify({'message': f'Rollups for {pending} day(s) are being built, retry shortly'}), 503, {'Retry-After': '10'}
+    query = DepartmentDailyRollup.query.filter(
+        DepartmentDailyRollup.date >= start_date,
+        DepartmentDailyRollup.date <= last_full
+    )
+    if request.args.get('department'):
+        query = query.filter(DepartmentDailyRollup.department == request.args['department'])
+    return jsonify([{
+        'department': r.department or None,
+        'date': r.date.isoformat(),
+        'employees': r.employees,
+        'active_time': r.active_time,
+        'idle_time': r.idle_time,
+        'productivity': r.productivity_score,
+        'productive_time': r.productive_time,
+        'neutral_time': r.neutral_time,
+        'unproductive_time': r.unproductive_time,
+        'top_apps': [{'app': a, 'duration': d, 'category': c} for a, d, c in json.loads(r.top_apps or '[]')],
+        'top_domains': [{'domain': w, 'duration': d, 'visits': v, 'category': c} for w, d, v, c in json.loads(r.top_domains or '[]')]
+    } for r in query.order_by(DepartmentDailyRollup.date, DepartmentDailyRollup.department)])
+
 @app.route('/api/admin/employee/<int:emp_id>/report', methods=['GET'])
 @token_required
 @admin_required
@@ -468,150 +2507,432 @@ def get_employee_report(current_user, emp_id):
         end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
     else:
         end_date = start_date
-    sessions = WorkSession.query.filter(
-        WorkSession.employee_id == emp_id,
-        WorkSession.date >= start_date,
-        WorkSession.date <= end_date
-    ).all()
-    apps = AppUsage.query.filter(
-        AppUsage.employee_id == emp_id,
-        AppUsage.date >= start_date,
-        AppUsage.date <= end_date
-    ).all()
-    websites = WebsiteVisit.query.filter(
-        WebsiteVisit.employee_id == emp_id,
-        WebsiteVisit.date >= start_date,
-        WebsiteVisit.date <= end_date
-    ).all()
-    return jsonify({
-        'employee': {
-            'id': employee.id,
-            'name': employee.name,
-            'email': employee.email,
-            'department': employee.department,
-            'position': employee.position
-        },
-        'sessions': [{
-            'date': s.date.isoformat(),
-            'clock_in': s.clock_in.isoformat(),
-            'clock_out': s.clock_out.isoformat() if s.clock_out else None,
-            'active_time': s.active_time,
-            'idle_time': s.idle_time,
-            'productivity': s.productivity_score
-        } for s in sessions],
-        'app_usage': [{
-            'app': a.app_name,
-            'duration': a.duration,
-            'category': a.category
-        } for a in apps],
-        'websites': [{
-            'url': w.url,
-            'duration': w.duration,
-            'visits': w.visits,
-            'category': w.category
-        } for w in websites]
-    })
+    fmt = requested_format()
+    if fmt is None:
+        return jsonify({'message': f'format must be one of: {", ".join(RESPONSE_FORMATS)}'}), 400
+    # version=1 (default) keeps the original layout; version=2 totals apps and websites over the range and adds a summary
+    version = request.args.get('version', '1')
+    if version not in REPORT_VERSIONS:
+        return jsonify({'message': f'version must be one of: {", ".join(REPORT_VERSIONS)}'}), 400
+    report = build_report_data(employee, start_date, end_date, daily=version == '1')
+    if fmt == 'columnar':
+        report.update({
+            key: columnar(fields, [tuple(item[field] for field in fields) for item in report[key]])
+            for key, fields in REPORT_TABLE_FIELDS.items()
+        })
+    return json_response(report)
 
-@app.route('/api/admin/employee/<int:emp_id>/report/download', methods=['GET'])
-@token_required
-@admin_required
-def download_employee_report(current_user, emp_id):
-    employee = Employee.query.get(emp_id)
-    if not employee:
-        return jsonify({'message': 'Employee not found!'}), 404
-    start_date = request.args.get('start_date', datetime.utcnow().date().isoformat())
-    end_date = request.args.get('end_date', datetime.utcnow().date().isoformat())
-    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-    sessions = WorkSession.query.filter(
-        WorkSession.employee_id == emp_id,
-        WorkSession.date >= start_date_obj,
-        WorkSession.date <= end_date_obj
-    ).all()
-    apps = AppUsage.query.filter(
-        AppUsage.employee_id == emp_id,
-        AppUsage.date >= start_date_obj,
-        AppUsage.date <= end_date_obj
-    ).all()
-    websites = WebsiteVisit.query.filter(
-        WebsiteVisit.employee_id == emp_id,
-        WebsiteVisit.date >= start_date_obj,
-        WebsiteVisit.date <= end_date_obj
-    ).all()
+# Asynchronous report jobs and PDF result cache
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', 2))
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', os.path.join(app.instance_path, 'report_cache'))
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_job'
+    id = db.Column(db.String(32), primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    cache_key = db.Column(db.String(64))
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+@migration(5, 'Report job table')
+def _migration_report_jobs():
+    db.create_all()
+
+class ReportCache:
+    # Size-bounded LRU of rendered PDFs on local disk, shared by every worker on the host; mtime is the recency
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pdf'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+report_cache = ReportCache(REPORT_CACHE_DIR, REPORT_CACHE_MAX_BYTES)
+_report_executor = None
+_report_executor_lock = threading.Lock()
+
+def report_executor():
+    global _report_executor
+    with _report_executor_lock:
+        if _report_executor is None:
+            _report_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix='report')
+        return _report_executor
+
+def report_data_version(employee, start_date, end_date):
+    # Cheap aggregate fingerprint of everything the report renders; changes whenever the underlying rows do
+    sessions = db.session.query(
+        func.count(WorkSession.id), func.sum(WorkSession.active_time), func.sum(WorkSession.idle_time),
+        func.sum(WorkSession.productivity_score), func.max(WorkSession.clock_out)
+    ).filter(WorkSession.employee_id == employee.id, WorkSession.date >= start_date, WorkSession.date <= end_date).one()
+    apps = db.session.query(
+        func.count(AppUsage.id), func.sum(AppUsage.duration), func.max(AppUsage.last_used)
+    ).filter(AppUsage.employee_id == employee.id, AppUsage.date >= start_date, AppUsage.date <= end_date).one()
+    websites = db.session.query(
+        func.count(WebsiteVisit.id), func.sum(WebsiteVisit.duration), func.sum(WebsiteVisit.visits)
+    ).filter(WebsiteVisit.employee_id == employee.id, WebsiteVisit.date >= start_date, WebsiteVisit.date <= end_date).one()
+    profile = (employee.name, employee.email, employee.department, employee.position)
+    return repr((profile, tuple(sessions), tuple(apps), tuple(websites)))
+
+def report_cache_key(employee, start_date, end_date):
+    version = report_data_version(employee, start_date, end_date)
+    return hashlib.sha256(f'{employee.id}|{start_date}|{end_date}|{version}'.encode()).hexdigest()
+
+REPORT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+REPORT_STYLES = getSampleStyleSheet()
+
+def render_report_pdf(report, start_date, end_date):
     buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    SimpleDocTemplate(buffer, pagesize=letter).build(report_elements(report, start_date, end_date))
+    return buffer.getvalue()
+
+def report_elements(report, start_date, end_date):
+    employee = report['employee']
     elements = []
-    styles = getSampleStyleSheet()
-    title = Paragraph(f"<b>Employee Activity Report</b><br/>{employee.name}", styles['Title'])
+    styles = REPORT_STYLES
+    title = Paragraph(f"<b>Employee Activity Report</b><br/>{employee['name']}", styles['Title'])
     elements.append(title)
     elements.append(Spacer(1, 12))
     info = Paragraph(f"""
-        <b>Email:</b> {employee.email}<br/>
-        <b>Department:</b> {employee.department or 'N/A'}<br/>
-        <b>Position:</b> {employee.position or 'N/A'}<br/>
+        <b>Email:</b> {employee['email']}<br/>
+        <b>Department:</b> {employee['department'] or 'N/A'}<br/>
+        <b>Position:</b> {employee['position'] or 'N/A'}<br/>
         <b>Report Period:</b> {start_date} to {end_date}
     """, styles['Normal'])
     elements.append(info)
     elements.append(Spacer(1, 20))
     session_data = [['Date', 'Active Time (h)', 'Idle Time (h)', 'Productivity (%)']]
-    for s in sessions:
+    for s in report['sessions']:
         session_data.append([
-            s.date.isoformat(),
-            f"{s.active_time:.1f}",
-            f"{s.idle_time:.1f}",
-            s.productivity_score
+            s['date'],
+            f"{s['active_time']:.1f}",
+            f"{s['idle_time']:.1f}",
+            s['productivity']
         ])
     session_table = Table(session_data)
-    session_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
+    session_table.setStyle(REPORT_TABLE_STYLE)
     elements.append(Paragraph("<b>Work Sessions</b>", styles['Heading2']))
     elements.append(session_table)
     elements.append(Spacer(1, 20))
     app_data = [['Application', 'Duration (h)', 'Category']]
-    for a in apps:
-        app_data.append([a.app_name, f"{a.duration:.1f}", a.category or 'N/A'])
+    for a in report['app_usage']:
+        app_data.append([a['app'], f"{a['duration']:.1f}", a['category'] or 'N/A'])
     app_table = Table(app_data)
-    app_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
+    app_table.setStyle(REPORT_TABLE_STYLE)
     elements.append(Paragraph("<b>Application Usage</b>", styles['Heading2']))
     elements.append(app_table)
     elements.append(Spacer(1, 20))
-    website_data = [['URL', 'Duration (h)', 'Visits', 'Category']]
-    for w in websites:
-        website_data.append([w.url, f"{w.duration:.1f}", w.visits, w.category or 'N/A'])
+    website_data = [['Website', 'Duration (h)', 'Visits', 'Category']]
+    for w in report['websites']:
+        website_data.append([w['url'], f"{w['duration']:.1f}", w['visits'], w['category'] or 'N/A'])
     website_table = Table(website_data)
-    website_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
+    website_table.setStyle(REPORT_TABLE_STYLE)
     elements.append(Paragraph("<b>Website Visits</b>", styles['Heading2']))
     elements.append(website_table)
-    doc.build(elements)
-    buffer.seek(0)
+    return elements
+
+def get_report_pdf(employee, start_date, end_date):
+    # The key is taken right before rendering so the PDF stored under it reflects the data it hashes
+    cache_key = report_cache_key(employee, start_date, end_date)
+    pdf = report_cache.get(cache_key)
+    if pdf is None:
+        pdf = render_report_pdf(build_report_data(employee, start_date, end_date), start_date, end_date)
+        report_cache.put(cache_key, pdf)
+    return cache_key, pdf
+
+def _run_report_job(job_id):
+    with app.app_context():
+        job = ReportJob.query.get(job_id)
+        job.status = 'running'
+        db.session.commit()
+        try:
+            job.cache_key, _ = get_report_pdf(Employee.query.get(job.employee_id), job.start_date, job.end_date)
+            job.status = 'done'
+        except Exception as e:
+            db.session.rollback()
+            job = ReportJob.query.get(job_id)
+            job.status = 'failed'
+            job.error = str(e)[:500]
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+def _report_job_json(job):
+    result = {
+        'job_id': job.id,
+        'employee_id': job.employee_id,
+        'start_date': job.start_date.isoformat(),
+        'end_date': job.end_date.isoformat(),
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+    if job.status == 'done':
+        result['download_url'] = f'/api/admin/report-jobs/{job.id}/download'
+    return result
+
+@app.route('/api/admin/employee/<int:emp_id>/report/jobs', methods=['POST'])
+@token_required
+@admin_required
+def create_report_job(current_user, emp_id):
+    employee = Employee.query.get(emp_id)
+    if not employee:
+        return jsonify({'message': 'Employee not found!'}), 404
+    data = request.get_json(silent=True) or {}
+    today = datetime.utcnow().date().isoformat()
+    try:
+        start_date = datetime.strptime(data.get('start_date', today), '%Y-%m-%d').date()
+        end_date = datetime.strptime(data.get('end_date', data.get('start_date', today)), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    job = ReportJob(
+        id=uuid.uuid4().hex,
+        employee_id=emp_id,
+        start_date=start_date,
+        end_date=end_date
+    )
+    # Already rendered for the current data: done now. Queued jobs get their key when the worker renders them.
+    cache_key = report_cache_key(employee, start_date, end_date)
+    if cache_key in report_cache:
+        job.cache_key = cache_key
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+    db.session.add(job)
+    db.session.commit()
+    if job.status == 'queued':
+        report_executor().submit(_run_report_job, job.id)
+    return jsonify(_report_job_json(job)), 202
+
+@app.route('/api/admin/report-jobs/<job_id>', methods=['GET'])
+@token_required
+@admin_required
+def get_report_job(current_user, job_id):
+    job = ReportJob.query.get(job_id)
+    if not job:
+        return jsonify({'message': 'Report job not found!'}), 404
+    return jsonify(_report_job_json(job))
+
+@app.route('/api/admin/report-jobs/<job_id>/download', methods=['GET'])
+@token_required
+@admin_required
+def download_report_job(current_user, job_id):
+    job = ReportJob.query.get(job_id)
+    if not job:
+        return jsonify({'message': 'Report job not found!'}), 404
+    if job.status != 'done':
+        return jsonify({'message': f'Report is {job.status}', 'status': job.status}), 409
+    pdf = report_cache.get(job.cache_key)
+    if pdf is None:
+        return jsonify({'message': 'Report expired from cache, please resubmit'}), 410
+    employee = Employee.query.get(job.employee_id)
     return send_file(
-        buffer,
+        BytesIO(pdf),
+        as_attachment=True,
+        download_name=f'report_{employee.username}_{job.start_date.isoformat()}.pdf',
+        mimetype='application/pdf'
+    )
+
+# Bulk multi-employee / department export (ZIP of PDFs, combined PDF, or CSV)
+EXPORT_PROCESSES = int(os.getenv('EXPORT_PROCESSES', os.cpu_count() or 2))
+EXPORT_FORMATS = ('zip', 'pdf', 'csv')
+EXPORT_CSV_FIELDS = [
+    'employee_id', 'name', 'email', 'department', 'position', 'days_worked',
+    'active_time', 'idle_time', 'avg_productivity', 'productive_time', 'neutral_time',
+    'unproductive_time', 'top_app', 'top_website'
+]
+_export_executor = None
+_export_executor_lock = threading.Lock()
+
+def export_executor():
+    global _export_executor
+    with _export_executor_lock:
+        if _export_executor is None:
+            _export_executor = ProcessPoolExecutor(max_workers=EXPORT_PROCESSES)
+        return _export_executor
+
+def render_reports_parallel(reports, start_date, end_date):
+    # Yields (report, pdf) in order, keeping at most two renders per process in flight
+    executor = export_executor()
+    pending = deque()
+    for report in reports:
+        pending.append((report, executor.submit(render_report_pdf, report, start_date, end_date)))
+        if len(pending) >= EXPORT_PROCESSES * 2:
+            report, future = pending.popleft()
+            yield report, future.result()
+    while pending:
+        report, future = pending.popleft()
+        yield report, future.result()
+
+class _ZipStream:
+    # Write-only sink for zipfile; the generator drains it after every entry
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_report_zip(reports, start_date, end_date):
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for report, pdf in render_reports_parallel(reports, start_date, end_date):
+            employee = report['employee']
+            archive.writestr(f"report_{employee['id']}_{employee['name']}_{start_date}.pdf".replace('/', '_'), pdf)
+            yield sink.drain()
+    yield sink.drain()
+
+def stream_report_csv(reports):
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS)
+    writer.writeheader()
+    for report in reports:
+        employee = report['employee']
+        summary = report['summary']
+        sessions = report['sessions']
+        writer.writerow({
+            'employee_id': employee['id'],
+            'name': employee['name'],
+            'email': employee['email'],
+            'department': employee['department'],
+            'position': employee['position'],
+            'days_worked': len({s['date'] for s in sessions}),
+            'active_time': summary['active_time'],
+            'idle_time': summary['idle_time'],
+            'avg_productivity': round(sum(s['productivity'] or 0 for s in sessions) / len(sessions)) if sessions else 0,
+            'productive_time': summary['productive_time'],
+            'neutral_time': summary['neutral_time'],
+            'unproductive_time': summary['unproductive_time'],
+            'top_app': report['app_usage'][0]['app'] if report['app_usage'] else '',
+            'top_website': report['websites'][0]['url'] if report['websites'] else ''
+        })
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+@app.route('/api/admin/reports/export', methods=['POST'])
+@token_required
+@admin_required
+def export_reports(current_user):
+    data = request.get_json(silent=True) or {}
+    export_format = data.get('format', 'zip')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    today = datetime.utcnow().date().isoformat()
+    try:
+        start_date = datetime.strptime(data.get('start_date', today), '%Y-%m-%d').date()
+        end_date = datetime.strptime(data.get('end_date', data.get('start_date', today)), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    if data.get('employee_ids'):
+        employees = Employee.query.filter(Employee.id.in_(data['employee_ids'])).order_by(Employee.id).all()
+    elif data.get('department'):
+        employees = Employee.query.filter_by(department=data['department'], is_active=True).order_by(Employee.id).all()
+    else:
+        return jsonify({'message': 'Provide employee_ids or department'}), 400
+    if not employees:
+        return jsonify({'message': 'No matching employees found!'}), 404
+    reports = list(build_report_data_bulk(employees, start_date, end_date).values())
+    name = f"reports_{data.get('department') or 'employees'}_{start_date}_{end_date}".replace('/', '_')
+    if export_format == 'csv':
+        return Response(
+            stream_report_csv(reports),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{name}.csv"'}
+        )
+    if export_format == 'pdf':
+        # ReportLab lays out a whole document at once, so the combined PDF is built in memory
+        elements = []
+        for report in reports:
+            if elements:
+                elements.append(PageBreak())
+            elements.extend(report_elements(report, start_date, end_date))
+        buffer = BytesIO()
+        SimpleDocTemplate(buffer, pagesize=letter).build(elements)
+        buffer.seek(0)
+        return send_file(buffer, as_attachment=True, download_name=f'{name}.pdf', mimetype='application/pdf')
+    return Response(
+        stream_report_zip(reports, start_date, end_date),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{name}.zip"'}
+    )
+
+@app.route('/api/admin/employee/<int:emp_id>/report/download', methods=['GET'])
+@token_required
+@admin_required
+def download_employee_report(current_user, emp_id):
+    employee = Employee.query.get(emp_id)
+    if not employee:
+        return jsonify({'message': 'Employee not found!'}), 404
+    start_date = request.args.get('start_date', datetime.utcnow().date().isoformat())
+    end_date = request.args.get('end_date', datetime.utcnow().date().isoformat())
+    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
+    _, pdf = get_report_pdf(employee, start_date_obj, end_date_obj)
+    return send_file(
+        BytesIO(pdf),
         as_attachment=True,
         download_name=f'report_{employee.username}_{start_date}.pdf',
         mimetype='application/pdf'
@@ -631,6 +2952,350 @@ def email_employee_report(current_user, emp_id):
         'recipients': recipients
     })
 
+# Timeline: keyset pagination on (timestamp, id) and NDJSON streaming
+TIMELINE_DEFAULT_LIMIT = 500
+TIMELINE_MAX_LIMIT = 5000
+TIMELINE_STREAM_BATCH = 1000
+TIMELINE_COLUMNS = (
+    ActivityLog.id,
+    ActivityLog.activity_type,
+    ActivityLog.description,
+    ActivityLog.timestamp,
+    ActivityLog.activity_metadata
+)
+
+TIMELINE_FIELDS = ('type', 'description', 'timestamp', 'timeStr', 'metadata')
+
+# '%I:%M %p' for every minute of the day; strftime was the largest per-row cost
+_CLOCK_LABELS = [f"{(hour - 1) % 12 + 1:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}" for hour in range(24) for minute in range(60)]
+
+def _timeline_row(row):
+    # Unpacked positionally: rows are TIMELINE_COLUMNS results or ArchivedActivity, in the same order
+    _, activity_type, description, at, metadata = row
+    return (
+        activity_type,
+        description,
+        at,
+        _CLOCK_LABELS[at.hour * 60 + at.minute],
+        loads_json(metadata) if metadata and metadata != '{}' else {}
+    )
+
+def _timeline_item(row):
+    return dict(zip(TIMELINE_FIELDS, _timeline_row(row)))
+
+def encode_timeline_cursor(row):
+    return base64.urlsafe_b64encode(f'{row.timestamp.isoformat()}|{row.id}'.encode()).decode()
+
+def decode_timeline_cursor(cursor):
+    try:
+        timestamp, last_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    except (UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+    return datetime.fromisoformat(timestamp), int(last_id)
+
+# Retention: raw events are kept for RETENTION_RAW_DAYS, then folded into hourly summaries
+# (kept for RETENTION_SUMMARY_DAYS) and moved to gzip JSONL archives, one file per day
+RETENTION_RAW_DAYS = int(os.getenv('RETENTION_RAW_DAYS', 30))
+RETENTION_SUMMARY_DAYS = int(os.getenv('RETENTION_SUMMARY_DAYS', 365))
+ACTIVITY_ARCHIVE_DIR = os.getenv('ACTIVITY_ARCHIVE_DIR', os.path.join(app.instance_path, 'activity_archive'))
+
+ArchivedActivity = namedtuple('ArchivedActivity', ['id', 'activity_type', 'description', 'timestamp', 'activity_metadata'])
+
+class ActivityHourlySummary(db.Model):
+    __tablename__ = 'activity_hourly_summary'
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
+    hour = db.Column(db.DateTime, nullable=False)  # truncated to the hour
+    activity_type = db.Column(db.String(50), nullable=False)
+    events = db.Column(db.Integer, default=0)
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'hour', 'activity_type', name='uq_activity_hourly_summary_employee_hour_type'),
+        db.Index('ix_activity_hourly_summary_hour', 'hour'),
+    )
+
+@migration(7, 'Hourly activity summary table')
+def _migration_activity_summaries():
+    db.create_all()
+
+def _activity_sort_key(row):
+    return (row.timestamp, row.id)
+
+def activity_archive_path(day):
+    return os.path.join(ACTIVITY_ARCHIVE_DIR, f'{day:%Y}', f'{day:%m}', f'activity-{day.isoformat()}.jsonl.gz')
+
+def read_activity_archive(day, employee_id=None):
+    path = activity_archive_path(day)
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if employee_id is None or record['employee_id'] == employee_id:
+                yield record
+
+def archived_activities(employee_id, start_date, end_date):
+    # Lazily yields archived events shaped like TIMELINE_COLUMNS rows, in (timestamp, id) order
+    day = start_date
+    while day <= end_date:
+        for record in read_activity_archive(day, employee_id):
+            yield ArchivedActivity(
+                record['id'], record['activity_type'], record['description'],
+                datetime.fromisoformat(record['timestamp']), record['activity_metadata']
+            )
+        day += timedelta(days=1)
+
+def _pending_archive_path(path):
+    return f'{path}.pending'
+
+def _stage_activity_archive(day, records):
+    # Merge with an existing file so late events for the day never duplicate ids. The result goes to a
+    # pending file that replaces the archive only once the delete of those rows has committed.
+    path = activity_archive_path(day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    merged = {record['id']: record for record in read_activity_archive(day)}
+    merged.update((record['id'], record) for record in records)
+    pending_path = _pending_archive_path(path)
+    with gzip.open(pending_path, 'wt', encoding='utf-8') as f:
+        for record in sorted(merged.values(), key=lambda r: (datetime.fromisoformat(r['timestamp']), r['id'])):
+            f.write(json.dumps(record) + '\n')
+    return pending_path
+
+def recover_activity_archives():
+    # A run that died between its commit and the rename leaves a pending file whose rows are gone from the
+    # table: publish it. If any of its rows are still there the delete never committed, so drop the file.
+    recovered = []
+    for pending_path in glob.glob(os.path.join(ACTIVITY_ARCHIVE_DIR, '*', '*', '*.jsonl.gz.pending')):
+        with gzip.open(pending_path, 'rt', encoding='utf-8') as f:
+            ids = [json.loads(line)['id'] for line in f]
+        committed = not any(
+            db.session.query(ActivityLog.id).filter(ActivityLog.id.in_(ids[i:i + UPSERT_CHUNK_SIZE])).first()
+            for i in range(0, len(ids), UPSERT_CHUNK_SIZE)
+        )
+        if committed:
+            os.replace(pending_path, pending_path[:-len('.pending')])
+            recovered.append(pending_path)
+        else:
+            os.remove(pending_path)
+    return recovered
+
+def upsert_activity_summaries(rows):
+    # rows: dicts with employee_id, hour, activity_type, events
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = _dialect_insert(ActivityHourlySummary).values(rows[i:i + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['employee_id', 'hour', 'activity_type'],
+            set_={'events': ActivityHourlySummary.events + stmt.excluded.events}
+        )
+        db.session.execute(stmt)
+
+def compact_activity_day(day):
+    rows = db.session.query(ActivityLog.employee_id, *TIMELINE_COLUMNS).filter(
+        ActivityLog.timestamp >= day,
+        ActivityLog.timestamp < day + timedelta(days=1)
+    ).all()
+    if not rows:
+        return 0
+    pending_path = _stage_activity_archive(day, [{
+        'id': row.id,
+        'employee_id': row.employee_id,
+        'activity_type': row.activity_type,
+        'description': row.description,
+        'timestamp': row.timestamp.isoformat(),
+        'activity_metadata': row.activity_metadata
+    } for row in rows])
+    try:
+        counts = {}
+        for row in rows:
+            key = (row.employee_id, row.timestamp.replace(minute=0, second=0, microsecond=0), row.activity_type or '')
+            counts[key] = counts.get(key, 0) + 1
+        upsert_activity_summaries([
+            {'employee_id': employee_id, 'hour': hour, 'activity_type': activity_type, 'events': events}
+            for (employee_id, hour, activity_type), events in counts.items()
+        ])
+        # Delete by id rather than by range so events written since the SELECT stay put until the next run
+        ids = [row.id for row in rows]
+        for i in range(0, len(ids), UPSERT_CHUNK_SIZE):
+            ActivityLog.query.filter(ActivityLog.id.in_(ids[i:i + UPSERT_CHUNK_SIZE])).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(pending_path)
+        raise
+    os.replace(pending_path, activity_archive_path(day))
+    return len(rows)
+
+def compact_activity_logs(today=None):
+    today = today or datetime.utcnow().date()
+    raw_cutoff = today - timedelta(days=RETENTION_RAW_DAYS)
+    recover_activity_archives()
+    compacted = []
+    while True:
+        oldest = db.session.query(func.min(ActivityLog.timestamp)).filter(ActivityLog.timestamp < raw_cutoff).scalar()
+        if oldest is None:
+            break
+        compacted.append((oldest.date(), compact_activity_day(oldest.date())))
+    purged = ActivityHourlySummary.query.filter(
+        ActivityHourlySummary.hour < today - timedelta(days=RETENTION_SUMMARY_DAYS)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    drop_empty_partitions(ActivityLog, raw_cutoff)
+    return compacted, purged
+
+# Optional monthly range partitioning of the event tables on PostgreSQL (PG_PARTITIONING=1).
+# Each table gets one partition per month plus a DEFAULT partition that catches rows past the
+# newest month; ensure_partitions() moves those rows out when it creates the missing month.
+PG_PARTITIONING = os.getenv('PG_PARTITIONING', '0') == '1'
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', 3))
+PARTITION_CHECK_INTERVAL = int(os.getenv('PARTITION_CHECK_INTERVAL', 6 * 3600))
+PARTITIONED_TABLES = ((ActivityLog, 'timestamp'), (AppUsage, 'date'), (WebsiteVisit, 'date'))
+
+def partitioning_enabled():
+    return PG_PARTITIONING and db.engine.dialect.name == 'postgresql'
+
+def _month_start(value):
+    return (value.date() if isinstance(value, datetime) else value).replace(day=1)
+
+def _next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def is_partitioned(connection, table):
+    return connection.exec_driver_sql(
+        'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', (table,)
+    ).first() is not None
+
+def table_partitions(connection, table):
+    return [row[0] for row in connection.exec_driver_sql(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname', (table,)
+    )]
+
+def _create_month_partition(connection, table, column, month):
+    name = f'{table}_p{month:%Y%m}'
+    if connection.exec_driver_sql('SELECT to_regclass(%s)', (name,)).scalar():
+        return None
+    lower, upper = month.isoformat(), _next_month(month).isoformat()
+    connection.exec_driver_sql(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)')
+    connection.exec_driver_sql(
+        f'WITH moved AS (DELETE FROM {table}_default WHERE "{column}" >= %s AND "{column}" < %s RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved', (lower, upper)
+    )
+    connection.exec_driver_sql(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+    return name
+
+def _partition_table(connection, model, column, months_ahead):
+    # Rebuild the heap table as a partitioned parent; keys must include the partition column
+    table = model.__tablename__
+    legacy = f'{table}_legacy'
+    connection.exec_driver_sql(f'ALTER TABLE {table} RENAME TO {legacy}')
+    connection.exec_driver_sql(f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ("{column}")')
+    connection.exec_driver_sql(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    oldest = connection.exec_driver_sql(f'SELECT min("{column}") FROM {legacy}').scalar()
+    this_month = _month_start(datetime.utcnow())
+    month = min(_month_start(oldest), this_month) if oldest else this_month
+    for _ in range(months_ahead):
+        this_month = _next_month(this_month)
+    while month <= this_month:
+        _create_month_partition(connection, table, column, month)
+        month = _next_month(month)
+    connection.exec_driver_sql(f'INSERT INTO {table} SELECT * FROM {legacy}')
+    sequence = connection.exec_driver_sql("SELECT pg_get_serial_sequence(%s, 'id')", (legacy,)).scalar()
+    if sequence:
+        connection.exec_driver_sql(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+    connection.exec_driver_sql(f'DROP TABLE {legacy}')
+    connection.exec_driver_sql(f'ALTER TABLE {table} ADD PRIMARY KEY (id, "{column}")')
+    for constraint in model.__table__.constraints:
+        if isinstance(constraint, (db.UniqueConstraint, db.ForeignKeyConstraint)):
+            connection.execute(AddConstraint(constraint))
+    for index in model.__table__.indexes:
+        index.create(connection)
+
+def ensure_partitions(months_ahead=PARTITION_MONTHS_AHEAD):
+    if not partitioning_enabled():
+        return []
+    connection = db.session.connection()
+    # Serialize across workers so two processes never race to create the same month
+    connection.exec_driver_sql("SELECT pg_advisory_xact_lock(hashtext('emp_tracker_partitions'))")
+    created = []
+    for model, column in PARTITIONED_TABLES:
+        table = model.__tablename__
+        if not is_partitioned(connection, table):
+            if _legacy_usage_columns(connection, model):
+                continue  # migration 10 rebuilds it with interned keys, then partitions it
+            _partition_table(connection, model, column, months_ahead)
+            created.append(table)
+            continue
+        month = _month_start(datetime.utcnow())
+        for _ in range(months_ahead + 1):
+            name = _create_month_partition(connection, table, column, month)
+            if name:
+                created.append(name)
+            month = _next_month(month)
+    db.session.commit()
+    return created
+
+def drop_empty_partitions(model, before):
+    # Retention leaves whole months empty; dropping them is cheaper than vacuuming dead rows
+    if not partitioning_enabled():
+        return []
+    connection = db.session.connection()
+    table = model.__tablename__
+    dropped = []
+    for name in table_partitions(connection, table):
+        match = re.fullmatch(rf'{table}_p(\d{{4}})(\d{{2}})', name)
+        if not match:
+            continue
+        month = datetime(int(match.group(1)), int(match.group(2)), 1).date()
+        if _next_month(month) > before or connection.exec_driver_sql(f'SELECT 1 FROM {name} LIMIT 1').first():
+            continue
+        connection.exec_driver_sql(f'ALTER TABLE {table} DETACH PARTITION {name}')
+        connection.exec_driver_sql(f'DROP TABLE {name}')
+        dropped.append(name)
+    db.session.commit()
+    return dropped
+
+def partitions_scanned(model, column, month):
+    # Partitions a one-month range query touches after pruning; 1 means pruning works
+    table = model.__tablename__
+    key = getattr(model, column)
+    plan = explain_query(model.query.filter(key >= month, key < _next_month(month)))
+    return sorted({name for line in plan for name in re.findall(rf'\b{table}_(?:p\d{{6}}|default)\b', line)})
+
+@migration(8, 'Monthly range partitions for event tables (PostgreSQL with PG_PARTITIONING=1)')
+def _migration_partition_event_tables():
+    ensure_partitions()
+
+def _partition_maintenance_loop():
+    while True:
+        try:
+            with app.app_context():
+                ensure_partitions()
+        except Exception:
+            app.logger.exception('Partition maintenance failed')
+        time.sleep(PARTITION_CHECK_INTERVAL)
+
+if PG_PARTITIONING:
+    threading.Thread(target=_partition_maintenance_loop, name='partition-maintenance', daemon=True).start()
+
+@app.route('/api/admin/employee/<int:emp_id>/sessions/recompute', methods=['POST'])
+@token_required
+@admin_required
+def recompute_employee_sessions(current_user, emp_id):
+    if not Employee.query.get(emp_id):
+        return jsonify({'message': 'Employee not found!'}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        day = datetime.strptime(data.get('date', datetime.utcnow().date().isoformat()), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    sessions = recompute_sessions(day, emp_id)
+    response_cache.bump('sessions')
+    return jsonify({
+        'message': f'Recomputed {len(sessions)} session(s)',
+        'sessions': [_session_json(
+            s.date, s.clock_in, s.clock_out, s.active_time, s.idle_time, s.productivity_score
+        ) for s in sessions]
+    })
+
 @app.route('/api/admin/employee/<int:emp_id>/timeline', methods=['GET'])
 @token_required
 @admin_required
@@ -642,62 +3307,149 @@ def get_employee_timeline(current_user, emp_id):
     end_date = request.args.get('end_date', datetime.utcnow().date().isoformat())
     start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
     end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-    activities = ActivityLog.query.filter(
+    query = db.session.query(*TIMELINE_COLUMNS).filter(
         ActivityLog.employee_id == emp_id,
         ActivityLog.timestamp >= start_date_obj,
         ActivityLog.timestamp <= end_date_obj + timedelta(days=1)
-    ).order_by(ActivityLog.timestamp).all()
+    ).order_by(ActivityLog.timestamp, ActivityLog.id)
+    # Days past the raw retention window live in archive files; merge them in as they are read
+    archived = archived_activities(emp_id, start_date_obj, end_date_obj)
+    if request.args.get('stream') in ('1', 'true', 'ndjson'):
+        def generate():
+            for row in heapq.merge(archived, query.yield_per(TIMELINE_STREAM_BATCH), key=_activity_sort_key):
+                yield dumps_json(_timeline_item(row)) + b'\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return table_response(TIMELINE_FIELDS, [
+            _timeline_row(row) for row in heapq.merge(archived, query, key=_activity_sort_key)
+        ])
+    try:
+        limit = min(max(int(request.args.get('limit', TIMELINE_DEFAULT_LIMIT)), 1), TIMELINE_MAX_LIMIT)
+        if request.args.get('cursor'):
+            timestamp, last_id = decode_timeline_cursor(request.args['cursor'])
+            query = query.filter(db.or_(
+                ActivityLog.timestamp > timestamp,
+                db.and_(ActivityLog.timestamp == timestamp, ActivityLog.id > last_id)
+            ))
+            archived = (
+                row for row in archived_activities(emp_id, max(start_date_obj, timestamp.date()), end_date_obj)
+                if _activity_sort_key(row) > (timestamp, last_id)
+            )
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor or limit'}), 400
+    rows = list(islice(heapq.merge(archived, query.limit(limit + 1), key=_activity_sort_key), limit + 1))
+    next_cursor = encode_timeline_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return table_response(TIMELINE_FIELDS, [_timeline_row(row) for row in rows[:limit]], 'items', next_cursor=next_cursor)
+
+@app.route('/api/admin/employee/<int:emp_id>/activity-summary', methods=['GET'])
+@token_required
+@admin_required
+def get_activity_summary(current_user, emp_id):
+    if not Employee.query.get(emp_id):
+        return jsonify({'message': 'Employee not found!'}), 404
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end_date', request.args['start_date']), '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'message': 'start_date is required, expected YYYY-MM-DD'}), 400
+    rows = ActivityHourlySummary.query.filter(
+        ActivityHourlySummary.employee_id == emp_id,
+        ActivityHourlySummary.hour >= start_date,
+        ActivityHourlySummary.hour < end_date + timedelta(days=1)
+    ).order_by(ActivityHourlySummary.hour, ActivityHourlySummary.activity_type)
     return jsonify([{
-        'type': act.activity_type,
-        'description': act.description,
-        'timestamp': act.timestamp.isoformat(),
-        'timeStr': act.timestamp.strftime('%I:%M %p'),
-        'metadata': json.loads(act.activity_metadata or '{}')
-    } for act in activities])
+        'hour': row.hour.isoformat(),
+        'type': row.activity_type,
+        'events': row.events
+    } for row in rows])
+
+def _settings_json(values):
+    return {
+        'work_start': values.work_start.strftime('%H:%M') if values.work_start else None,
+        'work_end': values.work_end.strftime('%H:%M') if values.work_end else None,
+        'idle_timeout': values.idle_timeout
+    }
+
+def _parse_settings(data, required):
+    # Returns (values, error); keys missing from a partial update come back as None
+    if required and any(key not in data for key in SettingsValues._fields):
+        return None, 'Missing required settings'
+    try:
+        work_start = datetime.strptime(data['work_start'], '%H:%M').time() if data.get('work_start') else None
+        work_end = datetime.strptime(data['work_end'], '%H:%M').time() if data.get('work_end') else None
+        idle_timeout = int(data['idle_timeout']) if data.get('idle_timeout') is not None else None
+    except (TypeError, ValueError):
+        return None, 'Invalid time format or idle timeout'
+    if required and None in (work_start, work_end, idle_timeout):
+        return None, 'Invalid time format or idle timeout'
+    if idle_timeout is not None and idle_timeout < 1:
+        return None, 'Idle timeout must be at least 1 minute'
+    return SettingsValues(work_start, work_end, idle_timeout), None
 
 @app.route('/api/admin/settings', methods=['POST'])
 @token_required
 @admin_required
 def save_settings(current_user):
     data = request.get_json()
-    if 'work_start' not in data or 'work_end' not in data or 'idle_timeout' not in data:
-        return jsonify({'message': 'Missing required settings'}), 400
-    try:
-        work_start = datetime.strptime(data['work_start'], '%H:%M').time()
-        work_end = datetime.strptime(data['work_end'], '%H:%M').time()
-        idle_timeout = int(data['idle_timeout'])
-        if idle_timeout < 1:
-            return jsonify({'message': 'Idle timeout must be at least 1 minute'}), 400
-    except ValueError:
-        return jsonify({'message': 'Invalid time format or idle timeout'}), 400
+    values, error = _parse_settings(data, required=True)
+    if error:
+        return jsonify({'message': error}), 400
     settings = Settings.query.first()
     if not settings:
         settings = Settings()
         db.session.add(settings)
-    settings.work_start = work_start
-    settings.work_end = work_end
-    settings.idle_timeout = idle_timeout
+    settings.work_start = values.work_start
+    settings.work_end = values.work_end
+    settings.idle_timeout = values.idle_timeout
     settings.updated_at = datetime.utcnow()
     db.session.commit()
+    settings_cache.reload()
+    response_cache.bump('settings')
     return jsonify({'message': 'Settings saved successfully'})
 
 @app.route('/api/admin/settings', methods=['GET'])
 @token_required
 @admin_required
+@response_cache.cached(ttl=60, scopes=('settings',))
 def get_settings(current_user):
-    settings = Settings.query.first()
-    if not settings:
-        return jsonify({
-            'work_start': '09:00',
-            'work_end': '17:00',
-            'idle_timeout': 5
-        })
     return jsonify({
-        'work_start': settings.work_start.strftime('%H:%M'),
-        'work_end': settings.work_end.strftime('%H:%M'),
-        'idle_timeout': settings.idle_timeout
+        **_settings_json(settings_cache.get()),
+        'departments': {
+            department: _settings_json(values) for department, values in sorted(settings_cache.overrides().items())
+        }
     })
 
+@app.route('/api/admin/settings/departments/<department>', methods=['PUT'])
+@token_required
+@admin_required
+def save_department_settings(current_user, department):
+    values, error = _parse_settings(request.get_json() or {}, required=False)
+    if error:
+        return jsonify({'message': error}), 400
+    override = DepartmentSettings.query.filter_by(department=department).first()
+    if not override:
+        override = DepartmentSettings(department=department)
+        db.session.add(override)
+    override.work_start = values.work_start
+    override.work_end = values.work_end
+    override.idle_timeout = values.idle_timeout
+    override.updated_at = datetime.utcnow()
+    db.session.commit()
+    settings_cache.reload()
+    response_cache.bump('settings')
+    return jsonify({'message': f'Settings for {department} saved successfully'})
+
+@app.route('/api/admin/settings/departments/<department>', methods=['DELETE'])
+@token_required
+@admin_required
+def delete_department_settings(current_user, department):
+    if not DepartmentSettings.query.filter_by(department=department).delete():
+        return jsonify({'message': 'No settings override for this department!'}), 404
+    db.session.commit()
+    settings_cache.reload()
+    response_cache.bump('settings')
+    return jsonify({'message': f'Settings override for {department} removed'})
+
 # Employee Self-Service Routes (unchanged)
 @app.route('/api/employee/dashboard', methods=['GET'])
 @token_required
@@ -706,8 +3458,12 @@ def get_employee_dashboard(current_user):
         return jsonify({'message': 'Employee access only!'}), 403
     today = datetime.utcnow().date()
     session = WorkSession.query.filter_by(employee_id=current_user['id'], date=today).first()
-    apps = AppUsage.query.filter_by(employee_id=current_user['id'], date=today).all()
-    websites = WebsiteVisit.query.filter_by(employee_id=current_user['id'], date=today).all()
+    apps = db.session.query(AppName.name, AppUsage.duration, AppUsage.category).join(
+        AppName, AppName.id == AppUsage.app_id
+    ).filter(AppUsage.employee_id == current_user['id'], AppUsage.date == today).all()
+    websites = db.session.query(WebDomain.domain, WebsiteVisit.duration, WebsiteVisit.visits, WebsiteVisit.category).join(
+        WebDomain, WebDomain.id == WebsiteVisit.domain_id
+    ).filter(WebsiteVisit.employee_id == current_user['id'], WebsiteVisit.date == today).all()
     return jsonify({
         'session': {
             'clock_in': session.clock_in.isoformat() if session else None,
@@ -716,83 +3472,555 @@ def get_employee_dashboard(current_user):
             'productivity': session.productivity_score if session else 0
         } if session else None,
         'app_usage': [{
-            'app': a.app_name,
+            'app': a.name,
             'duration': a.duration,
             'category': a.category
         } for a in apps],
         'websites': [{
-            'url': w.url,
+            'url': w.domain,
             'duration': w.duration,
             'visits': w.visits,
             'category': w.category
         } for w in websites]
     })
 
+# CLI Commands
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    applied = upgrade_schema()
+    print(f"Schema at version {current_schema_version()} (applied: {applied or 'none'})")
+    kept = [name for name in map(pre_interning_table, LEGACY_USAGE_LAYOUTS) if inspect(db.engine).has_table(name)]
+    if kept:
+        print(f"Pre-interning rows kept in {', '.join(kept)}; remove them with `flask drop-pre-interning-usage`")
+
+@app.cli.command('drop-pre-interning-usage')
+def drop_pre_interning_usage_command():
+    # Frees the copies migration 10 keeps of app_usage/website_visit as they were before interning
+    connection = db.session.connection()
+    for model in LEGACY_USAGE_LAYOUTS:
+        name = pre_interning_table(model)
+        if inspect(connection).has_table(name):
+            connection.exec_driver_sql(f'DROP TABLE {name}')
+            print(f"Dropped {name}")
+    db.session.commit()
+
+@app.cli.command('explain-hot-queries')
+def explain_hot_queries_command():
+    full_scans = []
+    for name, query in hot_queries().items():
+        plan = explain_query(query)
+        print(f"{name}:")
+        for line in plan:
+            print(f"    {line}")
+        if is_full_scan(plan):
+            full_scans.append(name)
+    if full_scans:
+        raise SystemExit(f"Full table scans in: {', '.join(full_scans)}")
+
+@app.cli.command('rollup-backfill')
+@click.option('--start-date', help='First day to roll up (YYYY-MM-DD); defaults to the earliest session')
+@click.option('--end-date', help='Last day to roll up (YYYY-MM-DD); defaults to yesterday')
+def rollup_backfill_command(start_date, end_date):
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else yesterday
+    if start_date:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+    else:
+        earliest = [db.session.query(func.min(model.date)).scalar() for model in (WorkSession, AppUsage, WebsiteVisit)]
+        start_date = min(filter(None, earliest), default=end_date)
+    backfill_rollups(start_date, min(end_date, yesterday))
+    print(f"Rolled up {start_date} to {min(end_date, yesterday)}")
+
+@app.cli.command('rollup-refresh')
+def rollup_refresh_command():
+    days = refresh_stale_rollups()
+    print(f"Refreshed stale rollups for {len(days)} day(s)")
+
+@app.cli.command('sessions-recompute')
+@click.option('--date', 'day', help='Day to recompute (YYYY-MM-DD); defaults to today')
+@click.option('--employee-id', type=int, help='Only this employee')
+def sessions_recompute_command(day, employee_id):
+    day = datetime.strptime(day, '%Y-%m-%d').date() if day else datetime.utcnow().date()
+    sessions = recompute_sessions(day, employee_id)
+    print(f"Recomputed {len(sessions)} session(s) for {day}")
+
+@app.cli.command('activity-compact')
+@click.option('--today', help='Treat this day (YYYY-MM-DD) as today when applying the retention windows')
+def activity_compact_command(today):
+    today = datetime.strptime(today, '%Y-%m-%d').date() if today else None
+    compacted, purged = compact_activity_logs(today)
+    for day, events in compacted:
+        print(f"{day}: archived {events} event(s) to {activity_archive_path(day)}")
+    print(f"Compacted {len(compacted)} day(s), purged {purged} expired hourly summary row(s)")
+
+@app.cli.command('db-partition')
+@click.option('--months-ahead', default=PARTITION_MONTHS_AHEAD, help='Future monthly partitions to keep ready')
+def db_partition_command(months_ahead):
+    if not partitioning_enabled():
+        print("Partitioning needs PostgreSQL and PG_PARTITIONING=1; nothing to do")
+        return
+    created = ensure_partitions(months_ahead)
+    print(f"Created: {', '.join(created) or 'none'}")
+    month = _month_start(datetime.utcnow())
+    unpruned = []
+    for model, column in PARTITIONED_TABLES:
+        table = model.__tablename__
+        scanned = partitions_scanned(model, column, month)
+        print(f"{table}: {len(table_partitions(db.session.connection(), table))} partition(s), "
+              f"{month:%Y-%m} query scans {', '.join(scanned)}")
+        if len(scanned) != 1:
+            unpruned.append(table)
+    if unpruned:
+        raise SystemExit(f"Partition pruning not effective for: {', '.join(unpruned)}")
+
+# Synthetic data for load testing: N employees x D days of activity, sessions, app usage and website visits
+SEED_DEPARTMENTS = ('Engineering', 'Sales', 'Support', 'Marketing', 'Finance', 'Operations')
+SEED_APPS = (
+    ('VS Code', 'productive'), ('Terminal', 'productive'), ('Jira', 'productive'), ('Excel', 'productive'),
+    ('Salesforce', 'productive'), ('Figma', 'productive'), ('Slack', 'neutral'), ('Outlook', 'neutral'),
+    ('Zoom', 'neutral'), ('Teams', 'neutral'), ('Chrome', 'neutral'), ('Spotify', 'unproductive'),
+    ('Steam', 'unproductive'), ('WhatsApp', 'unproductive')
+)
+SEED_SITES = (
+    ('docs.python.org', 'productive'), ('github.com', 'productive'), ('stackoverflow.com', 'productive'),
+    ('confluence.example.com', 'productive'), ('mail.google.com', 'neutral'), ('calendar.google.com', 'neutral'),
+    ('news.ycombinator.com', 'neutral'), ('www.linkedin.com', 'neutral'), ('www.youtube.com', 'unproductive'),
+    ('www.reddit.com', 'unproductive'), ('twitter.com', 'unproductive'), ('www.netflix.com', 'unproductive')
+)
+SEED_PASSWORD = 'password123'
+
+def _seed_day(rng, employee_id, day, settings, events_per_day, now, ids):
+    # One employee-day: the event stream, the usage rows and the session those events produce
+    clock_in = datetime.combine(day, settings.work_start) + timedelta(minutes=rng.randint(-30, 30))
+    clock_out = datetime.combine(day, settings.work_end) + timedelta(minutes=rng.randint(-45, 75))
+    if clock_in >= now:
+        return None
+    step = (clock_out - clock_in) / max(events_per_day - 1, 1)
+    events = [('clockin', 'Clocked in', clock_in)]
+    at, idle = clock_in, False
+    for _ in range(events_per_day - 2):
+        at += step * rng.uniform(0.5, 1.5)
+        if at >= min(clock_out, now):
+            break
+        idle = rng.random() < (0.6 if idle else 0.1)
+        events.append(('idle', 'Idle', at) if idle else ('active', 'Working', at))
+    if clock_out < now:
+        events.append(('clockout', 'Clocked out', clock_out))
+    # Plain attributes rather than an ORM instance: apply_session_event runs once per generated event
+    session = SimpleNamespace(**{
+        column.name: getattr(new_work_session(employee_id, clock_in), column.name)
+        for column in WorkSession.__table__.columns if column.name != 'id'
+    })
+    hours = (min(clock_out, now) - clock_in).total_seconds() / 3600
+    apps, sites = rng.sample(SEED_APPS, rng.randint(4, 8)), rng.sample(SEED_SITES, rng.randint(3, 8))
+    app_rows = [{
+        'employee_id': employee_id, 'app_id': ids[name], 'category': category, 'date': day,
+        'duration': round(hours * rng.uniform(0.03, 0.3), 4), 'last_used': clock_in + (min(clock_out, now) - clock_in) * rng.random()
+    } for name, category in apps]
+    site_rows = [{
+        'employee_id': employee_id, 'domain_id': ids[domain], 'category': category, 'date': day,
+        'duration': round(hours * rng.uniform(0.01, 0.1), 4), 'visits': rng.randint(1, 40),
+        'last_visited': clock_in + (min(clock_out, now) - clock_in) * rng.random()
+    } for domain, category in sites]
+    for category, hours in category_totals(
+        [(name, row['category'], row['duration']) for (name, _), row in zip(apps, app_rows)],
+        [(row['category'], row['duration']) for row in site_rows]
+    ).items():
+        setattr(session, f'{category}_time', hours)
+    for activity_type, _, at in events[1:]:
+        apply_session_event(session, activity_type, at, settings)
+    if clock_out < now:
+        session.clock_out = clock_out
+    session_row = vars(session)
+    activity_rows = [{
+        'employee_id': employee_id, 'activity_type': activity_type, 'description': description,
+        'timestamp': at, 'activity_metadata': '{}'
+    } for activity_type, description, at in events]
+    return session_row, activity_rows, app_rows, site_rows
+
+@app.cli.command('seed-data')
+@click.option('--employees', default=100, help='Employees to create')
+@click.option('--days', default=30, help='Days of history per employee, ending today')
+@click.option('--events-per-day', default=100, help='Activity events per employee-day')
+@click.option('--seed', default=0, help='Random seed; the same seed produces the same data')
+@click.option('--batch', default=50, help='Employees generated per bulk insert and commit')
+def seed_data_command(employees, days, events_per_day, seed, batch):
+    # Appends to whatever is already there; generated usernames continue after the existing seed-NNNNNN ones
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    first_day = now.date() - timedelta(days=days - 1)
+    ids = {**app_names.ids([name for name, _ in SEED_APPS]), **web_domains.ids([domain for domain, _ in SEED_SITES])}
+    last = db.session.query(func.max(Employee.username)).filter(Employee.username.like('seed-%')).scalar()
+    offset = int(last.split('-')[1]) + 1 if last else 0
+    pwhash = generate_password_hash(SEED_PASSWORD, PASSWORD_HASH_METHOD)
+    started = time.perf_counter()
+    if not Admin.query.first():
+        db.session.add(Admin(username='admin', password=generate_password_hash('admin123', PASSWORD_HASH_METHOD),
+                             email='admin@company.com'))
+        print("Created admin/admin123")
+    totals = dict(employees=0, activity_log=0, work_session=0, app_usage=0, website_visit=0)
+    for chunk_start in range(0, employees, batch):
+        numbers = range(offset + chunk_start, offset + min(chunk_start + batch, employees))
+        db.session.bulk_insert_mappings(Employee, [{
+            'username': f'seed-{n:06d}',
+            'password': pwhash,
+            'name': f'Seed Employee {n}',
+            'email': f'seed-{n:06d}@example.com',
+            'department': rng.choice(SEED_DEPARTMENTS),
+            'position': rng.choice(('Agent', 'Analyst', 'Developer', 'Manager')),
+            'created_at': now - timedelta(days=days)
+        } for n in numbers])
+        employee_ids = [row[0] for row in db.session.query(Employee.id).filter(
+            Employee.username.in_([f'seed-{n:06d}' for n in numbers])
+        )]
+        sessions, activities, apps, sites = [], [], [], []
+        for employee_id in employee_ids:
+            settings = settings_cache.for_employee(employee_id)
+            for offset_days in range(days):
+                generated = _seed_day(rng, employee_id, first_day + timedelta(days=offset_days), settings, events_per_day, now, ids)
+                if generated:
+                    sessions.append(generated[0])
+                    activities += generated[1]
+                    apps += generated[2]
+                    sites += generated[3]
+        for model, rows in ((WorkSession, sessions), (ActivityLog, activities), (AppUsage, apps), (WebsiteVisit, sites)):
+            if rows:
+                # Core executemany skips the ORM's per-row bookkeeping; these rows have no relationships to maintain
+                db.session.execute(model.__table__.insert(), rows)
+            totals[model.__tablename__] += len(rows)
+        db.session.commit()
+        totals['employees'] += len(employee_ids)
+        print(f"{totals['employees']}/{employees} employees, {totals['activity_log']} events "
+              f"({time.perf_counter() - started:.1f}s)")
+    if days > 1:
+        backfill_rollups(first_day, now.date() - timedelta(days=1))
+    response_cache.bump('employees', 'activity', 'sessions', 'app_usage')
+    print(f"Generated {', '.join(f'{count} {name}' for name, count in totals.items())} "
+          f"in {time.perf_counter() - started:.1f}s; every seed employee's password is {SEED_PASSWORD!r}")
+
+BENCH_INGEST_REQUESTS = {
+    'activity': ('/api/employee/activity', {'activity_type': 'active', 'description': 'bench'}),
+    'app-usage': ('/api/employee/app-usage', {'app_name': 'bench', 'duration': 0.001, 'category': 'productive'}),
+    'website-visit': ('/api/employee/website-visit', {'url': 'https://bench.example.com', 'duration': 0.001}),
+}
+
+def run_load(url, concurrency, total, next_request):
+    # Sends `total` requests over `concurrency` keep-alive connections; next_request(n) -> (method, path, body, headers)
+    target = urlparse(url)
+    counter = itertools.count()
+    latencies = []
+    errors = []
+
+    def worker(_):
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        while (n := next(counter)) < total:
+            method, path, body, headers = next_request(n)
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors.append(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(type(e).__name__)
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+            latencies.append(time.perf_counter() - started)
+        conn.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': total,
+        'errors': len(errors),
+        'error_kinds': {str(kind): errors.count(kind) for kind in set(errors)},
+        'seconds': round(elapsed, 3),
+        'throughput': round(total / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+        'p90_ms': round(_percentile(latencies, 0.90) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0
+    }
+
+@app.cli.command('bench-ingest')
+@click.option('--url', 'urls', multiple=True, required=True,
+              help='Base URL of a running server; repeat to compare, e.g. gunicorn sync workers vs uvicorn asgi:application')
+@click.option('--endpoint', type=click.Choice(list(BENCH_INGEST_REQUESTS)), default='activity')
+@click.option('--concurrency', default=32, help='Concurrent keep-alive connections')
+@click.option('--requests', 'total', default=5000, help='Requests per server')
+@click.option('--employees', default=50, help='Active employees to spread the load over')
+def bench_ingest_command(urls, endpoint, concurrency, total, employees):
+    # Writes real rows: point it at servers sharing a scratch DATABASE_URL with this process
+    ids = [row[0] for row in db.session.query(Employee.id).filter_by(is_active=True).limit(employees)]
+    if not ids:
+        raise SystemExit("No active employees; create some first")
+    tokens = [jwt.encode({
+        'user_id': employee_id,
+        'user_type': 'employee',
+        'exp': datetime.utcnow() + timedelta(hours=1)
+    }, app.config['SECRET_KEY']) for employee_id in ids]
+    path, body = BENCH_INGEST_REQUESTS[endpoint]
+    payload = json.dumps(body)
+    for url in urls:
+        result = run_load(url, concurrency, total, lambda n: ('POST', path, payload, {
+            'Authorization': f'Bearer {tokens[n % len(tokens)]}',
+            'Content-Type': 'application/json'
+        }))
+        print(f"{url} {path}: {result['throughput']:8.0f} req/s   "
+              f"p50 {result['p50_ms']:7.1f} ms   p99 {result['p99_ms']:7.1f} ms   errors {result['errors']}")
+
+BENCH_LOGIN_PASSWORD = 'bench-login'
+
+@app.cli.command('bench-login')
+@click.option('--url', 'urls', multiple=True, required=True, help='Base URL of a running server; repeat to compare')
+@click.option('--agents', default=5000, help='Agents logging in, once each')
+@click.option('--concurrency', default=200, help='Logins in flight at once')
+@click.option('--seed-method', default=PASSWORD_HASH_METHOD,
+              help='Hash method for newly created bench agents; an older one exercises rehash-on-login')
+def bench_login_command(urls, agents, concurrency, seed_method):
+    # Simulates the morning burst: every agent opens a fresh connection and logs in once. Writes real
+    # rows; point it at servers sharing a scratch DATABASE_URL with this process
+    usernames = [f'bench-login-{n:05d}' for n in range(agents)]
+    existing = {row[0] for row in db.session.query(Employee.username).filter(Employee.username.like('bench-login-%'))}
+    missing = [username for username in usernames if username not in existing]
+    if missing:
+        # One shared hash keeps seeding fast; every login still pays the full verification cost
+        pwhash = generate_password_hash(BENCH_LOGIN_PASSWORD, seed_method)
+        db.session.bulk_insert_mappings(Employee, [{
+            'username': username,
+            'password': pwhash,
+            'name': username,
+            'email': f'{username}@bench.invalid',
+            'department': 'Bench',
+            'position': 'Agent'
+        } for username in missing])
+        db.session.commit()
+        response_cache.bump('employees')
+        print(f"Created {len(missing)} bench agents")
+    for url in urls:
+        target = urlparse(url)
+        latencies = []
+        statuses = {}
+
+        def login(username):
+            started = time.perf_counter()
+            conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=120)
+            try:
+                conn.request('POST', '/api/auth/employee/login', headers={'Content-Type': 'application/json'},
+                             body=json.dumps({'username': username, 'password': BENCH_LOGIN_PASSWORD}))
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+            finally:
+                conn.close()
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(login, usernames))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        print(f"{url}: {agents} logins in {elapsed:.1f}s ({agents / elapsed:.0f}/s)   "
+              f"p50 {_percentile(latencies, 0.50) * 1000:7.1f} ms   p99 {_percentile(latencies, 0.99) * 1000:7.1f} ms   "
+              f"statuses {dict(sorted(statuses.items(), key=str))}")
+
+BENCH_SUITE = {
+    # name: (method, path template, JSON body, whose token); paths are filled per request from bench_suite_command
+    **{f'ingest-{name}': ('POST', path, body, 'employee') for name, (path, body) in BENCH_INGEST_REQUESTS.items()},
+    'ingest-telemetry-batch': ('POST', '/api/employee/telemetry/batch', {'events': [
+        {'type': 'activity', 'activity_type': 'active', 'description': 'bench'},
+        {'type': 'app_usage', 'app_name': 'bench', 'duration': 0.001, 'category': 'productive'},
+        {'type': 'website_visit', 'url': 'https://bench.example.com', 'duration': 0.001}
+    ]}, 'employee'),
+    'employee-dashboard': ('GET', '/api/employee/dashboard', None, 'employee'),
+    'admin-dashboard': ('GET', '/api/admin/dashboard', None, 'admin'),
+    'admin-employees': ('GET', '/api/admin/employees', None, 'admin'),
+    'admin-kpis': ('GET', '/api/admin/analytics/kpis?start_date={week_ago}&end_date={today}&group_by=department', None, 'admin'),
+    'admin-departments': ('GET', '/api/admin/analytics/departments?start_date={month_ago}&end_date={yesterday}', None, 'admin'),
+    'admin-timeline': ('GET', '/api/admin/employee/{employee_id}/timeline?start_date={yesterday}', None, 'admin'),
+    'admin-report': ('GET', '/api/admin/employee/{employee_id}/report?start_date={month_ago}&end_date={today}', None, 'admin'),
+    'admin-report-pdf': ('GET', '/api/admin/employee/{employee_id}/report/download?start_date={week_ago}&end_date={today}', None, 'admin'),
+}
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=app.root_path, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+@app.cli.command('bench-suite')
+@click.option('--url', required=True, help='Base URL of a running server using the same DATABASE_URL as this process')
+@click.option('--scenario', 'scenarios', multiple=True, type=click.Choice(list(BENCH_SUITE)), help='Repeat to pick; default all')
+@click.option('--concurrency', 'levels', multiple=True, type=int, default=(1, 8, 32), show_default=True,
+              help='Concurrency level; repeat for several')
+@click.option('--requests', 'total', default=200, help='Measured requests per scenario and level')
+@click.option('--warmup', default=20, help='Unmeasured requests per scenario before the first level')
+@click.option('--employees', default=50, help='Active employees to spread requests over')
+@click.option('--output', default='bench-results.json', help='Where to write the JSON results')
+@click.option('--baseline', type=click.Path(exists=True), help='Earlier results file to compare against')
+@click.option('--label', help='Free-form label stored with the results')
+def bench_suite_command(url, scenarios, levels, total, warmup, employees, output, baseline, label):
+    # Seed realistic data first (flask seed-data); ingest scenarios write real rows
+    admin = Admin.query.first()
+    ids = [row[0] for row in db.session.query(Employee.id).filter_by(is_active=True).order_by(Employee.id.desc()).limit(employees)]
+    if not admin or not ids:
+        raise SystemExit("Needs an admin and at least one active employee; run flask seed-data first")
+    expires = datetime.utcnow() + timedelta(hours=2)
+    admin_token = jwt.encode({'user_id': admin.id, 'user_type': 'admin', 'exp': expires}, app.config['SECRET_KEY'])
+    employee_tokens = [
+        jwt.encode({'user_id': employee_id, 'user_type': 'employee', 'exp': expires}, app.config['SECRET_KEY'])
+        for employee_id in ids
+    ]
+    today = datetime.utcnow().date()
+    dates = {
+        'today': today.isoformat(),
+        'yesterday': (today - timedelta(days=1)).isoformat(),
+        'week_ago': (today - timedelta(days=7)).isoformat(),
+        'month_ago': (today - timedelta(days=30)).isoformat()
+    }
+    results = []
+    for name in scenarios or BENCH_SUITE:
+        method, template, body, auth = BENCH_SUITE[name]
+        payload = json.dumps(body) if body is not None else None
+
+        def next_request(n):
+            token = admin_token if auth == 'admin' else employee_tokens[n % len(ids)]
+            headers = {'Authorization': f'Bearer {token}'}
+            if payload is not None:
+                headers['Content-Type'] = 'application/json'
+            return method, template.format(employee_id=ids[n % len(ids)], **dates), payload, headers
+
+        if warmup:
+            run_load(url, min(warmup, max(levels)), warmup, next_request)
+        for level in levels:
+            result = {'scenario': name, 'concurrency': level, **run_load(url, level, total, next_request)}
+            results.append(result)
+            print(f"{name:24} c={level:<4} {result['throughput']:8.1f} req/s   p50 {result['p50_ms']:8.1f} ms   "
+                  f"p99 {result['p99_ms']:8.1f} ms   errors {result['errors']}")
+    report = {
+        'label': label,
+        'revision': _git_revision(),
+        'recorded_at': datetime.utcnow().isoformat(),
+        'url': url,
+        'database': db.engine.dialect.name,
+        'employees': db.session.query(func.count(Employee.id)).scalar(),
+        'activity_rows': db.session.query(func.count(ActivityLog.id)).scalar(),
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} result(s) to {output}")
+    if baseline:
+        with open(baseline) as f:
+            previous = json.load(f)
+        before = {(r['scenario'], r['concurrency']): r for r in previous['results']}
+        print(f"Compared with {baseline} (revision {previous.get('revision')}):")
+        for result in results:
+            old = before.get((result['scenario'], result['concurrency']))
+            if old and old['throughput'] and old['p99_ms']:
+                print(f"{result['scenario']:24} c={result['concurrency']:<4} "
+                      f"throughput {100 * (result['throughput'] / old['throughput'] - 1):+6.1f}%   "
+                      f"p99 {100 * (result['p99_ms'] / old['p99_ms'] - 1):+6.1f}%")
+
+@app.cli.command('bench-auth')
+@click.option('--iterations', default=20000, help='Token verifications per run')
+def bench_auth_command(iterations):
+    token = jwt.encode({
+        'user_id': 1,
+        'user_type': 'employee',
+        'exp': datetime.utcnow() + timedelta(hours=1)
+    }, app.config['SECRET_KEY'])
+    start = time.perf_counter()
+    for _ in range(iterations):
+        jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+    uncached = (time.perf_counter() - start) / iterations
+    jwt_cache.clear()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decode_auth_token(token)
+    cached = (time.perf_counter() - start) / iterations
+    print(f"jwt.decode per request:        {uncached * 1e6:8.2f} us")
+    print(f"cached decode per request:     {cached * 1e6:8.2f} us ({uncached / cached:.1f}x)")
+    print(f"jwt cache: {jwt_cache.stats()}")
+
 if __name__ == '__main__':
     try:
         with app.app_context():
             print("Starting database initialization...")
-            db.drop_all()
-            db.create_all()
-            print("Database tables created successfully")
-            print("Creating default users...")
-            admin = Admin(
-                username='admin',
-                password=generate_password_hash('admin123'),
-                email='admin@company.com'
-            )
-            db.session.add(admin)
-            sample_employee = Employee(
-                username='employee1',
-                password=generate_password_hash('password123'),
-                name='John Doe',
-                email='john@company.com',
-                department='Engineering',
-                position='Developer'
-            )
-            db.session.add(sample_employee)
-            today = datetime.utcnow().date()
-            session = WorkSession(
-                employee_id=1,
-                clock_in=datetime.utcnow(),
-                date=today,
-                active_time=7.2,
-                idle_time=0.8,
-                productivity_score=85
-            )
-            db.session.add(session)
-            activity = ActivityLog(
-                employee_id=1,
-                activity_type='active',
-                description='Working on project',
-                timestamp=datetime.utcnow()
-            )
-            db.session.add(activity)
-            app_usage = AppUsage(
-                employee_id=1,
-                app_name='VS Code',
-                duration=4.0,
-                category='productive',
-                date=today
-            )
-            db.session.add(app_usage)
-            website = WebsiteVisit(
-                employee_id=1,
-                url='https://docs.example.com',
-                duration=1.5,
-                visits=3,
-                category='productive',
-                date=today
-            )
-            db.session.add(website)
-            settings = Settings(
-                work_start=datetime.strptime('09:00', '%H:%M').time(),
-                work_end=datetime.strptime('17:00', '%H:%M').time(),
-                idle_timeout=5
-            )
-            db.session.add(settings)
-            db.session.commit()
-            print("Default users and sample data created")
+            applied = upgrade_schema()
+            print(f"Database schema at version {current_schema_version()} (applied: {applied or 'none'})")
+            if Admin.query.first():
+                print("Users already exist, skipping creation.")
+            else:
+                print("Creating default users...")
+                app_id = app_names.id('VS Code')
+                domain_id = web_domains.id(normalize_domain('https://docs.example.com'))
+                admin = Admin(
+                    username='admin',
+                    password=generate_password_hash('admin123'),
+                    email='admin@company.com'
+                )
+                db.session.add(admin)
+                sample_employee = Employee(
+                    username='employee1',
+                    password=generate_password_hash('password123'),
+                    name='John Doe',
+                    email='john@company.com',
+                    department='Engineering',
+                    position='Developer'
+                )
+                db.session.add(sample_employee)
+                today = datetime.utcnow().date()
+                session = WorkSession(
+                    employee_id=1,
+                    clock_in=datetime.utcnow(),
+                    date=today,
+                    active_time=7.2,
+                    idle_time=0.8,
+                    productivity_score=85
+                )
+                db.session.add(session)
+                activity = ActivityLog(
+                    employee_id=1,
+                    activity_type='active',
+                    description='Working on project',
+                    timestamp=datetime.utcnow()
+                )
+                db.session.add(activity)
+                app_usage = AppUsage(
+                    employee_id=1,
+                    app_id=app_id,
+                    duration=4.0,
+                    category='productive',
+                    date=today
+                )
+                db.session.add(app_usage)
+                website = WebsiteVisit(
+                    employee_id=1,
+                    domain_id=domain_id,
+                    duration=1.5,
+                    visits=3,
+                    category='productive',
+                    date=today
+                )
+                db.session.add(website)
+                settings = Settings(
+                    work_start=datetime.strptime('09:00', '%H:%M').time(),
+                    work_end=datetime.strptime('17:00', '%H:%M').time(),
+                    idle_timeout=5
+                )
+                db.session.add(settings)
+                db.session.commit()
+                print("Default users and sample data created")
     except Exception as e:
         print(f"Error during database initialization: {str(e)}")
     print("\nStarting Flask server on http://localhost:5001")
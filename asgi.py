@@ -0,0 +1,327 @@
+# ASGI entry point: async handlers for the high-volume agent endpoints, with every other route
+# (admin, reports, streaming) served by the existing Flask app through a WSGI bridge; the SSE stream gets a
+# thread pool of its own so open dashboards cannot starve the other bridged routes.
+#
+#   pip install -r requirements-async.txt
+#   PRESENCE_BACKEND=sqlite uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+#
+# The async handlers mirror the Flask views in app.py: the same tables, session accounting,
+# presence, response-cache bumps and live-feed events, but each request awaits its queries on an
+# async driver (asyncpg / aiosqlite) from a pooled async engine instead of holding a worker thread.
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import jwt
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from app import (
+    app as flask_app, db, ActivityLog, Employee, WorkSession, BufferFull, CORS_ORIGINS, HasherBusy, activity_buffer,
+    activity_presence_state, app_usage_upsert, apply_session_event, apply_session_usage, cached_principal,
+    category_totals, configure_engine, decode_auth_token, new_work_session, _metrics_sql, app_names, metrics,
+    normalize_app_name, normalize_domain, password_hasher, presence, principal_cache, principal_generation,
+    publish_activity, response_cache, session_usage_queries, settings_cache, web_domains, website_visit_upsert
+)
+
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', 20))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv('ASYNC_DB_MAX_OVERFLOW', 10))
+ASYNC_WSGI_THREADS = int(os.getenv('ASYNC_WSGI_THREADS', 10))
+# /api/admin/stream holds a thread for as long as the dashboard stays open, so it gets its own pool
+ASYNC_STREAM_THREADS = int(os.getenv('ASYNC_STREAM_THREADS', 50))
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+with flask_app.app_context():
+    # Flask-SQLAlchemy has already resolved relative SQLite paths against the instance folder
+    sync_url = db.engine.url
+async_engine = create_async_engine(
+    sync_url.set(drivername=ASYNC_DRIVERS[sync_url.get_backend_name()]),
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+    pool_pre_ping=True
+)
+configure_engine(async_engine.sync_engine)
+dialect = sync_url.get_backend_name()
+AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+def _in_app_context(fn, *args):
+    with flask_app.app_context():
+        return fn(*args)
+
+def _after_write(employee_id, state, scopes, activity=None):
+    # Presence, cache generations and the live feed may write SQLite files or load settings and principals,
+    # so handlers run them in one worker thread after their commit rather than on the event loop
+    if state:
+        presence.touch(employee_id, state)
+    response_cache.bump(*scopes)
+    if activity:
+        publish_activity(employee_id, *activity)
+
+async def get_principal(session, employee_id):
+    # The generation probe is a local read at most once per PRINCIPAL_PROBE_INTERVAL
+    generation = principal_generation()
+    principal = cached_principal(employee_id, generation)
+    if principal is None:
+        row = (await session.execute(select(
+            Employee.id, Employee.username, Employee.name, Employee.department, Employee.is_active
+        ).where(Employee.id == employee_id))).first()
+        if not row:
+            return None
+        principal = row._asdict()
+        principal_cache.set(employee_id, (generation, principal))
+    return principal
+
+async def authenticate_employee(request, session):
+    # Same checks and messages as token_required in app.py; returns (employee_id, error response)
+    token = request.headers.get('Authorization')
+    if not token:
+        return None, JSONResponse({'message': 'Token is missing!'}, 401)
+    try:
+        data = decode_auth_token(token[7:] if token.startswith('Bearer ') else token)
+        user_id, user_type = data['user_id'], data['user_type']
+    except Exception:
+        return None, JSONResponse({'message': 'Token is invalid!'}, 401)
+    if user_type != 'employee':
+        return None, JSONResponse({'message': 'Employee access only!'}, 403)
+    principal = await get_principal(session, user_id)
+    if not principal or not principal['is_active']:
+        return None, JSONResponse({'message': 'Account is deactivated!'}, 401)
+    return user_id, None
+
+def _intern_committed(interner, key):
+    # The async insert that follows references the id, so the dictionary row has to be committed first
+    value = interner.id(key)
+    db.session.commit()
+    return value
+
+async def intern(interner, key):
+    # Cache hits stay on the loop; a miss inserts/looks up the dictionary row on the sync engine
+    value = interner.get(key)
+    if value is None:
+        value = await asyncio.to_thread(_in_app_context, _intern_committed, interner, key)
+    return value
+
+async def record_session_event(session, employee_id, activity_type, at):
+    # Settings probes and department lookups stay on the sync engine, off the event loop
+    settings = await asyncio.to_thread(_in_app_context, settings_cache.for_employee, employee_id)
+    work_session = (await session.execute(
+        select(WorkSession).filter_by(employee_id=employee_id, date=at.date())
+    )).scalars().first()
+    if not work_session:
+        work_session = new_work_session(employee_id, at)
+        apply_session_usage(work_session, await day_category_totals(session, employee_id, at.date()))
+        session.add(work_session)
+    apply_session_event(work_session, activity_type, at, settings)
+    return work_session
+
+async def day_category_totals(session, employee_id, day):
+    apps, sites = session_usage_queries(employee_id, day)
+    return category_totals((await session.execute(apps)).all(), (await session.execute(sites)).all())
+
+async def refresh_session_usage(session, employee_id, day):
+    # Same locking and re-derivation as app.refresh_session_usage
+    work_session = (await session.execute(
+        select(WorkSession).filter_by(employee_id=employee_id, date=day).with_for_update()
+    )).scalars().first()
+    if work_session:
+        apply_session_usage(work_session, await day_category_totals(session, employee_id, day))
+
+async def employee_login(request):
+    data = await request.json()
+    async with AsyncSession() as session:
+        employee = (await session.execute(
+            select(Employee).filter_by(username=data.get('username'), is_active=True)
+        )).scalars().first()
+        # Verification runs in the shared hashing process pool; the loop only awaits the future
+        try:
+            matched, new_hash = await asyncio.wrap_future(
+                password_hasher.verify(employee.password, data.get('password'))
+            ) if employee else (False, None)
+        except HasherBusy:
+            return JSONResponse({'message': 'Too many logins in progress, retry later'}, 503, {'Retry-After': '1'})
+        if not matched:
+            return JSONResponse({'message': 'Invalid credentials!'}, 401)
+        now = datetime.utcnow()
+        if new_hash:
+            employee.password = new_hash
+        employee.last_login = now
+        employee.status = 'online'
+        session.add(ActivityLog(employee_id=employee.id, activity_type='clockin', description='Clocked in', timestamp=now))
+        await record_session_event(session, employee.id, 'clockin', now)
+        await session.commit()
+        await get_principal(session, employee.id)  # publish_activity reads the name from the cache
+    await asyncio.to_thread(
+        _in_app_context, _after_write, employee.id, 'online', ('employees', 'activity', 'sessions'),
+        ('clockin', 'Clocked in', now)
+    )
+    token = jwt.encode({
+        'user_id': employee.id,
+        'user_type': 'employee',
+        'exp': datetime.utcnow() + timedelta(hours=24)
+    }, flask_app.config['SECRET_KEY'])
+    return JSONResponse({
+        'token': token,
+        'user': {
+            'id': employee.id,
+            'username': employee.username,
+            'name': employee.name,
+            'email': employee.email,
+            'type': 'employee'
+        }
+    })
+
+async def log_activity(request):
+    async with AsyncSession() as session:
+        employee_id, error = await authenticate_employee(request, session)
+        if error:
+            return error
+        data = await request.json()
+        now = datetime.utcnow()
+        if activity_buffer:
+            try:
+                await asyncio.to_thread(activity_buffer.put, {
+                    'employee_id': employee_id,
+                    'activity_type': data.get('activity_type'),
+                    'description': data.get('description'),
+                    'timestamp': now.isoformat(),
+                    'activity_metadata': json.dumps(data.get('metadata', {}))
+                })
+            except BufferFull:
+                return JSONResponse({'message': 'Activity queue is full, retry later'}, 503, {'Retry-After': '1'})
+            scopes = ('activity',)
+        else:
+            session.add(ActivityLog(
+                employee_id=employee_id,
+                activity_type=data.get('activity_type'),
+                description=data.get('description'),
+                timestamp=now,
+                activity_metadata=json.dumps(data.get('metadata', {}))
+            ))
+            await record_session_event(session, employee_id, data.get('activity_type'), now)
+            await session.commit()
+            scopes = ('activity', 'sessions')
+    await asyncio.to_thread(
+        _in_app_context, _after_write, employee_id, activity_presence_state(data.get('activity_type')), scopes,
+        (data.get('activity_type'), data.get('description'), now)
+    )
+    return JSONResponse({'message': 'Activity logged successfully'})
+
+async def log_app_usage(request):
+    async with AsyncSession() as session:
+        employee_id, error = await authenticate_employee(request, session)
+        if error:
+            return error
+        data = await request.json()
+        app_name = normalize_app_name(data.get('app_name'))
+        if not app_name:
+            return JSONResponse({'message': 'app_name is required'}, 400)
+        now = datetime.utcnow()
+        await session.execute(app_usage_upsert([{
+            'employee_id': employee_id,
+            'app_id': await intern(app_names, app_name),
+            'duration': data.get('duration', 0),
+            'category': data.get('category', 'neutral'),
+            'date': now.date(),
+            'last_used': now
+        }], dialect))
+        await refresh_session_usage(session, employee_id, now.date())
+        await session.commit()
+    await asyncio.to_thread(_in_app_context, _after_write, employee_id, None, ('app_usage', 'sessions'))
+    return JSONResponse({'message': 'App usage logged successfully'})
+
+async def log_website_visit(request):
+    async with AsyncSession() as session:
+        employee_id, error = await authenticate_employee(request, session)
+        if error:
+            return error
+        data = await request.json()
+        domain = normalize_domain(data.get('url'))
+        if not domain:
+            return JSONResponse({'message': 'url is required'}, 400)
+        now = datetime.utcnow()
+        await session.execute(website_visit_upsert([{
+            'employee_id': employee_id,
+            'domain_id': await intern(web_domains, domain),
+            'duration': data.get('duration', 0),
+            'visits': 1,
+            'category': data.get('category', 'neutral'),
+            'date': now.date(),
+            'last_visited': now
+        }], dialect))
+        await refresh_session_usage(session, employee_id, now.date())
+        await session.commit()
+    await asyncio.to_thread(_in_app_context, _after_write, employee_id, None, ('sessions',))
+    return JSONResponse({'message': 'Website visit logged successfully'})
+
+@asynccontextmanager
+async def lifespan(_):
+    # Load presence and settings once up front so request handlers never hit their cold path
+    await asyncio.to_thread(_in_app_context, lambda: (presence.counts(), settings_cache.get()))
+    yield
+    await async_engine.dispose()
+
+ASYNC_ROUTES = [
+    Route('/api/auth/employee/login', employee_login, methods=['POST']),
+    Route('/api/employee/activity', log_activity, methods=['POST']),
+    Route('/api/employee/app-usage', log_app_usage, methods=['POST']),
+    Route('/api/employee/website-visit', log_website_visit, methods=['POST']),
+]
+ASYNC_PATHS = {route.path for route in ASYNC_ROUTES}
+
+ingest_app = Starlette(routes=ASYNC_ROUTES, lifespan=lifespan, middleware=[
+    Middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_methods=['POST'], allow_headers=['*'])
+])
+flask_asgi = WSGIMiddleware(flask_app, workers=ASYNC_WSGI_THREADS)
+flask_stream = WSGIMiddleware(flask_app, workers=ASYNC_STREAM_THREADS)
+open_streams = 0
+
+async def admin_stream(scope, receive, send):
+    # Refused here once every stream thread is taken; queued behind open streams it would never start
+    global open_streams
+    if open_streams >= ASYNC_STREAM_THREADS:
+        response = JSONResponse({'message': 'Too many live connections, retry later'}, 503, {'Retry-After': '5'})
+        await response(scope, receive, send)
+        return
+    open_streams += 1
+    try:
+        await flask_stream(scope, receive, send)
+    finally:
+        open_streams -= 1
+
+async def instrumented_ingest(scope, receive, send):
+    # Records the same per-route series as the Flask request hooks in app.py
+    started = time.perf_counter()
+    response = {'status': 500, 'size': 0}
+
+    async def capture(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['size'] += len(message.get('body', b''))
+        await send(message)
+
+    token = _metrics_sql.set([0, 0.0])
+    try:
+        await ingest_app(scope, receive, capture)
+    finally:
+        sql = _metrics_sql.get()
+        _metrics_sql.reset(token)
+        metrics.observe_request(scope['path'], scope['method'], response['status'],
+                                time.perf_counter() - started, response['size'], sql)
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan' or (
+        scope['type'] == 'http' and scope['path'] in ASYNC_PATHS and scope['method'] in ('POST', 'OPTIONS')
+    ):
+        await (instrumented_ingest if metrics and scope['type'] == 'http' else ingest_app)(scope, receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/api/admin/stream':
+        await admin_stream(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
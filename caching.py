@@ -0,0 +1,182 @@
+# In-process caches and the response cache for polled read endpoints. Response cache keys embed the
+# generation of every scope the endpoint reads, so write handlers invalidate by bumping a counter; TTLs
+# bound staleness from state that changes without a write (presence sweeps, the clock).
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, request
+
+from host_local import thread_connection
+
+class TTLCache:
+    # Bounded LRU whose entries expire at a per-entry deadline (wall clock seconds)
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= time.time():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, expires_at=None):
+        if expires_at is None:
+            expires_at = time.time() + self.ttl if self.ttl else float('inf')
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[0] if item else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+class MemoryResponseBackend:
+    # Per-process; with several gunicorn workers a bump only reaches the worker that handled the write
+    def __init__(self, maxsize, scopes):
+        self._entries = TTLCache(maxsize)
+        self._generations = dict.fromkeys(scopes, 0)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, entry, ttl):
+        self._entries.set(key, entry, expires_at=time.time() + ttl)
+
+    def generations(self, scopes):
+        return tuple(self._generations[scope] for scope in scopes)
+
+    def bump(self, scopes):
+        with self._lock:
+            for scope in scopes:
+                self._generations[scope] += 1
+
+    def size(self):
+        return len(self._entries._data)
+
+class SqliteResponseBackend:
+    # Local SQLite file shared by every gunicorn worker on the host
+    def __init__(self, path, maxsize):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS response_cache ('
+            'key TEXT PRIMARY KEY, etag TEXT NOT NULL, body BLOB NOT NULL, mimetype TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_response_cache_expires_at ON response_cache (expires_at)')
+        conn.execute('CREATE TABLE IF NOT EXISTS response_generation (scope TEXT PRIMARY KEY, generation INTEGER NOT NULL)')
+
+    def _conn(self):
+        return thread_connection(self._local, self.path)
+
+    def get(self, key):
+        row = self._conn().execute(
+            'SELECT etag, body, mimetype FROM response_cache WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return (row[0], bytes(row[1]), row[2]) if row else None
+
+    def set(self, key, entry, ttl):
+        conn = self._conn()
+        now = time.time()
+        conn.execute('INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?)', (key, *entry, now + ttl))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (now,))
+            conn.execute(
+                'DELETE FROM response_cache WHERE key NOT IN '
+                '(SELECT key FROM response_cache ORDER BY expires_at DESC LIMIT ?)', (self.maxsize,)
+            )
+
+    def generations(self, scopes):
+        found = dict(self._conn().execute(
+            f"SELECT scope, generation FROM response_generation WHERE scope IN ({', '.join('?' * len(scopes))})", scopes
+        ).fetchall())
+        return tuple(found.get(scope, 0) for scope in scopes)
+
+    def bump(self, scopes):
+        self._conn().executemany(
+            'INSERT INTO response_generation (scope, generation) VALUES (?, 1) '
+            'ON CONFLICT(scope) DO UPDATE SET generation = generation + 1',
+            [(scope,) for scope in scopes]
+        )
+
+    def size(self):
+        return self._conn().execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def bump(self, *scopes):
+        self.backend.bump(scopes)
+
+    def cached(self, ttl, scopes):
+        # Wraps a view that takes current_user; place it below token_required/admin_required
+        def decorator(f):
+            @wraps(f)
+            def decorated(current_user, *args, **kwargs):
+                owner = 'admin' if current_user['type'] == 'admin' else f"employee:{current_user['id']}"
+                key = hashlib.sha256(repr((
+                    f.__name__, owner, sorted(kwargs.items()), sorted(request.args.items(multi=True)),
+                    self.backend.generations(scopes)
+                )).encode()).hexdigest()
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    etag, body, mimetype = entry
+                    response = Response(body, mimetype=mimetype)
+                else:
+                    self.misses += 1
+                    response = current_app.make_response(f(current_user, *args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    etag = hashlib.sha1(body).hexdigest()
+                    self.backend.set(key, (etag, body, response.mimetype), ttl)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                response = response.make_conditional(request)
+                if response.status_code == 304:
+                    self.not_modified += 1
+                return response
+            return decorated
+        return decorator
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'size': self.backend.size(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified
+        }
@@ -0,0 +1,186 @@
+# Live admin feed over Server-Sent Events. Published events go to a bounded ring that every
+# connection reads from, so one publish costs one append plus a wake-up however many admins listen.
+# With the SQLite log events go through a local SQLite file instead, and each worker's poller
+# copies them into its ring, so an admin on any worker sees events ingested by every worker.
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from host_local import thread_connection
+
+STREAM_BUFFER_SIZE = int(os.getenv('STREAM_BUFFER_SIZE', 1000))
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', 500))
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+STREAM_POLL_INTERVAL = float(os.getenv('STREAM_POLL_INTERVAL', 0.25))
+STREAM_KPI_INTERVAL = float(os.getenv('STREAM_KPI_INTERVAL', 5))
+
+class SqliteEventLog:
+    def __init__(self, path, keep):
+        self.path = path
+        self.keep = keep
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS stream_event (id INTEGER PRIMARY KEY AUTOINCREMENT, event TEXT NOT NULL, data TEXT NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS stream_meta (token TEXT NOT NULL)')
+        conn.execute('INSERT INTO stream_meta (token) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM stream_meta)', (uuid.uuid4().hex[:8],))
+        self.token = conn.execute('SELECT token FROM stream_meta').fetchone()[0]
+
+    def _conn(self):
+        return thread_connection(self._local, self.path)
+
+    def append(self, event_name, data):
+        event_id = self._conn().execute('INSERT INTO stream_event (event, data) VALUES (?, ?)', (event_name, data)).lastrowid
+        if event_id % 100 == 0:
+            self._conn().execute('DELETE FROM stream_event WHERE id <= ?', (event_id - self.keep,))
+
+    def last_id(self):
+        return self._conn().execute('SELECT COALESCE(MAX(id), 0) FROM stream_event').fetchone()[0]
+
+    def read_after(self, event_id):
+        return self._conn().execute(
+            'SELECT id, event, data FROM stream_event WHERE id > ? ORDER BY id LIMIT ?', (event_id, self.keep)
+        ).fetchall()
+
+class EventHub:
+    # kpis() returns the dashboard snapshot pushed as 'kpi' events; it runs inside app.app_context()
+    def __init__(self, app, kpis, log=None):
+        self.app = app
+        self.kpis = kpis
+        self.log = log
+        self.token = log.token if log else uuid.uuid4().hex[:8]
+        self._ring = deque(maxlen=STREAM_BUFFER_SIZE)
+        self._cond = threading.Condition()
+        self._last_seq = log.last_id() if log else 0
+        self._threads = []
+        self.kpi = {}
+        self.kpi_version = 0
+        self.clients = 0
+        self.published = 0
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._cond:
+            if self._threads:
+                return
+            targets = [self._kpi_loop] + ([self._poll_loop] if self.log else [])
+            for target in targets:
+                thread = threading.Thread(target=target, name=f'stream-{target.__name__.strip("_")}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def publish(self, event_name, data):
+        payload = json.dumps(data, default=str)
+        if self.log:
+            self.log.append(event_name, payload)
+            return
+        with self._cond:
+            self._last_seq += 1
+            self._ring.append((self._last_seq, event_name, payload))
+            self.published += 1
+            self._cond.notify_all()
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(STREAM_POLL_INTERVAL)
+            try:
+                rows = self.log.read_after(self._last_seq)
+            except sqlite3.Error:
+                self.app.logger.exception('Stream poll failed')
+                continue
+            if rows:
+                with self._cond:
+                    self._ring.extend(rows)
+                    self._last_seq = rows[-1][0]
+                    self.published += len(rows)
+                    self._cond.notify_all()
+
+    def _kpi_loop(self):
+        # One dashboard computation per interval per worker, whatever the number of connections
+        while True:
+            time.sleep(STREAM_KPI_INTERVAL)
+            if not self.clients:
+                continue
+            try:
+                with self.app.app_context():
+                    snapshot = self.kpis()
+            except Exception:
+                self.app.logger.exception('Stream KPI refresh failed')
+                continue
+            if snapshot != self.kpi:
+                with self._cond:
+                    self.kpi = snapshot
+                    self.kpi_version += 1
+                    self._cond.notify_all()
+
+    def _parse_event_id(self, last_event_id):
+        token, _, seq = (last_event_id or '').partition('-')
+        if token != self.token or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self._ring[0][0] if self._ring else self._last_seq + 1
+        return seq if oldest - 1 <= seq <= self._last_seq else None
+
+    @staticmethod
+    def _frame(event_name, data, event_id=None):
+        prefix = f'id: {event_id}\n' if event_id else ''
+        return f'{prefix}event: {event_name}\ndata: {data}\n\n'
+
+    def subscribe(self, last_event_id=None):
+        self._ensure_started()
+        if self.clients >= STREAM_MAX_CLIENTS:
+            return None
+        with self._cond:
+            cursor = self._parse_event_id(last_event_id)
+        return self._stream(cursor, last_event_id)
+
+    def _stream(self, cursor, last_event_id):
+        with self._cond:
+            self.clients += 1
+        try:
+            yield 'retry: 3000\n\n'
+            if cursor is None:
+                if last_event_id:
+                    yield self._frame('reset', json.dumps({'reason': 'Event id is no longer buffered; reload state'}))
+                cursor = self._last_seq
+            sent_kpi = {}
+            kpi_version = -1
+            while True:
+                with self._cond:
+                    if self._last_seq <= cursor and self.kpi_version == kpi_version:
+                        self._cond.wait(timeout=STREAM_HEARTBEAT)
+                    lost = bool(self._ring) and self._ring[0][0] > cursor + 1
+                    events = []
+                    for item in reversed(self._ring):
+                        if item[0] <= cursor:
+                            break
+                        events.append(item)
+                    events.reverse()
+                    kpi, kpi_version = self.kpi, self.kpi_version
+                if lost:
+                    yield self._frame('reset', json.dumps({'reason': 'Client fell behind the buffer; reload state'}))
+                for seq, event_name, data in events:
+                    yield self._frame(event_name, data, f'{self.token}-{seq}')
+                    cursor = seq
+                delta = {key: value for key, value in kpi.items() if sent_kpi.get(key) != value}
+                if delta:
+                    yield self._frame('kpi', json.dumps(delta))
+                    sent_kpi = dict(kpi)
+                if not events and not delta:
+                    yield ': keep-alive\n\n'
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    def stats(self):
+        return {
+            'backend': 'sqlite' if self.log else 'memory',
+            'clients': self.clients,
+            'buffered': len(self._ring),
+            'published': self.published,
+            'last_event_id': f'{self.token}-{self._last_seq}'
+        }
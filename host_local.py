@@ -0,0 +1,26 @@
+# State shared by the worker processes of one host: small SQLite files that gunicorn/uvicorn workers read
+# and write concurrently, and liveness checks for files a worker claimed by pid.
+import os
+import sqlite3
+
+def thread_connection(local, path):
+    # One connection per thread (sqlite3 connections can't be shared across threads), kept on `local`.
+    # WAL lets readers in other workers proceed during a write; nothing here has to survive a power
+    # loss, so commits skip the fsync.
+    conn = getattr(local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        local.conn = conn
+    return conn
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,238 @@
+# Live presence: last-seen time and online/idle/offline state per employee, flushed to Employee.status in batches.
+# The memory backend only sees touches handled by its own process: with several gunicorn/uvicorn workers each
+# one would time out, count and flush a different subset, so multi-worker deployments need the SQLite backend.
+import atexit
+import os
+import threading
+import time
+
+from host_local import thread_connection
+
+PRESENCE_STATES = ('online', 'idle', 'offline')
+PRESENCE_FLUSH_INTERVAL = float(os.getenv('PRESENCE_FLUSH_INTERVAL', 10))
+PRESENCE_SWEEP_INTERVAL = float(os.getenv('PRESENCE_SWEEP_INTERVAL', 1))
+PRESENCE_OFFLINE_AFTER = int(os.getenv('PRESENCE_OFFLINE_AFTER', 3600))
+
+class MemoryPresenceBackend:
+    # Per-process; counts are maintained on every transition so reads are O(1)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dirty = set()
+        self._counts = dict.fromkeys(PRESENCE_STATES, 0)
+
+    def _set(self, employee_id, state, last_seen, idle_at):
+        entry = self._entries.get(employee_id)
+        if entry is None:
+            self._entries[employee_id] = [state, last_seen, idle_at]
+            self._counts[state] += 1
+            self._dirty.add(employee_id)
+            return
+        if last_seen >= entry[1]:
+            entry[1], entry[2] = last_seen, idle_at
+        if entry[0] != state:
+            self._counts[entry[0]] -= 1
+            self._counts[state] += 1
+            entry[0] = state
+            self._dirty.add(employee_id)
+
+    def touch(self, employee_id, state, now, idle_at):
+        with self._lock:
+            self._set(employee_id, state, now, idle_at)
+
+    def load(self, rows):
+        with self._lock:
+            for employee_id, state, last_seen, idle_at in rows:
+                if employee_id not in self._entries:
+                    self._entries[employee_id] = [state, last_seen, idle_at]
+                    self._counts[state] += 1
+
+    def expire(self, now, offline_before):
+        # Returns [(employee_id, new state)] for every timed-out transition
+        changed = []
+        with self._lock:
+            for employee_id, (state, last_seen, idle_at) in list(self._entries.items()):
+                if state != 'offline' and last_seen < offline_before:
+                    self._set(employee_id, 'offline', last_seen, idle_at)
+                    changed.append((employee_id, 'offline'))
+                elif state == 'online' and idle_at < now:
+                    self._set(employee_id, 'idle', last_seen, idle_at)
+                    changed.append((employee_id, 'idle'))
+        return changed
+
+    def state(self, employee_id):
+        entry = self._entries.get(employee_id)
+        return entry[0] if entry else None
+
+    def counts(self):
+        return dict(self._counts)
+
+    def dirty(self):
+        with self._lock:
+            return {employee_id: self._entries[employee_id][0] for employee_id in self._dirty}
+
+    def mark_clean(self, flushed):
+        # Only entries still in the flushed state; anything that moved on since stays queued
+        with self._lock:
+            for employee_id, state in flushed.items():
+                if self._entries[employee_id][0] == state:
+                    self._dirty.discard(employee_id)
+
+class SqlitePresenceBackend:
+    # Local SQLite file shared by every gunicorn worker on the host
+    def __init__(self, path, default_idle_timeout):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS presence ('
+            'employee_id INTEGER PRIMARY KEY, state TEXT NOT NULL, last_seen REAL NOT NULL, '
+            'idle_at REAL NOT NULL, dirty INTEGER NOT NULL DEFAULT 1)'
+        )
+        if 'idle_at' not in [row[1] for row in conn.execute('PRAGMA table_info(presence)')]:
+            # Files created before per-department idle timeouts: assume the default until the next touch
+            conn.execute('ALTER TABLE presence ADD COLUMN idle_at REAL NOT NULL DEFAULT 0')
+            conn.execute('UPDATE presence SET idle_at = last_seen + ?', (default_idle_timeout * 60,))
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_presence_state ON presence (state)')
+
+    def _conn(self):
+        return thread_connection(self._local, self.path)
+
+    def touch(self, employee_id, state, now, idle_at):
+        self._conn().execute(
+            'INSERT INTO presence (employee_id, state, last_seen, idle_at, dirty) VALUES (?, ?, ?, ?, 1) '
+            'ON CONFLICT(employee_id) DO UPDATE SET '
+            'dirty = dirty OR state != excluded.state, state = excluded.state, '
+            'idle_at = CASE WHEN excluded.last_seen >= last_seen THEN excluded.idle_at ELSE idle_at END, '
+            'last_seen = max(last_seen, excluded.last_seen)',
+            (employee_id, state, now, idle_at)
+        )
+
+    def load(self, rows):
+        self._conn().executemany(
+            'INSERT OR IGNORE INTO presence (employee_id, state, last_seen, idle_at, dirty) VALUES (?, ?, ?, ?, 0)', rows
+        )
+
+    def expire(self, now, offline_before):
+        # RETURNING hands each transition to exactly one worker, so it is published once per host
+        conn = self._conn()
+        offline = conn.execute(
+            "UPDATE presence SET state = 'offline', dirty = 1 WHERE state != 'offline' AND last_seen < ? RETURNING employee_id",
+            (offline_before,)
+        ).fetchall()
+        idle = conn.execute(
+            "UPDATE presence SET state = 'idle', dirty = 1 WHERE state = 'online' AND idle_at < ? RETURNING employee_id",
+            (now,)
+        ).fetchall()
+        return [(employee_id, 'offline') for employee_id, in offline] + [(employee_id, 'idle') for employee_id, in idle]
+
+    def state(self, employee_id):
+        row = self._conn().execute('SELECT state FROM presence WHERE employee_id = ?', (employee_id,)).fetchone()
+        return row[0] if row else None
+
+    def counts(self):
+        counts = dict.fromkeys(PRESENCE_STATES, 0)
+        counts.update(self._conn().execute('SELECT state, COUNT(*) FROM presence GROUP BY state').fetchall())
+        return counts
+
+    def dirty(self):
+        return dict(self._conn().execute('SELECT employee_id, state FROM presence WHERE dirty = 1').fetchall())
+
+    def mark_clean(self, flushed):
+        # Only rows still in the flushed state; a worker flushing the same rows concurrently writes the same statuses
+        self._conn().executemany(
+            'UPDATE presence SET dirty = 0 WHERE employee_id = ? AND state = ?', list(flushed.items())
+        )
+
+class PresenceStore:
+    # The database side comes from the app: seed() yields (employee_id, status, idle timeout in minutes) for
+    # employees last flushed as online or idle, idle_timeout(employee_id) gives the minutes that apply now,
+    # write(statuses) stores and commits {employee_id: state}, and on_change(employee_id, state) hears every
+    # transition. Background flushes run inside app.app_context().
+    def __init__(self, backend, app, seed, idle_timeout, write, on_change):
+        self.backend = backend
+        self.app = app
+        self.seed = seed
+        self.idle_timeout = idle_timeout
+        self.write = write
+        self.on_change = on_change
+        self.flushes = 0
+        self.last_flush_rows = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._last_sweep = 0.0
+        self._thread = None
+        atexit.register(self._flush_on_exit)
+
+    def _ensure_started(self):
+        if self._loaded and self._thread:
+            return
+        with self._lock:
+            if not self._loaded:
+                # Seed from the last flushed statuses so counts are right straight after a restart
+                now = time.time()
+                self.backend.load([
+                    (employee_id, status, now, now + idle_timeout * 60)
+                    for employee_id, status, idle_timeout in self.seed()
+                ])
+                self._loaded = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='presence-flusher', daemon=True)
+                self._thread.start()
+
+    def touch(self, employee_id, state):
+        self._ensure_started()
+        previous = self.backend.state(employee_id)
+        # The deadline is fixed at touch time, so a changed idle timeout applies from each employee's next event
+        now = time.time()
+        self.backend.touch(employee_id, state, now, now + self.idle_timeout(employee_id) * 60)
+        if previous != state:
+            self.on_change(employee_id, state)
+
+    def state(self, employee_id):
+        self._ensure_started()
+        self._sweep()
+        return self.backend.state(employee_id)
+
+    def counts(self):
+        self._ensure_started()
+        self._sweep()
+        return self.backend.counts()
+
+    def _sweep(self, force=False):
+        now = time.time()
+        if force or now - self._last_sweep >= PRESENCE_SWEEP_INTERVAL:
+            self._last_sweep = now
+            for employee_id, state in self.backend.expire(now, now - PRESENCE_OFFLINE_AFTER):
+                self.on_change(employee_id, state)
+
+    def flush(self):
+        self._sweep(force=True)
+        dirty = self.backend.dirty()
+        self.write(dirty)
+        # Cleared only once the statuses are committed; a failed flush leaves them queued for the next one
+        self.backend.mark_clean(dirty)
+        self.flushes += 1
+        self.last_flush_rows = len(dirty)
+        return len(dirty)
+
+    def _run(self):
+        while True:
+            time.sleep(PRESENCE_FLUSH_INTERVAL)
+            # Leaving the app context removes the session, which rolls back a flush that failed
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    self.app.logger.exception('Presence flush failed')
+
+    def _flush_on_exit(self):
+        if self._loaded:
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    pass
+
+    def stats(self):
+        return {'backend': type(self.backend).__name__, 'flushes': self.flushes, 'last_flush_rows': self.last_flush_rows}
@@ -0,0 +1,195 @@
+# Metrics: per-route request counts, latency and response-size histograms and SQL statement counts and
+# time, plus per-worker gauges for the pool, queues and caches, rendered in Prometheus text format.
+# Recording is a few dict increments per request. Backed by SQLite, each worker folds its counter deltas
+# into a host-local file every METRICS_FLUSH_INTERVAL seconds (and before answering a scrape), so
+# whichever worker gunicorn hands the scrape to reports totals for all of them.
+import atexit
+import bisect
+import os
+import threading
+import time
+from functools import lru_cache
+
+from host_local import pid_alive, thread_connection
+
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+METRIC_FAMILIES = {
+    'http_requests_total': ('counter', 'Requests served, by route, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Time from request start until the response is returned to the server'),
+    'http_response_size_bytes': ('histogram', 'Response body size, for responses with a known length'),
+    'db_statements_total': ('counter', 'SQL statements executed, by the route that issued them'),
+    'db_statement_seconds_total': ('counter', 'Time spent executing SQL statements, by the route that issued them'),
+    'emp_tracker_component': ('gauge', 'Pool, queue and cache state of each worker process'),
+}
+
+@lru_cache(maxsize=4096)
+def metric_labels(**labels):
+    return ','.join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in labels.items()
+    )
+
+def _bucket_label(buckets, value):
+    index = bisect.bisect_left(buckets, value)
+    return str(buckets[index]) if index < len(buckets) else '+Inf'
+
+class Metrics:
+    # gauges() returns this worker's (labels, value) rows for the emp_tracker_component family
+    def __init__(self, app, gauges, path=None):
+        self.app = app
+        self.gauges = gauges
+        self.path = path
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value; only unflushed deltas when backed by SQLite
+        self._local = threading.local()
+        self._thread = None
+        self.flushes = 0
+        if path:
+            conn = self._conn()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS metric_counter ('
+                'name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (name, labels))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS metric_gauge ('
+                'pid INTEGER NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (pid, labels))'
+            )
+            atexit.register(self.flush)
+
+    def _conn(self):
+        return thread_connection(self._local, self.path)
+
+    def _ensure_started(self):
+        if self._thread is None and self.path:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+                    self._thread.start()
+
+    def _add(self, items):
+        self._ensure_started()
+        with self._lock:
+            for key, value in items:
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe_request(self, route, method, status, duration, size, sql):
+        labels = metric_labels(route=route, method=method)
+        items = [
+            (('http_requests_total', metric_labels(route=route, method=method, status=status)), 1),
+            (('http_request_duration_seconds_bucket', f'{labels},le="{_bucket_label(METRICS_LATENCY_BUCKETS, duration)}"'), 1),
+            (('http_request_duration_seconds_sum', labels), duration),
+            (('http_request_duration_seconds_count', labels), 1)
+        ]
+        if size is not None:
+            items += [
+                (('http_response_size_bytes_bucket', f'{labels},le="{_bucket_label(METRICS_SIZE_BUCKETS, size)}"'), 1),
+                (('http_response_size_bytes_sum', labels), size),
+                (('http_response_size_bytes_count', labels), 1)
+            ]
+        if sql and sql[0]:
+            items += self._sql_items(route, *sql)
+        self._add(items)
+
+    def observe_sql(self, route, count, seconds):
+        self._add(self._sql_items(route, count, seconds))
+
+    def _sql_items(self, route, count, seconds):
+        labels = metric_labels(route=route)
+        return [(('db_statements_total', labels), count), (('db_statement_seconds_total', labels), seconds)]
+
+    def flush(self):
+        if not self.path:
+            return
+        with self._lock:
+            counters, self._counters = self._counters, {}
+        try:
+            gauges = self.gauges()
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO metric_counter (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value',
+                    [(name, labels, value) for (name, labels), value in counters.items()]
+                )
+                conn.execute('DELETE FROM metric_gauge WHERE pid = ?', (os.getpid(),))
+                conn.executemany('INSERT INTO metric_gauge VALUES (?, ?, ?)', [(os.getpid(), *gauge) for gauge in gauges])
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except Exception:
+            # Keep the deltas for the next attempt rather than losing them
+            self._add(counters.items())
+            raise
+        self.flushes += 1
+
+    def _run(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.warning("Metrics flush failed: %s", e)
+
+    def samples(self):
+        # (name, labels, value) for everything recorded so far, across workers when backed by SQLite
+        if not self.path:
+            with self._lock:
+                counters = [(name, labels, value) for (name, labels), value in self._counters.items()]
+            return counters, self.gauges()
+        self.flush()
+        conn = self._conn()
+        counters = conn.execute('SELECT name, labels, value FROM metric_counter').fetchall()
+        gauges = []
+        for pid in [row[0] for row in conn.execute('SELECT DISTINCT pid FROM metric_gauge')]:
+            if pid == os.getpid() or pid_alive(pid):
+                gauges += conn.execute('SELECT labels, value FROM metric_gauge WHERE pid = ?', (pid,)).fetchall()
+            else:
+                conn.execute('DELETE FROM metric_gauge WHERE pid = ?', (pid,))
+        return counters, gauges
+
+    def render(self):
+        counters, gauges = self.samples()
+        series = {}
+        for name, labels, value in counters:
+            family = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in METRIC_FAMILIES:
+                    family = name[:-len(suffix)]
+            series.setdefault(family, []).append((name, labels, value))
+        series['emp_tracker_component'] = [('emp_tracker_component', labels, value) for labels, value in gauges]
+        lines = []
+        for family, (kind, help_text) in METRIC_FAMILIES.items():
+            lines += [f'# HELP {family} {help_text}', f'# TYPE {family} {kind}']
+            samples = series.get(family, [])
+            if kind == 'histogram':
+                lines += self._render_histogram(family, samples)
+            else:
+                lines += [f'{name}{{{labels}}} {float(value)}' for name, labels, value in sorted(samples)]
+        return '\n'.join(lines) + '\n'
+
+    def _render_histogram(self, family, samples):
+        # Buckets are stored as plain per-bucket counts; Prometheus wants them cumulative and complete
+        buckets = METRICS_LATENCY_BUCKETS if family == 'http_request_duration_seconds' else METRICS_SIZE_BUCKETS
+        counts, totals = {}, {}
+        for name, labels, value in samples:
+            if name.endswith('_bucket'):
+                base, le = labels.rsplit(',le=', 1)
+                counts.setdefault(base, {})[le.strip('"')] = value
+            else:
+                totals.setdefault(labels, {})[name] = value
+        lines = []
+        for labels in sorted(totals):
+            cumulative = 0
+            for le in [str(bucket) for bucket in buckets] + ['+Inf']:
+                cumulative += counts.get(labels, {}).get(le, 0)
+                lines.append(f'{family}_bucket{{{labels},le="{le}"}} {float(cumulative)}')
+            lines += [f'{name}{{{labels}}} {float(value)}' for name, value in sorted(totals[labels].items())]
+        return lines
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'sqlite' if self.path else 'memory', 'series': len(self._counters), 'flushes': self.flushes}
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+from datetime import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+# app.py reads its configuration at import time, so every database and local file points at a scratch
+# directory before it is imported
+DATA_DIR = tempfile.mkdtemp(prefix='emp-tracker-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(DATA_DIR, 'tracker.db')
+for name, path in (
+    ('PRESENCE_DB_PATH', 'presence.db'),
+    ('RESPONSE_CACHE_DB_PATH', 'response_cache.db'),
+    ('STREAM_DB_PATH', 'stream.db'),
+    ('METRICS_DB_PATH', 'metrics.db'),
+    ('REPORT_CACHE_DIR', 'report_cache'),
+    ('ACTIVITY_JOURNAL_DIR', 'activity_journal'),
+    ('ACTIVITY_ARCHIVE_DIR', 'activity_archive'),
+):
+    os.environ[name] = os.path.join(DATA_DIR, path)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as tracker  # noqa: E402
+
+EMPLOYEES = ('alice', 'bob', 'carol')
+PASSWORD = 'password123'
+
+
+@pytest.fixture(scope='session')
+def tracker_app():
+    with tracker.app.app_context():
+        tracker.upgrade_schema()
+        tracker.db.session.add(tracker.Admin(
+            username='admin', password=generate_password_hash('admin123'), email='admin@company.com'
+        ))
+        for username in EMPLOYEES:
+            tracker.db.session.add(tracker.Employee(
+                username=username, password=generate_password_hash(PASSWORD), name=username.title(),
+                email=f'{username}@company.com', department='Engineering', position='Developer'
+            ))
+        tracker.db.session.add(tracker.Settings(work_start=time(9), work_end=time(17), idle_timeout=5))
+        tracker.db.session.commit()
+    return tracker
+
+
+@pytest.fixture
+def client(tracker_app):
+    return tracker_app.app.test_client()
+
+
+def login(client, path, username, password):
+    response = client.post(path, json={'username': username, 'password': password})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+@pytest.fixture
+def admin_headers(client):
+    return login(client, '/api/auth/admin/login', 'admin', 'admin123')
+
+
+@pytest.fixture
+def employee_headers(client):
+    return login(client, '/api/auth/employee/login', 'alice', PASSWORD)
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+pytest.importorskip('aiosqlite')
+httpx = pytest.importorskip('httpx')
+
+from conftest import PASSWORD  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def asgi(tracker_app):
+    import asgi
+    return asgi
+
+
+def drive(asgi, requests):
+    # One event loop per test; the async engine's pool is disposed before that loop closes
+    async def main():
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            try:
+                return await requests(client)
+            finally:
+                await asgi.async_engine.dispose()
+    return asyncio.run(main())
+
+
+def test_async_login_and_activity(asgi, tracker_app):
+    async def requests(client):
+        login = await client.post('/api/auth/employee/login', json={'username': 'bob', 'password': PASSWORD})
+        assert login.status_code == 200, login.text
+        headers = {'Authorization': f"Bearer {login.json()['token']}"}
+        activity = await client.post('/api/employee/activity', headers=headers,
+                                     json={'activity_type': 'active', 'description': 'Editing'})
+        assert activity.status_code == 200, activity.text
+        return login.json()['user']['id']
+
+    employee_id = drive(asgi, requests)
+    with tracker_app.app.app_context():
+        types = [row.activity_type for row in tracker_app.ActivityLog.query.filter_by(employee_id=employee_id)]
+        assert types == ['clockin', 'active']
+        assert tracker_app.WorkSession.query.filter_by(employee_id=employee_id).count() == 1
+        assert tracker_app.presence.state(employee_id) == 'online'
+
+
+def test_flask_routes_are_bridged(asgi):
+    async def requests(client):
+        return await client.get('/api/health')
+
+    response = drive(asgi, requests)
+    assert response.status_code == 200
+    assert response.json()['status'] == 'ok'
+
+
+def test_stream_refused_when_its_pool_is_full(asgi, monkeypatch):
+    monkeypatch.setattr(asgi, 'ASYNC_STREAM_THREADS', 0)
+
+    async def requests(client):
+        return await client.get('/api/admin/stream')
+
+    response = drive(asgi, requests)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
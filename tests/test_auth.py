@@ -0,0 +1,39 @@
+from werkzeug.security import generate_password_hash
+
+from conftest import PASSWORD, login
+
+
+def add_employee(tracker, username):
+    with tracker.app.app_context():
+        employee = tracker.Employee(
+            username=username, password=generate_password_hash(PASSWORD), name=username.title(),
+            email=f'{username}@company.com', department='Support'
+        )
+        tracker.db.session.add(employee)
+        tracker.db.session.commit()
+        return employee.id
+
+
+def test_deactivated_employee_token_is_rejected(tracker_app, client, admin_headers):
+    employee_id = add_employee(tracker_app, 'dave')
+    headers = login(client, '/api/auth/employee/login', 'dave', PASSWORD)
+    assert client.get('/api/employee/dashboard', headers=headers).status_code == 200
+
+    assert client.delete(f'/api/admin/employees/{employee_id}', headers=admin_headers).status_code == 200
+    response = client.get('/api/employee/dashboard', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['message'] == 'Account is deactivated!'
+
+
+def test_deactivation_in_another_worker_drops_cached_principals(tracker_app, client, monkeypatch):
+    employee_id = add_employee(tracker_app, 'erin')
+    headers = login(client, '/api/auth/employee/login', 'erin', PASSWORD)
+    assert client.get('/api/employee/dashboard', headers=headers).status_code == 200
+
+    # Another worker deactivates erin: the row and the shared generation change, this process's cache does not
+    monkeypatch.setattr(tracker_app, 'PRINCIPAL_PROBE_INTERVAL', 0)
+    with tracker_app.app.app_context():
+        tracker_app.Employee.query.filter_by(id=employee_id).update({'is_active': False})
+        tracker_app.db.session.commit()
+    tracker_app.response_cache.bump('principals')
+    assert client.get('/api/employee/dashboard', headers=headers).status_code == 401
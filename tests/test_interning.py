@@ -0,0 +1,22 @@
+def test_interned_ids_are_cached_only_after_commit(tracker_app):
+    with tracker_app.app.app_context():
+        tracker_app.app_names.id('Rolled Back')
+        assert tracker_app.app_names.get('Rolled Back') is None
+        tracker_app.db.session.rollback()
+        assert tracker_app.app_names.get('Rolled Back') is None
+        assert not tracker_app.AppName.query.filter_by(name='Rolled Back').count()
+
+        app_id = tracker_app.app_names.id('Committed')
+        tracker_app.db.session.commit()
+        assert tracker_app.app_names.get('Committed') == app_id
+
+
+def test_interning_leaves_pending_session_work_uncommitted(tracker_app):
+    with tracker_app.app.app_context():
+        employee = tracker_app.Employee(username='pending', password='-', name='Pending', email='pending@company.com')
+        tracker_app.db.session.add(employee)
+        tracker_app.db.session.flush()
+        tracker_app.web_domains.id('pending.example.com')
+        tracker_app.db.session.rollback()
+        assert not tracker_app.Employee.query.filter_by(username='pending').count()
+        assert tracker_app.web_domains.get('pending.example.com') is None
@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def metrics_token(tracker_app, monkeypatch):
+    monkeypatch.setattr(tracker_app, 'METRICS_TOKEN', 'scrape-secret')
+    return {'Authorization': 'Bearer scrape-secret'}
+
+
+def test_metrics_need_credentials(client, employee_headers):
+    assert client.get('/api/metrics').status_code == 401
+    assert client.get('/api/metrics', headers=employee_headers).status_code == 403
+
+
+def test_admins_can_read_metrics(client, admin_headers):
+    response = client.get('/api/metrics', headers=admin_headers)
+    assert response.status_code == 200
+    assert 'http_requests_total' in response.get_data(as_text=True)
+
+
+def test_scrapers_use_the_metrics_token(client, admin_headers, metrics_token):
+    assert client.get('/api/metrics', headers=metrics_token).status_code == 200
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/api/metrics', headers=admin_headers).status_code == 200
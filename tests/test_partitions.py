@@ -0,0 +1,116 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+POSTGRES_URL = os.getenv('TEST_POSTGRES_URL')
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(
+    not POSTGRES_URL, reason='set TEST_POSTGRES_URL to a PostgreSQL database to run the partitioning tests'
+)
+
+# app.py binds its database at import, so the PostgreSQL run happens in a child process
+SCRIPT = textwrap.dedent('''
+    import json
+    from datetime import datetime, time
+    import app as tracker
+
+    this_month = tracker._month_start(datetime.utcnow())
+    far = this_month
+    for _ in range(6):
+        far = tracker._next_month(far)
+    with tracker.app.app_context():
+        tracker.upgrade_schema()
+        employee = tracker.Employee(username='partitions', password='-', name='Partitions', email='p@company.com')
+        tracker.db.session.add(employee)
+        tracker.db.session.flush()
+        tracker.db.session.add(tracker.ActivityLog(
+            employee_id=employee.id, activity_type='active', description='-', timestamp=datetime.combine(far, time(12))
+        ))
+        tracker.db.session.commit()
+        count = lambda table: tracker.db.session.connection().exec_driver_sql(f'SELECT count(*) FROM {table}').scalar()
+        result = {
+            'partitioned': {
+                model.__tablename__: tracker.is_partitioned(tracker.db.session.connection(), model.__tablename__)
+                for model, _ in tracker.PARTITIONED_TABLES
+            },
+            'default_before': count('activity_log_default'),
+            'created': tracker.ensure_partitions(6),
+            'default_after': count('activity_log_default'),
+            'far_rows': count(f'activity_log_p{far:%Y%m}'),
+            'scanned': {
+                model.__tablename__: tracker.partitions_scanned(model, column, this_month)
+                for model, column in tracker.PARTITIONED_TABLES
+            },
+            'dropped': tracker.drop_empty_partitions(tracker.ActivityLog, far),
+            'remaining': tracker.table_partitions(tracker.db.session.connection(), 'activity_log'),
+            'this_month': f'{this_month:%Y%m}',
+            'far': f'{far:%Y%m}',
+        }
+    print(json.dumps(result))
+''')
+
+
+@pytest.fixture(scope='module')
+def partition_run(tmp_path_factory):
+    # A throwaway schema keeps the run away from anything else in that database
+    schema = f'partition_test_{uuid.uuid4().hex[:8]}'
+    tmp_path = tmp_path_factory.mktemp('partitions')
+    admin = create_engine(POSTGRES_URL, isolation_level='AUTOCOMMIT')
+    with admin.connect() as connection:
+        connection.exec_driver_sql(f'CREATE SCHEMA {schema}')
+    url = make_url(POSTGRES_URL).update_query_dict({'options': f'-csearch_path={schema}'})
+    env = {
+        **os.environ,
+        'DATABASE_URL': url.render_as_string(hide_password=False),
+        'PG_PARTITIONING': '1',
+        'PARTITION_MONTHS_AHEAD': '2',
+        'PRESENCE_DB_PATH': str(tmp_path / 'presence.db'),
+        'RESPONSE_CACHE_DB_PATH': str(tmp_path / 'response_cache.db'),
+        'STREAM_DB_PATH': str(tmp_path / 'stream.db'),
+        'METRICS_DB_PATH': str(tmp_path / 'metrics.db'),
+        'REPORT_CACHE_DIR': str(tmp_path / 'report_cache'),
+        'ACTIVITY_JOURNAL_DIR': str(tmp_path / 'activity_journal'),
+        'ACTIVITY_ARCHIVE_DIR': str(tmp_path / 'activity_archive'),
+    }
+    try:
+        process = subprocess.run(
+            [sys.executable, '-c', SCRIPT], cwd=REPO_DIR, env=env, capture_output=True, text=True, timeout=300
+        )
+        assert process.returncode == 0, process.stderr
+        yield json.loads(process.stdout.strip().splitlines()[-1])
+    finally:
+        with admin.connect() as connection:
+            connection.exec_driver_sql(f'DROP SCHEMA {schema} CASCADE')
+        admin.dispose()
+
+
+def test_event_tables_are_partitioned(partition_run):
+    assert all(partition_run['partitioned'].values()), partition_run['partitioned']
+
+
+def test_new_month_takes_its_rows_from_the_default_partition(partition_run):
+    far = f"activity_log_p{partition_run['far']}"
+    assert partition_run['default_before'] == 1
+    assert far in partition_run['created']
+    assert (partition_run['default_after'], partition_run['far_rows']) == (0, 1)
+
+
+def test_month_queries_are_pruned_to_one_partition(partition_run):
+    for table, scanned in partition_run['scanned'].items():
+        assert scanned == [f"{table}_p{partition_run['this_month']}"]
+
+
+def test_empty_months_before_the_cutoff_are_dropped(partition_run):
+    this_month = f"activity_log_p{partition_run['this_month']}"
+    far = f"activity_log_p{partition_run['far']}"
+    assert this_month in partition_run['dropped']
+    assert this_month not in partition_run['remaining']
+    assert {far, 'activity_log_default'} <= set(partition_run['remaining'])
@@ -0,0 +1,89 @@
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+
+# Statements per request, whatever the number of employees or days involved
+BUDGETS = {
+    '/api/admin/employees': 4,
+    '/api/admin/dashboard': 6,
+    '/api/employee/activity': 4,
+}
+REPORT_BUDGET = 8
+
+_cache_buster = itertools.count()
+
+
+def add_employees(tracker, count, days=1):
+    today = datetime.utcnow().replace(hour=9, minute=0, second=0, microsecond=0)
+    app_id = tracker.app_names.id('Editor')
+    domain_id = tracker.web_domains.id('docs.example.com')
+    for _ in range(count):
+        number = next(_cache_buster)
+        employee = tracker.Employee(
+            username=f'budget{number}', password='-', name='Budget', email=f'budget{number}@company.com',
+            department='Budget', status='online'
+        )
+        tracker.db.session.add(employee)
+        tracker.db.session.flush()
+        for offset in range(days):
+            start = today - timedelta(days=offset)
+            tracker.db.session.add(tracker.WorkSession(
+                employee_id=employee.id, date=start.date(), clock_in=start, clock_out=start + timedelta(hours=8),
+                active_time=6.0, idle_time=2.0, productivity_score=70
+            ))
+            tracker.db.session.add_all([tracker.ActivityLog(
+                employee_id=employee.id, activity_type=activity_type, description='-', timestamp=start + timedelta(minutes=i)
+            ) for i, activity_type in enumerate(('clockin', 'active', 'idle'))])
+            tracker.db.session.add(tracker.AppUsage(
+                employee_id=employee.id, app_id=app_id, duration=3.0, category='productive', date=start.date()
+            ))
+            tracker.db.session.add(tracker.WebsiteVisit(
+                employee_id=employee.id, domain_id=domain_id, duration=1.0, visits=2, category='productive',
+                date=start.date()
+            ))
+    tracker.db.session.commit()
+    return employee
+
+
+def count_queries(tracker, client, path, headers):
+    # A fresh query string each time so the response cache never answers
+    separator = '&' if '?' in path else '?'
+    with tracker.app.app_context(), tracker.QueryCounter() as counter:
+        response = client.get(f'{path}{separator}_={next(_cache_buster)}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return counter.count
+
+
+@pytest.fixture
+def no_rollup_builds(tracker_app, monkeypatch):
+    # The builder thread would issue its own statements while the counter listens on the engine
+    monkeypatch.setattr(tracker_app.rollup_builder, 'request', lambda *args: None)
+
+
+@pytest.mark.parametrize('path', sorted(BUDGETS))
+def test_admin_views_issue_a_fixed_number_of_queries(tracker_app, client, admin_headers, path):
+    with tracker_app.app.app_context():
+        add_employees(tracker_app, 5)
+    count_queries(tracker_app, client, path, admin_headers)  # warm the principal and settings caches
+    few = count_queries(tracker_app, client, path, admin_headers)
+    with tracker_app.app.app_context():
+        add_employees(tracker_app, 40)
+    many = count_queries(tracker_app, client, path, admin_headers)
+    assert many == few
+    assert many <= BUDGETS[path]
+
+
+@pytest.mark.parametrize('version', ['1', '2'])
+def test_report_issues_a_fixed_number_of_queries(tracker_app, client, admin_headers, no_rollup_builds, version):
+    with tracker_app.app.app_context():
+        employee_id = add_employees(tracker_app, 1, days=30).id
+    today = datetime.utcnow().date()
+    path = f'/api/admin/employee/{employee_id}/report?version={version}&end_date={today}&start_date='
+    # Ranges reaching back past today also look up rollup coverage, so compare two days with thirty
+    two_days = path + (today - timedelta(days=1)).isoformat()
+    count_queries(tracker_app, client, two_days, admin_headers)
+    short = count_queries(tracker_app, client, two_days, admin_headers)
+    month = count_queries(tracker_app, client, path + (today - timedelta(days=29)).isoformat(), admin_headers)
+    assert month == short
+    assert month <= REPORT_BUDGET
@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture
+def hot_queries(tracker_app):
+    with tracker_app.app.app_context():
+        yield {name: tracker_app.explain_query(query) for name, query in tracker_app.hot_queries().items()}
+
+
+def test_hot_queries_use_indexes(tracker_app, hot_queries):
+    full_scans = {name: plan for name, plan in hot_queries.items() if tracker_app.is_full_scan(plan)}
+    assert not full_scans
+
+
+def test_full_scan_detection(tracker_app):
+    assert tracker_app.is_full_scan(['SCAN activity_log'])
+    assert tracker_app.is_full_scan(['Seq Scan on activity_log  (cost=0.00..35.50 rows=2550 width=4)'])
+    assert not tracker_app.is_full_scan(['SEARCH work_session USING INDEX ix_work_session_employee_date (employee_id=? AND date=?)'])
+    assert not tracker_app.is_full_scan(['SCAN activity_log USING INDEX ix_activity_log_timestamp'])
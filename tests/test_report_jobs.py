@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+
+class DeferredExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+
+
+@pytest.fixture
+def deferred_jobs(tracker_app, monkeypatch):
+    executor = DeferredExecutor()
+    monkeypatch.setattr(tracker_app, 'report_executor', lambda: executor)
+    return executor
+
+
+def test_job_is_keyed_by_the_data_it_rendered(tracker_app, client, admin_headers, deferred_jobs):
+    with tracker_app.app.app_context():
+        employee = tracker_app.Employee.query.filter_by(username='bob').one()
+        employee_id = employee.id
+    today = datetime.utcnow().date().isoformat()
+    response = client.post(f'/api/admin/employee/{employee_id}/report/jobs', json={'start_date': today},
+                           headers=admin_headers)
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    # Data changes between enqueue and render
+    with tracker_app.app.app_context():
+        tracker_app.db.session.add(tracker_app.AppUsage(
+            employee_id=employee_id, app_id=tracker_app.app_names.id('Late Edit'), duration=1.0,
+            category='productive', date=datetime.utcnow().date()
+        ))
+        tracker_app.db.session.commit()
+    for fn, args in deferred_jobs.calls:
+        fn(*args)
+
+    with tracker_app.app.app_context():
+        job = tracker_app.ReportJob.query.get(job_id)
+        employee = tracker_app.Employee.query.get(employee_id)
+        assert job.status == 'done', job.error
+        assert job.cache_key == tracker_app.report_cache_key(employee, job.start_date, job.end_date)
+    assert client.get(f'/api/admin/report-jobs/{job_id}/download', headers=admin_headers).status_code == 200
@@ -0,0 +1,59 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def add_old_activity(tracker, days_ago):
+    employee = tracker.Employee.query.filter_by(username='alice').one()
+    event = tracker.ActivityLog(
+        employee_id=employee.id, activity_type='active', description='-',
+        timestamp=datetime.utcnow().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=days_ago)
+    )
+    tracker.db.session.add(event)
+    tracker.db.session.commit()
+    return event.id, event.timestamp.date()
+
+
+def archived_ids(tracker, day):
+    return [record['id'] for record in tracker.read_activity_archive(day)]
+
+
+def test_failed_commit_leaves_no_archive(tracker_app, monkeypatch):
+    with tracker_app.app.app_context():
+        event_id, day = add_old_activity(tracker_app, 60)
+
+        def fail():
+            raise RuntimeError('commit failed')
+        monkeypatch.setattr(tracker_app.db.session, 'commit', fail)
+        with pytest.raises(RuntimeError):
+            tracker_app.compact_activity_logs()
+        monkeypatch.undo()
+
+        path = tracker_app.activity_archive_path(day)
+        assert not os.path.exists(path) and not os.path.exists(f'{path}.pending')
+        assert tracker_app.db.session.get(tracker_app.ActivityLog, event_id)
+
+        tracker_app.compact_activity_logs()
+        assert archived_ids(tracker_app, day) == [event_id]
+        assert not tracker_app.db.session.get(tracker_app.ActivityLog, event_id)
+
+
+def test_pending_archive_is_published_only_if_its_delete_committed(tracker_app):
+    with tracker_app.app.app_context():
+        kept_id, kept_day = add_old_activity(tracker_app, 70)
+        committed_day = kept_day - timedelta(days=1)
+        for day, event_id in ((kept_day, kept_id), (committed_day, 10 ** 9)):
+            path = tracker_app.activity_archive_path(day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(f'{path}.pending', 'wt', encoding='utf-8') as f:
+                f.write(json.dumps({'id': event_id, 'employee_id': 1, 'activity_type': 'active', 'description': '-',
+                                    'timestamp': f'{day}T10:00:00', 'activity_metadata': None}) + '\n')
+
+        tracker_app.recover_activity_archives()
+        assert archived_ids(tracker_app, committed_day) == [10 ** 9]
+        assert archived_ids(tracker_app, kept_day) == []
+        assert not os.path.exists(tracker_app.activity_archive_path(kept_day) + '.pending')
+        tracker_app.compact_activity_logs()  # archive the old event so later tests start clean
@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import PASSWORD, login
+
+THREADS = 16
+REQUESTS_PER_THREAD = 25
+
+
+def post_repeatedly(tracker_app, path, headers, body):
+    client = tracker_app.app.test_client()
+    return [client.post(path, json=body, headers=headers).status_code for _ in range(REQUESTS_PER_THREAD)]
+
+
+def test_concurrent_usage_posts_all_accumulate(tracker_app, client):
+    headers = login(client, '/api/auth/employee/login', 'carol', PASSWORD)
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        apps = [pool.submit(post_repeatedly, tracker_app, '/api/employee/app-usage', headers,
+                            {'app_name': 'Terminal', 'duration': 1, 'category': 'productive'})
+                for _ in range(THREADS)]
+        sites = [pool.submit(post_repeatedly, tracker_app, '/api/employee/website-visit', headers,
+                             {'url': 'https://git.example.com/repo', 'duration': 1, 'category': 'productive'})
+                 for _ in range(THREADS)]
+        statuses = [status for future in apps + sites for status in future.result()]
+    assert statuses == [200] * (2 * THREADS * REQUESTS_PER_THREAD)
+
+    expected = THREADS * REQUESTS_PER_THREAD
+    with tracker_app.app.app_context():
+        employee_id = tracker_app.Employee.query.filter_by(username='carol').one().id
+        rows = tracker_app.AppUsage.query.filter_by(
+            employee_id=employee_id, app_id=tracker_app.app_names.id('Terminal')
+        ).all()
+        assert [row.duration for row in rows] == [expected]
+        visits = tracker_app.WebsiteVisit.query.filter_by(
+            employee_id=employee_id, domain_id=tracker_app.web_domains.id('git.example.com')
+        ).all()
+        assert [(visit.duration, visit.visits) for visit in visits] == [(expected, expected)]